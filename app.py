@@ -1,16 +1,34 @@
 import os
+import re
+import csv
+import json
+import base64
 import time
 from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, jsonify, send_from_directory
+from collections import deque, Counter, OrderedDict, namedtuple
+from functools import lru_cache
+from flask import Flask, render_template, request, redirect, url_for, jsonify, send_from_directory, abort, Response, stream_with_context
+from markupsafe import Markup
 from urllib.parse import urlparse
 import requests
-from bs4 import BeautifulSoup
 import threading
+import queue
 import sqlite3
-from concurrent.futures import ThreadPoolExecutor
+import bisect
+import heapq
+import math
+import atexit
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 import hashlib
+import io
+import zlib
 import validators
-from urllib.parse import urlparse, parse_qs, urlencode
+import click
+from urllib.parse import urlparse, parse_qs, urlencode, urljoin
+from PIL import Image, ImageOps
+import page_parser
 
 app = Flask(__name__)
 
@@ -19,15 +37,390 @@ URLS_FILE = 'urls.txt'
 DATA_FILE = 'url_data.db'
 MAX_WORKERS = 10
 
+# Crawler stages: MAX_WORKERS fetch threads feed PARSE_WORKERS parser processes through
+# bounded queues, and parsed pages are stored by the database writer
+FETCH_QUEUE_MAX = 1000
+PARSE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+PARSE_QUEUE_MAX = 100
+
+# Statements slower than this (in milliseconds) go to the slow query log
+SLOW_QUERY_MS = 100
+SLOW_QUERY_LOG = 'slow_queries.log'
+# Admin pages require this token (?token=...); without it they are localhost only
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+# Typeahead suggestions
+SUGGEST_LIMIT = 8
+SUGGEST_MAX_KEYS = 200000
+SUGGEST_MAX_KEY_LENGTH = 40
+SUGGEST_SCAN_LIMIT = 256
+SUGGEST_MAX_CACHED_PREFIXES = 5000
+# Uncached prefixes rank at most this many of their keys, sampled evenly across the range
+SUGGEST_MAX_SCAN = 20000
+# Keys of new rows wait in a small sorted list until this many are merged into the index
+SUGGEST_MERGE_SIZE = 1000
+
+# Clicks are buffered in memory and flushed in batches
+CLICK_FLUSH_INTERVAL = 5
+MAX_PENDING_CLICK_URLS = 10000
+# Trending score: exponential decay with this half-life, measured from a fixed epoch
+TRENDING_HALF_LIFE = 24 * 3600
+TRENDING_EPOCH = 1700000000
+CLICK_WINDOW_SECONDS = 3600
+CLICK_WINDOW_RETENTION_DAYS = 30
+# `flask rebuild-trending` rescores this many rows per writer operation
+TRENDING_REBUILD_BATCH = 2000
+
+# Category classifier (naive Bayes over title, description and domain tokens)
+CLASSIFIER_WORKERS = 2
+CLASSIFIER_BATCH_SIZE = 200
+CLASSIFIER_MIN_TRAINING_ROWS = 20
+CLASSIFIER_MAX_TRAINING_ROWS = 200000
+CLASSIFIER_MAX_VOCABULARY = 50000
+CLASSIFIER_MIN_CONFIDENCE = 0.6
+CLASSIFIER_RETRAIN_INTERVAL = 3600
+# New rows waiting to be scored; past this the oldest are dropped and stay uncategorised
+# until `flask backfill-categories` reaches them
+CLASSIFIER_MAX_PENDING = 10000
+
+# Keyword tags picked by TF-IDF over title and description
+MAX_TAGS = 5
+TAG_MIN_DF = 2
+TAG_MAX_DF_RATIO = 0.5
+TAG_BATCH_SIZE = 2000
+# Distinct terms held in memory before document frequencies are flushed to the database
+TAG_MAX_PENDING_TERMS = 200000
+TAG_PAGE_SIZE = 24
+
+# Listing pages load FEED_PAGE_SIZE rows at a time from /feed as they scroll;
+# clients may ask for up to FEED_MAX_PAGE_SIZE
+FEED_PAGE_SIZE = 24
+FEED_MAX_PAGE_SIZE = 100
+
+# Search facet counts are cached per normalised query for this many seconds
+FACET_CACHE_TTL = 60
+FACET_CACHE_SIZE = 1000
+FACET_DOMAIN_LIMIT = 10
+
+# Search shows SEARCH_PAGE_SIZE results a page ranked by clicks, up to SEARCH_MAX_RESULTS in
+# all. Totals and facets count at most SEARCH_COUNT_LIMIT matches; larger totals are
+# estimated from the match rate among the newest SEARCH_SAMPLE_ROWS rows.
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_RESULTS = 500
+SEARCH_MAX_QUERY_LENGTH = 100
+SEARCH_COUNT_LIMIT = 10000
+SEARCH_SAMPLE_ROWS = 5000
+
+# Columns of domain_stats the domain page and sidebars show
+DOMAIN_STATS_COLUMNS = ('domain, url_count, clicks, ROUND(rating_sum / NULLIF(rated_count, 0), 1) AS rating, '
+                        'last_crawled')
+
+# Rendered URL card fragments kept in memory
+CARD_CACHE_SIZE = 5000
+# Columns the listing views select: just what a card shows (plus the sort keys), with
+# enough of the description for its 100-character summary
+CARD_COLUMNS = ('id, url, title, SUBSTR(description, 1, 101) AS description, domain, category, '
+                'rating, clicks, created_at, trending, favicon, thumbnail, row_version')
+# Columns whose changes bump urls.row_version: what a card renders plus what exports carry
+VERSIONED_COLUMNS = ('url', 'title', 'description', 'domain', 'category', 'tags', 'rating', 'clicks',
+                     'created_at', 'favicon', 'thumbnail')
+
+# Read replica mode: each worker serves reads from an in-memory copy of the
+# database, refreshed through the backup API once it is this many seconds stale.
+# Every refresh copies the whole file, and while it runs the worker holds the
+# old copy and the new one, so keep this well above CLICK_FLUSH_INTERVAL
+READ_REPLICA = os.environ.get('READ_REPLICA') == '1'
+READ_REPLICA_MAX_STALENESS = int(os.environ.get('READ_REPLICA_MAX_STALENESS', '120'))
+
+# Boot warm-up: each server worker requests its hot pages once in the background at start,
+# and /ready answers 503 until that is done. flask CLI commands other than run skip it, as
+# does WARMUP=0. Waits for the suggestion index and the read replica give up after
+# WARMUP_TIMEOUT seconds. Readiness is per process: with several gunicorn workers /ready
+# answers for whichever one the check reaches, and the others may still be warming up
+# (they serve, just cold).
+WARMUP = os.environ.get('WARMUP', '1') != '0'
+WARMUP_TIMEOUT = 120
+WARMUP_DOMAINS = 5
+WARMUP_SEARCHES = 3
+
+# All writes go through one writer thread that commits queued operations together
+WRITE_BATCH_MAX = 500
+WRITE_QUEUE_MAX = 10000
+
+# Favicons (PNG) and og:image previews (WebP, 16:9), stored under the hash of the source image
+IMAGE_DIR = os.path.join('static', 'img')
+FAVICON_SIZES = (32, 64)
+THUMBNAIL_SIZES = (320, 640)
+FAVICON_MAX_AGE = 30 * 86400
+IMAGE_WORKERS = 2
+IMAGE_MAX_PENDING = 500
+IMAGE_TIMEOUT = 10
+IMAGE_MAX_BYTES = 5 * 1024 * 1024
+IMAGE_MAX_PIXELS = 25000000
+IMAGE_WEBP_QUALITY = 80
+IMAGE_CACHE_MAX_AGE = 365 * 86400
+
+# Front-end assets: `flask build-assets` purges the vendor CSS down to the classes
+# the templates use and writes it with the shared script under content-hashed names
+ASSET_CSS_SOURCES = [
+    'https://cdn.jsdelivr.net/npm/tailwindcss@2.2.19/dist/tailwind.min.css',
+    'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css'
+]
+ASSET_JS_SOURCE = os.path.join('static', 'js', 'app.js')
+ASSET_DIST_DIR = os.path.join('static', 'dist')
+ASSET_MANIFEST = 'asset-manifest.json'
+ASSET_CACHE_DIR = '.asset-cache'
+ASSET_CACHE_MAX_AGE = 365 * 86400
+
+# Bulk export (/export and `flask export`): rows per keyset read and bytes per streamed chunk
+EXPORT_COLUMNS = ['id', 'url', 'title', 'description', 'domain', 'category', 'tags',
+                  'rating', 'clicks', 'created_at', 'last_updated']
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+# Database maintenance: each task runs once its interval (seconds) has passed and traffic
+# is quiet (under MAINTENANCE_QUIET_RPM requests a minute, no queued writes), or regardless
+# once it is twice overdue. Runs are recorded in the maintenance_log table.
+MAINTENANCE_INTERVALS = {
+    'optimize': 6 * 3600,
+    'analyze': 24 * 3600,
+    'vacuum': 24 * 3600,
+    'checkpoint': 3600,
+    'backup': 24 * 3600
+}
+MAINTENANCE_CHECK_INTERVAL = 60
+MAINTENANCE_QUIET_RPM = 30
+MAINTENANCE_ANALYSIS_LIMIT = 2000
+MAINTENANCE_VACUUM_PAGES = 5000
+MAINTENANCE_LOG_KEEP = 1000
+# Hot backups copy BACKUP_STEP_PAGES pages at a time and pause BACKUP_STEP_SLEEP seconds between steps
+BACKUP_DIR = os.environ.get('BACKUP_DIR', 'backups')
+BACKUP_KEEP = 7
+BACKUP_STEP_PAGES = 1000
+BACKUP_STEP_SLEEP = 0.05
+BACKUP_MAX_RESTARTS = 5
+
+# Admission control: /add is refused with 429 once INGEST_QUEUE_MAX URLs are waiting for
+# or being crawled, and /add and /click are limited per client by token buckets of
+# (tokens per second, burst). Behind a proxy set CLIENT_IP_HEADER to the header it puts
+# the client address in (fly.toml sets Fly-Client-IP). The header is trusted as-is, so
+# only set it when a proxy always overwrites it; without one any client can spoof it.
+INGEST_QUEUE_MAX = int(os.environ.get('INGEST_QUEUE_MAX', '1000'))
+RATE_LIMITS = {
+    'add': (0.2, 10),
+    'click': (5, 30)
+}
+RATE_LIMIT_CLIENTS = 10000
+RETRY_AFTER_MAX = 300
+CLIENT_IP_HEADER = os.environ.get('CLIENT_IP_HEADER', '')
+
+# Pool workers that do not fork run the parent's main script again as __mp_main__ before
+# their task. When that script is app.py (python app.py) they need none of the app, so
+# its start-up below is skipped: database setup, background threads and template files
+POOL_WORKER = __name__ == '__mp_main__'
+
+# Process pools (crawler parsers, classifier scorers) start their workers from a fork
+# server instead of forking this threaded process, and it preloads just the modules they run
+pool_context = multiprocessing.get_context('forkserver')
+pool_context.set_forkserver_preload(['page_parser', 'classifier_worker'])
+
 # Create directories if they don't exist
 os.makedirs('static', exist_ok=True)
 os.makedirs('templates', exist_ok=True)
+os.makedirs(IMAGE_DIR, exist_ok=True)
 
-# Database setup with improved schema
-def init_db():
-    conn = sqlite3.connect(DATA_FILE)
-    c = conn.cursor()
+# SQL instrumentation
+_SQL_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_SQL_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SQL_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SQL_SPACE_RE = re.compile(r'\s+')
+
+query_stats = {}
+slow_queries = deque(maxlen=50)
+query_stats_lock = threading.Lock()
+
+def fingerprint_sql(sql):
+    """Normalise a statement so queries that only differ in literals share stats"""
+    sql = _SQL_STRING_RE.sub('?', sql)
+    sql = _SQL_NUMBER_RE.sub('?', sql)
+    sql = _SQL_IN_LIST_RE.sub('(...)', sql)
+    return _SQL_SPACE_RE.sub(' ', sql).strip()
+
+def explain_query(conn, sql, params):
+    """Return the EXPLAIN QUERY PLAN rows for a statement, or an empty list"""
+    try:
+        # A plain cursor so the EXPLAIN itself is not instrumented
+        plan = sqlite3.Cursor(conn).execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in plan.fetchall()]
+    except sqlite3.Error:
+        return []
+
+def record_query(conn, sql, params, elapsed, many=False):
+    """Add a statement's timing to the per-fingerprint stats, log it if slow and return its fingerprint"""
+    fingerprint = fingerprint_sql(sql)
+    elapsed_ms = elapsed * 1000
+    is_slow = elapsed_ms >= SLOW_QUERY_MS
+    
+    with query_stats_lock:
+        stats = query_stats.get(fingerprint)
+        if stats is None:
+            stats = query_stats[fingerprint] = {
+                'fingerprint': fingerprint,
+                'count': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'slow_count': 0,
+                'last_seen': 0
+            }
+        stats['count'] += 1
+        stats['total_ms'] += elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+        stats['last_seen'] = time.time()
+        if is_slow:
+            stats['slow_count'] += 1
     
+    if not is_slow:
+        return fingerprint
+    
+    entry = {
+        'time': time.time(),
+        'duration_ms': round(elapsed_ms, 3),
+        'fingerprint': fingerprint,
+        'sql': _SQL_SPACE_RE.sub(' ', sql).strip(),
+        'params': repr(params)[:200],
+        'plan': [] if many else explain_query(conn, sql, params)
+    }
+    with query_stats_lock:
+        slow_queries.append(entry)
+        try:
+            with open(SLOW_QUERY_LOG, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+        except OSError as e:
+            print(f"Error writing slow query log: {str(e)}")
+    return fingerprint
+
+def record_fetch(fingerprint, elapsed):
+    """Add time spent fetching rows to the stats of the statement that produced them"""
+    with query_stats_lock:
+        stats = query_stats.get(fingerprint)
+        if stats is not None:
+            stats['total_ms'] += elapsed * 1000
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times every statement and the fetches that follow it"""
+    _fingerprint = None
+    
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._fingerprint = record_query(self.connection, sql, parameters, time.perf_counter() - start)
+    
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._fingerprint = record_query(self.connection, sql, (), time.perf_counter() - start, many=True)
+    
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            record_fetch(self._fingerprint, time.perf_counter() - start)
+    
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            record_fetch(self._fingerprint, time.perf_counter() - start)
+    
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            record_fetch(self._fingerprint, time.perf_counter() - start)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute shortcuts) are instrumented"""
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+    
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            record_query(self, 'COMMIT', (), time.perf_counter() - start, many=True)
+
+def connect_db(path=None):
+    """Open an instrumented connection to the database"""
+    return sqlite3.connect(path or DATA_FILE, factory=InstrumentedConnection)
+
+def get_query_stats(sort='total_ms', limit=50):
+    """Return per-fingerprint stats, worst offenders first"""
+    with query_stats_lock:
+        rows = [dict(stats) for stats in query_stats.values()]
+    for row in rows:
+        row['avg_ms'] = row['total_ms'] / row['count'] if row['count'] else 0
+    if sort not in ('total_ms', 'avg_ms', 'max_ms', 'count', 'slow_count'):
+        sort = 'total_ms'
+    rows.sort(key=lambda row: row[sort], reverse=True)
+    return rows[:limit]
+
+def reset_query_stats():
+    with query_stats_lock:
+        query_stats.clear()
+        slow_queries.clear()
+
+def add_column_if_missing(c, table, column, definition):
+    """Add a column to an existing table when an older database lacks it"""
+    c.execute(f"PRAGMA table_info({table})")
+    if column not in [row[1] for row in c.fetchall()]:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+# Row records
+@lru_cache(maxsize=256)
+def record_type(columns):
+    """Tuple-backed row class for a column list, readable as row.name, row['name'] or row.get('name')"""
+    base = namedtuple('Record', columns, rename=True)
+    
+    class Record(base):
+        __slots__ = ()
+        
+        def __getitem__(self, key):
+            if isinstance(key, str):
+                try:
+                    return getattr(self, key)
+                except AttributeError:
+                    raise KeyError(key)
+            return tuple.__getitem__(self, key)
+        
+        def get(self, key, default=None):
+            return getattr(self, key, default)
+        
+        def keys(self):
+            return self._fields
+    
+    return Record
+
+def fetch_records(c):
+    """Fetch the rest of c's result set as records, with the row class built once per cursor"""
+    record = record_type(tuple(column[0] for column in c.description))
+    return list(map(record._make, c.fetchall()))
+
+def init_urls_table(c):
+    """Create the urls table and its indexes, adding columns newer code expects"""
     # Main URLs table
     c.execute('''CREATE TABLE IF NOT EXISTS urls
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -42,21 +435,281 @@ def init_db():
                   category TEXT,
                   tags TEXT)''')
     
+    # Create indexes for better performance
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_urls_domain ON urls(domain)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_urls_category ON urls(category)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_urls_rating ON urls(rating)''')
+    # Lets ranked queries walk rows in clicks order and stop at their LIMIT (see search_urls)
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_urls_clicks ON urls(clicks, rating)''')
+    # Feed batches continue from a (sort key, id) cursor with a range scan (see get_feed);
+    # the keys are COALESCEd so rows with a NULL rating or created_at still order and page
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_urls_feed_clicks ON urls(COALESCE(clicks, 0), COALESCE(rating, 0))''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_urls_category_feed_clicks ON urls(category, COALESCE(clicks, 0), COALESCE(rating, 0))''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_urls_feed_recent ON urls(COALESCE(created_at, 0))''')
+    
+    # Forward-decayed trending score (see flush_clicks)
+    add_column_if_missing(c, 'urls', 'trending', 'REAL')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_urls_trending ON urls(trending, clicks)''')
+    
+    # Where a category came from: 'rule' (domain keywords) or 'model' (classifier)
+    add_column_if_missing(c, 'urls', 'category_source', 'TEXT')
+    
+    # Image hashes from the image pipeline (see render_images)
+    add_column_if_missing(c, 'urls', 'favicon', 'TEXT')
+    add_column_if_missing(c, 'urls', 'thumbnail', 'TEXT')
+    
+    # Bumped when a versioned column changes so rendered cards can be cached per version
+    # (see CardCache), with last_updated stamped so incremental exports pick up the change.
+    # Hot writes bump it in their own UPDATE (see write_clicks), which skips the trigger;
+    # trending and other unrendered columns never fire it
+    add_column_if_missing(c, 'urls', 'row_version', 'INTEGER DEFAULT 0')
+    c.execute('''DROP TRIGGER IF EXISTS urls_row_version''')
+    c.execute(f'''CREATE TRIGGER urls_row_version AFTER UPDATE OF {', '.join(VERSIONED_COLUMNS)} ON urls
+                 WHEN NEW.row_version = OLD.row_version
+                      AND ({' OR '.join(f'NEW.{column} IS NOT OLD.{column}' for column in VERSIONED_COLUMNS)})
+                 BEGIN
+                     UPDATE urls SET row_version = OLD.row_version + 1,
+                                     last_updated = (julianday('now') - 2440587.5) * 86400.0
+                     WHERE id = OLD.id;
+                 END''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_urls_last_updated ON urls(last_updated, id)''')
+
+# URL aliases
+def alias_key(url):
+    """Key under which variants of a URL collapse
+    
+    The scheme, a leading www., default ports, the fragment and trailing
+    slashes are ignored, so http/https and www/non-www forms share a key.
+    """
+    parsed = urlparse((url or '').strip())
+    host = (parsed.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    if port and port not in (80, 443):
+        host += f':{port}'
+    key = host + parsed.path.rstrip('/')
+    if parsed.query:
+        key += '?' + parsed.query
+    return key
+
+def resolve_url_ids(c, urls):
+    """Map each URL that is an alias of a stored page to that page's id"""
+    keys = {}
+    for url in urls:
+        keys.setdefault(alias_key(url), []).append(url)
+    resolved = {}
+    key_list = list(keys)
+    for i in range(0, len(key_list), 500):
+        chunk = key_list[i:i + 500]
+        c.execute(f"SELECT alias, url_id FROM url_aliases WHERE alias IN ({','.join('?' * len(chunk))})", chunk)
+        for alias, url_id in c.fetchall():
+            for url in keys[alias]:
+                resolved[url] = url_id
+    return resolved
+
+def find_url_id(c, urls):
+    """Id of the stored page any of urls is an alias of, or None"""
+    resolved = resolve_url_ids(c, urls)
+    return next((resolved[url] for url in urls if url in resolved), None)
+
+def add_url_aliases(c, url_id, urls):
+    c.executemany("INSERT OR IGNORE INTO url_aliases (alias, url_id) VALUES (?, ?)",
+                  [(key, url_id) for key in {alias_key(url) for url in urls}])
+
+def backfill_url_aliases():
+    """Give rows stored before url_aliases existed an alias for their own URL"""
+    conn = connect_db()
+    c = conn.cursor()
+    c.execute("SELECT 1 FROM app_state WHERE key = 'url_aliases_migrated'")
+    if not c.fetchone():
+        conn.create_function('alias_key', 1, alias_key, deterministic=True)
+        # Lowest id first, so when older variants collide the first stored one wins
+        c.execute('''INSERT OR IGNORE INTO url_aliases (alias, url_id)
+                     SELECT alias_key(url), id FROM urls ORDER BY id''')
+        c.execute("INSERT INTO app_state (key, value) VALUES ('url_aliases_migrated', 1)")
+        conn.commit()
+    conn.close()
+
+# Domain stats
+#
+# One row per domain with its URL count, total clicks, rating sum and the time
+# it was last crawled, kept current by triggers on every write to urls. The
+# average rating is over rated rows only.
+DOMAIN_STATS_ADD = '''INSERT INTO domain_stats (domain, url_count, clicks, rating_sum, rated_count, last_crawled)
+                      SELECT NEW.domain, 1, COALESCE(NEW.clicks, 0), COALESCE(NEW.rating, 0),
+                             COALESCE(NEW.rating, 0) > 0, NEW.created_at
+                      WHERE NEW.domain IS NOT NULL
+                      ON CONFLICT(domain) DO UPDATE SET
+                          url_count = url_count + 1,
+                          clicks = clicks + excluded.clicks,
+                          rating_sum = rating_sum + excluded.rating_sum,
+                          rated_count = rated_count + excluded.rated_count,
+                          last_crawled = MAX(COALESCE(last_crawled, excluded.last_crawled),
+                                             COALESCE(excluded.last_crawled, last_crawled));'''
+DOMAIN_STATS_REMOVE = '''UPDATE domain_stats SET
+                             url_count = url_count - 1,
+                             clicks = clicks - COALESCE(OLD.clicks, 0),
+                             rating_sum = rating_sum - COALESCE(OLD.rating, 0),
+                             rated_count = rated_count - (COALESCE(OLD.rating, 0) > 0)
+                         WHERE domain = OLD.domain;
+                         DELETE FROM domain_stats WHERE domain = OLD.domain AND url_count <= 0;'''
+DOMAIN_STATS_UPDATE = '''UPDATE domain_stats SET
+                             clicks = clicks + COALESCE(NEW.clicks, 0) - COALESCE(OLD.clicks, 0),
+                             rating_sum = rating_sum + COALESCE(NEW.rating, 0) - COALESCE(OLD.rating, 0),
+                             rated_count = rated_count + (COALESCE(NEW.rating, 0) > 0) - (COALESCE(OLD.rating, 0) > 0)
+                         WHERE domain = NEW.domain;'''
+
+def domain_stats_triggers():
+    """CREATE TRIGGER statements that keep domain_stats current for writes to urls"""
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS urls_insert_domain_stats AFTER INSERT ON urls BEGIN {DOMAIN_STATS_ADD} END",
+        f"CREATE TRIGGER IF NOT EXISTS urls_delete_domain_stats AFTER DELETE ON urls BEGIN {DOMAIN_STATS_REMOVE} END",
+        # Only writes that change the totals touch domain_stats, not trending or image updates
+        f"""CREATE TRIGGER IF NOT EXISTS urls_update_domain_stats AFTER UPDATE OF clicks, rating ON urls
+            WHEN OLD.domain IS NEW.domain AND (OLD.clicks IS NOT NEW.clicks OR OLD.rating IS NOT NEW.rating)
+            BEGIN {DOMAIN_STATS_UPDATE} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS urls_move_domain_stats AFTER UPDATE OF domain ON urls
+            WHEN OLD.domain IS NOT NEW.domain
+            BEGIN {DOMAIN_STATS_REMOVE} {DOMAIN_STATS_ADD} END"""
+    ]
+
+def rebuild_domain_stats(c):
+    """Recompute domain_stats from urls"""
+    c.execute("DELETE FROM domain_stats")
+    c.execute('''INSERT INTO domain_stats (domain, url_count, clicks, rating_sum, rated_count, last_crawled)
+                 SELECT domain, COUNT(*), COALESCE(SUM(clicks), 0), COALESCE(SUM(rating), 0),
+                        SUM(rating > 0), MAX(created_at)
+                 FROM urls WHERE domain IS NOT NULL GROUP BY domain''')
+    return c.rowcount
+
+def backfill_domain_stats():
+    """Fill domain_stats once for databases that only had popular_domains"""
+    conn = connect_db()
+    c = conn.cursor()
+    c.execute("SELECT 1 FROM app_state WHERE key = 'domain_stats_migrated'")
+    if not c.fetchone():
+        rebuild_domain_stats(c)
+        c.execute("DROP TABLE IF EXISTS popular_domains")
+        c.execute("INSERT INTO app_state (key, value) VALUES ('domain_stats_migrated', 1)")
+        conn.commit()
+    conn.close()
+
+# Database setup with improved schema
+def init_db():
+    conn = connect_db()
+    c = conn.cursor()
+    
+    # Only takes effect on a new file; older ones are switched by `flask maintenance --full-vacuum`
+    c.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    # Readers no longer wait on the writer's commits; the mode is stored in the file, and
+    # the log it adds is truncated by the checkpoint maintenance task
+    c.execute("PRAGMA journal_mode = WAL")
+    init_urls_table(c)
+    
     # Categories table
     c.execute('''CREATE TABLE IF NOT EXISTS categories
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
                   name TEXT UNIQUE,
                   description TEXT)''')
     
-    # Popular domains table
-    c.execute('''CREATE TABLE IF NOT EXISTS popular_domains
+    # Per-domain totals for the domain page and sidebars (see domain_stats_triggers)
+    c.execute('''CREATE TABLE IF NOT EXISTS domain_stats
+                 (domain TEXT PRIMARY KEY,
+                  url_count INTEGER DEFAULT 0,
+                  clicks INTEGER DEFAULT 0,
+                  rating_sum REAL DEFAULT 0,
+                  rated_count INTEGER DEFAULT 0,
+                  last_crawled REAL)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_domain_stats_url_count ON domain_stats(url_count)''')
+    for statement in domain_stats_triggers():
+        c.execute(statement)
+    
+    # One favicon per domain, shared by its rows
+    c.execute('''CREATE TABLE IF NOT EXISTS domain_icons
                  (domain TEXT PRIMARY KEY,
-                  count INTEGER DEFAULT 1)''')
+                  favicon TEXT,
+                  fetched_at REAL)''')
     
-    # Create indexes for better performance
-    c.execute('''CREATE INDEX IF NOT EXISTS idx_urls_domain ON urls(domain)''')
-    c.execute('''CREATE INDEX IF NOT EXISTS idx_urls_category ON urls(category)''')
-    c.execute('''CREATE INDEX IF NOT EXISTS idx_urls_rating ON urls(rating)''')
+    # Hourly click windows (see flush_clicks), replayed by rebuild_trending
+    c.execute('''CREATE TABLE IF NOT EXISTS click_windows
+                 (url_id INTEGER,
+                  window_start INTEGER,
+                  clicks INTEGER DEFAULT 0,
+                  PRIMARY KEY (url_id, window_start))''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_click_windows_start ON click_windows(window_start)''')
+    
+    # Corpus document frequencies for keyword tags, plus small named counters
+    c.execute('''CREATE TABLE IF NOT EXISTS term_stats
+                 (term TEXT PRIMARY KEY,
+                  df INTEGER DEFAULT 0) WITHOUT ROWID''')
+    c.execute('''CREATE TABLE IF NOT EXISTS app_state
+                 (key TEXT PRIMARY KEY,
+                  value)''')
+    
+    # One row per maintenance task run (see Maintenance)
+    c.execute('''CREATE TABLE IF NOT EXISTS maintenance_log
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  task TEXT,
+                  started_at REAL,
+                  duration_ms REAL,
+                  status TEXT,
+                  bytes_before INTEGER,
+                  bytes_after INTEGER,
+                  details TEXT)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_maintenance_log_task ON maintenance_log(task, started_at)''')
+    
+    # Normalised tags; url_count is kept current by the triggers below
+    c.execute('''CREATE TABLE IF NOT EXISTS tags
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  name TEXT UNIQUE,
+                  url_count INTEGER DEFAULT 0)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS url_tags
+                 (url_id INTEGER,
+                  tag_id INTEGER,
+                  PRIMARY KEY (url_id, tag_id)) WITHOUT ROWID''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_url_tags_tag ON url_tags(tag_id, url_id)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_tags_url_count ON tags(url_count)''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS url_tags_insert AFTER INSERT ON url_tags
+                 BEGIN
+                     UPDATE tags SET url_count = url_count + 1 WHERE id = NEW.tag_id;
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS url_tags_delete AFTER DELETE ON url_tags
+                 BEGIN
+                     UPDATE tags SET url_count = url_count - 1 WHERE id = OLD.tag_id;
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS urls_delete_tags AFTER DELETE ON urls
+                 BEGIN
+                     DELETE FROM url_tags WHERE url_id = OLD.id;
+                 END''')
+    
+    # Every URL a page was submitted, redirected or canonicalised as, keyed by alias_key
+    c.execute('''CREATE TABLE IF NOT EXISTS url_aliases
+                 (alias TEXT PRIMARY KEY,
+                  url_id INTEGER) WITHOUT ROWID''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_url_aliases_url_id ON url_aliases(url_id)''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS urls_delete_aliases AFTER DELETE ON urls
+                 BEGIN
+                     DELETE FROM url_aliases WHERE url_id = OLD.id;
+                 END''')
+    
+    # Older databases only have the comma-joined urls.tags column
+    c.execute("SELECT 1 FROM app_state WHERE key = 'url_tags_migrated'")
+    if not c.fetchone():
+        split_tags = '''WITH RECURSIVE split(url_id, tag, rest) AS (
+                            SELECT id, '', tags || ',' FROM urls WHERE tags IS NOT NULL
+                            UNION ALL
+                            SELECT url_id, LOWER(TRIM(SUBSTR(rest, 1, INSTR(rest, ',') - 1))), SUBSTR(rest, INSTR(rest, ',') + 1)
+                            FROM split WHERE rest != ''
+                        )'''
+        c.execute(f'''INSERT OR IGNORE INTO tags (name)
+                      {split_tags} SELECT DISTINCT tag FROM split WHERE LENGTH(tag) > 0''')
+        c.execute(f'''INSERT OR IGNORE INTO url_tags (url_id, tag_id)
+                      {split_tags} SELECT split.url_id, tags.id FROM split JOIN tags ON tags.name = split.tag''')
+        c.execute("INSERT INTO app_state (key, value) VALUES ('url_tags_migrated', 1)")
     
     # Insert default categories if they don't exist
     default_categories = [
@@ -73,22 +726,448 @@ def init_db():
     
     conn.commit()
     conn.close()
+    backfill_url_aliases()
+    backfill_domain_stats()
+
+if not POOL_WORKER:
+    init_db()
+
+# Read replica
+class ReadReplica:
+    """In-memory snapshot of the database for read-only helpers
+    
+    Each refresh copies the file into a new named in-memory database with
+    Connection.backup() and then swaps it in, so readers never see a partial
+    copy. Refreshes happen at most once per half staleness bound, and only
+    when PRAGMA data_version shows another connection has committed since
+    the last one.
+    """
+    def __init__(self, max_staleness=READ_REPLICA_MAX_STALENESS):
+        self.max_staleness = max_staleness
+        self.lock = threading.Lock()
+        self.source = sqlite3.connect(DATA_FILE, check_same_thread=False)
+        self.generation = 0
+        self.uri = None
+        self.holder = None
+        self.data_version = None
+        self.refreshed_at = 0
+        self.refresh_count = 0
+        self.last_refresh_ms = 0
+    
+    @property
+    def ready(self):
+        return self.uri is not None
+    
+    def refresh(self):
+        start = time.perf_counter()
+        data_version = self.source.execute("PRAGMA data_version").fetchone()[0]
+        uri = f"file:replica-{os.getpid()}-{self.generation + 1}?mode=memory&cache=shared"
+        snapshot = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self.source.backup(snapshot)
+        
+        with self.lock:
+            old_holder = self.holder
+            self.generation += 1
+            self.uri, self.holder = uri, snapshot
+            self.data_version = data_version
+        # Connections still reading the old copy keep it alive until they close
+        if old_holder:
+            old_holder.close()
+        
+        self.refreshed_at = time.time()
+        self.refresh_count += 1
+        self.last_refresh_ms = (time.perf_counter() - start) * 1000
+    
+    def is_stale(self):
+        return self.source.execute("PRAGMA data_version").fetchone()[0] != self.data_version
+    
+    def run_forever(self):
+        while True:
+            try:
+                if not self.ready or self.is_stale():
+                    self.refresh()
+            except Exception as e:
+                print(f"Error refreshing read replica: {str(e)}")
+            time.sleep(self.max_staleness / 2)
+    
+    def connect(self):
+        # Opened under the lock: once refresh has swapped generations it closes the old
+        # holder, and a shared-cache database whose last connection closes is gone
+        with self.lock:
+            conn = sqlite3.connect(self.uri, uri=True, factory=InstrumentedConnection)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+    
+    def stats(self):
+        return {
+            'generation': self.generation,
+            'age_s': round(time.time() - self.refreshed_at, 1) if self.ready else None,
+            'refresh_count': self.refresh_count,
+            'last_refresh_ms': round(self.last_refresh_ms, 1)
+        }
+
+read_replica = ReadReplica() if READ_REPLICA else None
 
-init_db()
+def connect_read():
+    """Connection for read-only helpers: the replica when enabled and loaded, else the file"""
+    if read_replica and read_replica.ready:
+        return read_replica.connect()
+    return connect_db()
+
+if read_replica and not POOL_WORKER:
+    replica_thread = threading.Thread(target=read_replica.run_forever)
+    replica_thread.daemon = True
+    replica_thread.start()
+
+# Single database writer
+class DBWriter:
+    """Runs every write on one connection, grouping queued operations into shared commits
+    
+    Callers submit a function that takes a cursor and get a Future back. Each
+    operation runs inside its own SAVEPOINT, so one that fails is rolled back
+    alone, and all futures in a batch resolve once their commit succeeds.
+    Whatever queues up while a commit is in progress becomes the next batch,
+    so batches grow with load instead of waiting on a timer.
+    """
+    def __init__(self, max_batch=WRITE_BATCH_MAX, max_queue=WRITE_QUEUE_MAX):
+        self.max_batch = max_batch
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.operations = 0
+        self.failed = 0
+        self.failed_commits = 0
+        self.commit_ms = 0.0
+        self.batch_sizes = deque(maxlen=1000)
+        self.queue_waits = deque(maxlen=1000)
+    
+    def submit(self, fn, *args):
+        future = Future()
+        self.queue.put((fn, args, future, time.perf_counter()))
+        return future
+    
+    def run(self, fn, *args):
+        """Submit an operation and wait for it to be committed"""
+        return self.submit(fn, *args).result()
+    
+    def next_batch(self):
+        batch = [self.queue.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def write_batch(self, conn, batch):
+        c = conn.cursor()
+        started = time.perf_counter()
+        results = []
+        c.execute("BEGIN IMMEDIATE")
+        for fn, args, future, queued_at in batch:
+            self.queue_waits.append(started - queued_at)
+            c.execute("SAVEPOINT operation")
+            try:
+                results.append((future, fn(c, *args), None))
+                c.execute("RELEASE operation")
+            except Exception as e:
+                c.execute("ROLLBACK TO operation")
+                c.execute("RELEASE operation")
+                results.append((future, None, e))
+        conn.commit()
+        
+        with self.lock:
+            self.batches += 1
+            self.operations += len(batch)
+            self.failed += sum(1 for _, _, error in results if error is not None)
+            self.commit_ms += (time.perf_counter() - started) * 1000
+            self.batch_sizes.append(len(batch))
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+    
+    def run_forever(self):
+        conn = connect_db()
+        conn.isolation_level = None
+        while True:
+            batch = self.next_batch()
+            try:
+                self.write_batch(conn, batch)
+            except Exception as e:
+                print(f"Error committing write batch: {str(e)}")
+                if conn.in_transaction:
+                    conn.rollback()
+                with self.lock:
+                    self.failed_commits += 1
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+    
+    def metrics(self):
+        with self.lock:
+            sizes = sorted(self.batch_sizes)
+            waits = sorted(self.queue_waits)
+            return {
+                'queue_depth': self.queue.qsize(),
+                'batches': self.batches,
+                'operations': self.operations,
+                'failed_operations': self.failed,
+                'failed_commits': self.failed_commits,
+                'avg_batch_size': round(self.operations / self.batches, 2) if self.batches else 0,
+                'max_batch_size': sizes[-1] if sizes else 0,
+                'p50_batch_size': sizes[len(sizes) // 2] if sizes else 0,
+                'avg_commit_ms': round(self.commit_ms / self.batches, 3) if self.batches else 0,
+                'p50_queue_wait_ms': round(waits[len(waits) // 2] * 1000, 3) if waits else 0,
+                'p95_queue_wait_ms': round(waits[int(len(waits) * 0.95)] * 1000, 3) if waits else 0,
+                'max_queue_wait_ms': round(waits[-1] * 1000, 3) if waits else 0
+            }
+
+db_writer = DBWriter()
+writer_thread = threading.Thread(target=db_writer.run_forever)
+writer_thread.daemon = True
+if not POOL_WORKER:
+    writer_thread.start()
+
+# Database maintenance
+def database_bytes():
+    return os.path.getsize(DATA_FILE) if os.path.exists(DATA_FILE) else 0
+
+def stat_rows(c):
+    """Rows in sqlite_stat1, i.e. how many indexes have planner stats"""
+    if not c.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        return 0
+    return c.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0]
+
+def optimize_db(c):
+    # Only re-analyses tables whose stats look stale
+    c.execute(f"PRAGMA analysis_limit = {MAINTENANCE_ANALYSIS_LIMIT}")
+    c.execute("PRAGMA optimize")
+    return {'stat_rows': stat_rows(c)}
+
+def analyze_db(c):
+    c.execute(f"PRAGMA analysis_limit = {MAINTENANCE_ANALYSIS_LIMIT}")
+    c.execute("ANALYZE")
+    return {'stat_rows': stat_rows(c)}
+
+def vacuum_db(c, max_pages=MAINTENANCE_VACUUM_PAGES):
+    """Return up to max_pages free pages to the filesystem"""
+    if c.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return {'skipped': 'not incremental, run `flask maintenance --full-vacuum`'}
+    before = c.execute("PRAGMA freelist_count").fetchone()[0]
+    # sqlite3 resets the statement after its first step, so each call frees one page
+    for _ in range(min(before, max_pages)):
+        c.execute("PRAGMA incremental_vacuum")
+    after = c.execute("PRAGMA freelist_count").fetchone()[0]
+    page_size = c.execute("PRAGMA page_size").fetchone()[0]
+    return {'pages_freed': before - after, 'bytes_freed': (before - after) * page_size, 'free_pages_left': after}
+
+def full_vacuum():
+    """Switch the file to incremental auto-vacuum and rebuild it; blocks all access while it runs"""
+    conn = sqlite3.connect(DATA_FILE, isolation_level=None)
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    conn.close()
+    return {'path': DATA_FILE}
+
+def checkpoint_db():
+    """Checkpoint and truncate the write-ahead log when the database uses one"""
+    conn = connect_db()
+    mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    if mode != 'wal':
+        conn.close()
+        return {'journal_mode': mode, 'skipped': True}
+    busy, log_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    conn.close()
+    return {'journal_mode': mode, 'busy': busy, 'log_pages': log_pages, 'checkpointed': checkpointed}
+
+def backup_file(path, target):
+    """Copy one database file with the online backup API in throttled steps
+    
+    A write from another connection restarts a backup, so after
+    BACKUP_MAX_RESTARTS restarts the copy is finished in a single step.
+    """
+    state = {'remaining': None, 'restarts': 0}
+    
+    def progress(status, remaining, total):
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > BACKUP_MAX_RESTARTS:
+                raise RuntimeError('too many restarts')
+        state['remaining'] = remaining
+        time.sleep(BACKUP_STEP_SLEEP)
+    
+    source = sqlite3.connect(path)
+    dest = sqlite3.connect(target)
+    try:
+        try:
+            source.backup(dest, pages=BACKUP_STEP_PAGES, progress=progress)
+            single_step = False
+        except RuntimeError:
+            source.backup(dest)
+            single_step = True
+        pages = dest.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        dest.close()
+        source.close()
+    return {'pages': pages, 'restarts': state['restarts'], 'single_step': single_step}
+
+def backup_db(keep=BACKUP_KEEP):
+    """Hot-copy the database into a new timestamped directory under BACKUP_DIR"""
+    name = datetime.now().strftime('%Y%m%d-%H%M%S')
+    staging = os.path.join(BACKUP_DIR, name + '.tmp')
+    os.makedirs(staging, exist_ok=True)
+    filename = os.path.basename(DATA_FILE)
+    files = {filename: backup_file(DATA_FILE, os.path.join(staging, filename))}
+    target = os.path.join(BACKUP_DIR, name)
+    os.replace(staging, target)
+    
+    # Keep the newest backups only
+    backups = sorted(entry for entry in os.listdir(BACKUP_DIR) if not entry.endswith('.tmp'))
+    for old in backups[:-keep] if keep else []:
+        old_path = os.path.join(BACKUP_DIR, old)
+        for entry in os.listdir(old_path):
+            os.remove(os.path.join(old_path, entry))
+        os.rmdir(old_path)
+    return {'path': target, 'files': files}
+
+def record_maintenance(c, task, started_at, duration_ms, status, bytes_before, bytes_after, details):
+    c.execute('''INSERT INTO maintenance_log
+                 (task, started_at, duration_ms, status, bytes_before, bytes_after, details)
+                 VALUES (?, ?, ?, ?, ?, ?, ?)''',
+              (task, started_at, duration_ms, status, bytes_before, bytes_after, json.dumps(details)))
+    c.execute("DELETE FROM maintenance_log WHERE id <= ?", (c.lastrowid - MAINTENANCE_LOG_KEEP,))
+
+class Maintenance:
+    """Runs ANALYZE, incremental vacuum, WAL checkpoints and backups when traffic is quiet
+    
+    Statements that write go through db_writer so they queue behind regular
+    writes instead of contending for the lock. Backups read through their own
+    connections, one throttled step at a time.
+    """
+    def __init__(self, intervals=MAINTENANCE_INTERVALS):
+        self.intervals = intervals
+        self.tasks = {
+            'optimize': lambda: db_writer.run(optimize_db),
+            'analyze': lambda: db_writer.run(analyze_db),
+            'vacuum': lambda: db_writer.run(vacuum_db),
+            'checkpoint': checkpoint_db,
+            'backup': backup_db,
+            'full_vacuum': full_vacuum
+        }
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.last_requests = 0
+        self.last_check = time.time()
+        self.quiet = False
+        self.last_run = {}
+    
+    def load_last_runs(self):
+        conn = connect_db()
+        c = conn.cursor()
+        c.execute("SELECT task, MAX(started_at) FROM maintenance_log WHERE status = 'ok' GROUP BY task")
+        self.last_run = dict(c.fetchall())
+        conn.close()
+    
+    def check_quiet(self):
+        now = time.time()
+        requests_per_minute = (self.requests - self.last_requests) * 60 / max(now - self.last_check, 1)
+        self.last_requests = self.requests
+        self.last_check = now
+        self.quiet = requests_per_minute < MAINTENANCE_QUIET_RPM and db_writer.queue.qsize() == 0
+        return self.quiet
+    
+    def run_task(self, task):
+        """Run one task now and record how long it took and what it changed"""
+        with self.lock:
+            started_at = time.time()
+            start = time.perf_counter()
+            bytes_before = database_bytes()
+            try:
+                details = self.tasks[task]()
+                status = 'ok'
+            except Exception as e:
+                print(f"Error running maintenance task {task}: {str(e)}")
+                details = {'error': str(e)}
+                status = 'error'
+            duration_ms = (time.perf_counter() - start) * 1000
+            bytes_after = database_bytes()
+            db_writer.run(record_maintenance, task, started_at, duration_ms, status,
+                          bytes_before, bytes_after, details)
+            if status == 'ok':
+                self.last_run[task] = started_at
+            return {'task': task, 'status': status, 'duration_ms': round(duration_ms, 1),
+                    'bytes_before': bytes_before, 'bytes_after': bytes_after, 'details': details}
+    
+    def run_due(self):
+        quiet = self.check_quiet()
+        now = time.time()
+        for task, interval in self.intervals.items():
+            age = now - self.last_run.get(task, 0)
+            if age >= interval and (quiet or age >= 2 * interval):
+                self.run_task(task)
+    
+    def run_forever(self):
+        try:
+            self.load_last_runs()
+        except Exception as e:
+            print(f"Error loading maintenance history: {str(e)}")
+        while True:
+            time.sleep(MAINTENANCE_CHECK_INTERVAL)
+            try:
+                self.run_due()
+            except Exception as e:
+                print(f"Error in maintenance scheduler: {str(e)}")
+    
+    def stats(self):
+        conn = connect_read()
+        c = conn.cursor()
+        c.execute('''SELECT task, started_at, duration_ms, status, bytes_before, bytes_after, details
+                     FROM maintenance_log WHERE id IN (SELECT MAX(id) FROM maintenance_log GROUP BY task)''')
+        last = {row[0]: {'started_at': row[1], 'duration_ms': round(row[2], 1), 'status': row[3],
+                         'bytes_before': row[4], 'bytes_after': row[5], 'details': json.loads(row[6])}
+                for row in c.fetchall()}
+        conn.close()
+        return {'quiet': self.quiet, 'last': last}
+
+maintenance = Maintenance()
+
+@app.before_request
+def count_request():
+    # Read by the maintenance scheduler to spot quiet periods; warm-up requests are not traffic
+    if not request.environ.get('warmup'):
+        maintenance.requests += 1
+
+maintenance_thread = threading.Thread(target=maintenance.run_forever)
+maintenance_thread.daemon = True
+if not POOL_WORKER:
+    maintenance_thread.start()
+
+@app.cli.command('maintenance')
+@click.option('--task', 'tasks', multiple=True, type=click.Choice(sorted(MAINTENANCE_INTERVALS)),
+              help='Task to run (repeatable), all scheduled tasks by default.')
+@click.option('--full-vacuum', is_flag=True,
+              help='Rebuild every file with incremental auto-vacuum enabled. Blocks the database while it runs.')
+def maintenance_command(tasks, full_vacuum):
+    """Run database maintenance tasks now and print what they did."""
+    for task in (['full_vacuum'] if full_vacuum else []) + list(tasks or MAINTENANCE_INTERVALS):
+        result = maintenance.run_task(task)
+        print(json.dumps(result))
 
 def is_duplicate_url(url):
     """Check if URL already exists in database or processing queue"""
     try:
         # Basic normalization
-        url = url.strip().lower()
-        if not url.startswith(('http://', 'https://')):
+        url = url.strip()
+        if not url.lower().startswith(('http://', 'https://')):
             url = 'http://' + url
-        url = url.rstrip('/')
+        key = alias_key(url)
         
-        # Check in database
-        conn = sqlite3.connect(DATA_FILE)
+        # Check in database, under any known alias
+        conn = connect_db()
         c = conn.cursor()
-        c.execute("SELECT 1 FROM urls WHERE url = ?", (url,))
+        c.execute("SELECT 1 FROM url_aliases WHERE alias = ?", (key,))
         if c.fetchone():
             conn.close()
             return True
@@ -98,7 +1177,7 @@ def is_duplicate_url(url):
         if os.path.exists(URLS_FILE):
             with open(URLS_FILE, 'r') as f:
                 for line in f:
-                    if line.strip() and line.strip().lower() == url:
+                    if line.strip() and alias_key(line) == key:
                         return True
         return False
         
@@ -106,138 +1185,1051 @@ def is_duplicate_url(url):
         print(f"Error checking duplicate URL: {str(e)}")
         return False
 
-# Thread pool for URL processing
-executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+# Favicons and preview thumbnails
+def image_file_name(digest, size, ext):
+    return f"{digest}-{size}.{ext}"
 
-def process_url(url):
-    """Process a single URL and extract metadata"""
+def same_site_canonical(canonical, page_url):
+    """The page's rel=canonical URL, if it is a valid URL on the same site"""
+    if not canonical or not canonical.startswith(('http://', 'https://')) or not validators.url(canonical):
+        return None
+    # Cross-site canonicals (syndicated copies) would merge unrelated pages
+    if alias_key(canonical).split('/', 1)[0] != alias_key(page_url).split('/', 1)[0]:
+        return None
+    return canonical
+
+def fetch_image(url):
+    """Download an image, giving up on anything larger than IMAGE_MAX_BYTES"""
+    response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0 (compatible; Yamajodo image fetcher)'},
+                            timeout=IMAGE_TIMEOUT, stream=True)
     try:
+        response.raise_for_status()
+        data = bytearray()
+        for chunk in response.iter_content(65536):
+            data.extend(chunk)
+            if len(data) > IMAGE_MAX_BYTES:
+                raise ValueError(f"image larger than {IMAGE_MAX_BYTES} bytes")
+        return bytes(data)
+    finally:
+        response.close()
+
+def render_images(data, sizes, ext, crop=False):
+    """Write resized copies of an image named by the hash of its bytes and return the hash
+    
+    Identical source images map to the same files, so they are only decoded
+    and encoded once however many pages use them.
+    """
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    missing = [size for size in sizes
+               if not os.path.exists(os.path.join(IMAGE_DIR, image_file_name(digest, size, ext)))]
+    if not missing:
+        return digest
+    
+    with Image.open(io.BytesIO(data)) as image:
+        # Image.open only reads the header, so this runs before any decoding
+        if image.width * image.height > IMAGE_MAX_PIXELS:
+            raise ValueError(f"image too large ({image.width}x{image.height})")
+        image = image.convert('RGBA')
+    
+    for size in missing:
+        if crop:
+            resized = ImageOps.fit(image, (size, size * 9 // 16), Image.Resampling.LANCZOS)
+        else:
+            resized = image.resize((size, size), Image.Resampling.LANCZOS)
+        path = os.path.join(IMAGE_DIR, image_file_name(digest, size, ext))
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        if ext == 'webp':
+            resized.save(temp_path, format='WEBP', quality=IMAGE_WEBP_QUALITY, method=4)
+        else:
+            resized.save(temp_path, format='PNG', optimize=True)
+        # Readers only ever see complete files
+        os.replace(temp_path, path)
+    return digest
+
+def store_domain_icon(c, domain, favicon):
+    c.execute("INSERT OR REPLACE INTO domain_icons (domain, favicon, fetched_at) VALUES (?, ?, ?)",
+              (domain, favicon, time.time()))
+
+def store_url_images(c, url_id, favicon, thumbnail):
+    c.execute("UPDATE urls SET favicon = ?, thumbnail = ? WHERE id = ?", (favicon, thumbnail, url_id))
+
+class ImagePipeline:
+    """Fetches and resizes favicons and preview images for new rows in the background
+    
+    Work runs on a small thread pool with a fixed number of queued jobs;
+    when it is full new jobs are dropped rather than slowing the crawler.
+    Favicons are fetched once per domain (per FAVICON_MAX_AGE) and shared
+    by every row from that domain.
+    """
+    def __init__(self, workers=IMAGE_WORKERS, max_pending=IMAGE_MAX_PENDING):
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.lock = threading.Lock()
+        self.domain_locks = {}      # domain -> [lock, threads using it]
+        self.dropped = 0
+    
+    def enqueue(self, url_id, domain, favicon_url, image_url):
+        if not self.slots.acquire(blocking=False):
+            self.dropped += 1
+            return False
+        future = self.pool.submit(self.process, url_id, domain, favicon_url, image_url)
+        future.add_done_callback(lambda _: self.slots.release())
+        return True
+    
+    def domain_favicon(self, domain, favicon_url):
+        # One lock per domain while any thread uses it; the count keeps it from being
+        # dropped while others wait on it, and the last user removes it
+        with self.lock:
+            entry = self.domain_locks.setdefault(domain, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                conn = connect_db()
+                c = conn.cursor()
+                c.execute("SELECT favicon, fetched_at FROM domain_icons WHERE domain = ?", (domain,))
+                row = c.fetchone()
+                conn.close()
+                if row and time.time() - row[1] < FAVICON_MAX_AGE:
+                    return row[0]
+                
+                try:
+                    favicon = render_images(fetch_image(favicon_url), FAVICON_SIZES, 'png')
+                except Exception as e:
+                    print(f"Error fetching favicon for {domain}: {str(e)}")
+                    favicon = None
+                # Failures are remembered too, so a domain without an icon is not retried for every page
+                db_writer.run(store_domain_icon, domain, favicon)
+                return favicon
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self.domain_locks[domain]
+    
+    def process(self, url_id, domain, favicon_url, image_url):
+        try:
+            favicon = self.domain_favicon(domain, favicon_url)
+            thumbnail = None
+            if image_url:
+                try:
+                    thumbnail = render_images(fetch_image(image_url), THUMBNAIL_SIZES, 'webp', crop=True)
+                except Exception as e:
+                    print(f"Error fetching preview image {image_url}: {str(e)}")
+            if favicon or thumbnail:
+                db_writer.run(store_url_images, url_id, favicon, thumbnail)
+        except Exception as e:
+            print(f"Error processing images for URL {url_id}: {str(e)}")
+
+image_pipeline = ImagePipeline()
+
+def store_url(c, url, title, description, domain, category, category_source, tags, tokens, aliases):
+    """Writer operation: insert a crawled page with its tags and aliases and return (url_id, tags)
+    
+    Returns None instead when one of the aliases already belongs to a stored
+    page; the new aliases are added to that page.
+    """
+    existing = find_url_id(c, [url] + aliases)
+    if existing is not None:
+        add_url_aliases(c, existing, aliases)
+        return None
+    
+    # Then the page's most distinctive keywords
+    for keyword in extract_keywords(c, tokens):
+        if keyword not in tags:
+            tags.append(keyword)
+        
+    tags = ','.join(tags[:MAX_TAGS]) if tags else None
+    
+    timestamp = time.time()
+    
+    # Insert into database
+    c.execute('''INSERT INTO urls 
+                 (url, title, description, domain, created_at, last_updated, category, category_source, tags)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+              (url, title, description, domain, timestamp, timestamp, category, category_source, tags))
+    url_id = c.lastrowid
+    set_url_tags(c, url_id, tags)
+    add_url_aliases(c, url_id, [url] + aliases)
+    return url_id, tags
+
+# Staged crawler
+_CHARSET_RE = re.compile(r'charset=["\']?([\w.:-]+)', re.I)
+
+def fetch_page(url):
+    """Fetch stage: download a page and return (final URL, raw body, charset from the headers)"""
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+    response = requests.get(url, headers=headers, timeout=15)
+    charset = _CHARSET_RE.search(response.headers.get('Content-Type', ''))
+    return response.url, response.content, charset.group(1) if charset else None
+
+def build_page(final_url, parsed):
+    """Turn the fields a parser process extracted (see page_parser) into what store_url needs"""
+    # Store the page under its canonical URL; the caller keeps the others as aliases
+    url = same_site_canonical(parsed['canonical_url'], final_url) or final_url
+    domain = urlparse(url).netloc
+    title = parsed['title'] or url
+    description = parsed['description']
+    category = None
+    
+    # Auto-detect category based on domain
+    domain_parts = domain.split('.')
+    if len(domain_parts) > 1:
+        main_domain = domain_parts[-2]
+        
+        # Simple domain to category mapping
+        domain_categories = {
+            'news': 'News',
+            'tech': 'Technology',
+            'edu': 'Education',
+            'shop': 'Shopping',
+            'blog': 'Education',
+            'social': 'Social'
+        }
+        
+        for key, cat in domain_categories.items():
+            if key in main_domain:
+                category = cat
+                break
+    category_source = 'rule' if category else None
+    
+    return {
+        'url': url,
+        'title': title[:255],
+        'description': description[:500],
+        'domain': domain,
+        'category': category,
+        'category_source': category_source,
+        # Auto-generate some tags
+        'tags': rule_tags(domain, title),
+        'tokens': tokenize(title) + tokenize(description),
+        'favicon_url': parsed['favicon_url'],
+        'image_url': parsed['image_url']
+    }
+
+class CrawlPipeline:
+    """Fetch threads feeding a process pool of parsers feeding the database writer
+    
+    Fetching is I/O-bound and runs on fetch_workers threads that take URLs
+    from a bounded queue. Parsing holds the GIL, so raw pages go to
+    parse_workers processes, with at most max_parsing pages queued or being
+    parsed; fetchers wait when that is full. If a parser process dies, the
+    pages on its pool fail and the next submit starts a new pool. Parsed
+    pages are handed to a store thread, since the pool's result callbacks
+    run on its management thread and must not block, and stored through
+    db_writer, which batches them with the other writes. Every submitted URL
+    gets a Future that resolves to True once a new row is stored, or to the
+    exception that failed its post-store steps.
+    """
+    def __init__(self, fetch_workers=MAX_WORKERS, parse_workers=PARSE_WORKERS,
+                 max_fetch_queue=FETCH_QUEUE_MAX, max_parsing=PARSE_QUEUE_MAX):
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers
+        self.max_parsing = max_parsing
+        self.fetch_queue = queue.Queue(maxsize=max_fetch_queue)
+        self.parse_slots = threading.BoundedSemaphore(max_parsing)
+        # Holds at most max_parsing pages, since their parse slots are only released once submitted
+        self.parsed_queue = queue.Queue()
+        self.parser = None
+        self.lock = threading.Lock()
+        self.fetching = 0
+        self.parsing = 0
+        self.storing = 0
+        self.counts = Counter()
+    
+    def start(self):
+        with self.lock:
+            if self.parser is not None:
+                return
+            self.parser = ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=pool_context)
+            for _ in range(self.fetch_workers):
+                worker = threading.Thread(target=self.fetch_forever)
+                worker.daemon = True
+                worker.start()
+            store_thread = threading.Thread(target=self.store_forever)
+            store_thread.daemon = True
+            store_thread.start()
+    
+    def submit(self, url):
+        """Queue a URL for crawling, waiting while the fetch queue is full"""
+        self.start()
+        future = Future()
+        self.fetch_queue.put((url, future))
+        return future
+    
+    def count(self, name, change=1):
+        with self.lock:
+            self.counts[name] += change
+    
+    def replace_parser(self, broken):
+        """Swap a new pool in for one that lost a process, once however many pages failed on it"""
+        with self.lock:
+            if self.parser is not broken:
+                return
+            self.parser = ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=pool_context)
+            self.counts['parser_restarts'] += 1
+        broken.shutdown(wait=False)
+    
+    def submit_parse(self, final_url, content, charset):
+        """Submit a page to the parser pool, replacing the pool first if it is broken"""
+        for attempt in range(2):
+            parser = self.parser
+            try:
+                return parser, parser.submit(page_parser.parse_html, final_url, content, charset)
+            except BrokenProcessPool:
+                if attempt:
+                    raise
+                self.replace_parser(parser)
+    
+    def fetch(self, url):
+        """Return (url, final URL, body, charset), or None for invalid or already stored URLs"""
         # Validate URL format
         if not validators.url(url):
             if not url.startswith(('http://', 'https://')):
                 url = 'http://' + url
             if not validators.url(url):
-                return False
-                
-        parsed = urlparse(url)
-        domain = parsed.netloc
+                return None
         
-        # Check if URL already exists
-        conn = sqlite3.connect(DATA_FILE)
+        # Check if URL already exists, under any alias
+        conn = connect_db()
         c = conn.cursor()
-        c.execute("SELECT 1 FROM urls WHERE url = ?", (url,))
-        exists = c.fetchone()
-        
+        exists = find_url_id(c, [url])
+        conn.close()
         if exists:
-            conn.close()
-            return False
-            
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+            return None
         
-        # Fetch the page
-        response = requests.get(url, headers=headers, timeout=15)
-        soup = BeautifulSoup(response.text, 'html.parser')
+        return (url,) + fetch_page(url)
+    
+    def fetch_forever(self):
+        while True:
+            url, future = self.fetch_queue.get()
+            with self.lock:
+                self.fetching += 1
+            try:
+                fetched = self.fetch(url)
+                if fetched is None:
+                    self.count('skipped')
+            except Exception as e:
+                print(f"Error processing {url}: {str(e)}")
+                fetched = None
+                self.count('fetch_errors')
+            finally:
+                with self.lock:
+                    self.fetching -= 1
+            if fetched is None:
+                future.set_result(False)
+                continue
+            
+            self.count('fetched')
+            self.parse_slots.acquire()
+            with self.lock:
+                self.parsing += 1
+            url, final_url, content, charset = fetched
+            try:
+                parser, parsed = self.submit_parse(final_url, content, charset)
+            except Exception as e:
+                self.parsed_queue.put((url, final_url, future, None, None, e))
+                continue
+            parsed.add_done_callback(lambda parsed, url=url, final_url=final_url, future=future, parser=parser:
+                                     self.parsed_queue.put((url, final_url, future, parser, parsed, None)))
+    
+    def store_forever(self):
+        while True:
+            self.parse_done(*self.parsed_queue.get())
+    
+    def parse_done(self, url, final_url, future, parser, parsed, error=None):
+        """Store thread: submit a parsed page to the writer, waiting while its queue is full"""
+        with self.lock:
+            self.parsing -= 1
+        try:
+            page = build_page(final_url, parsed.result()) if error is None else None
+        except BrokenProcessPool as e:
+            self.replace_parser(parser)
+            error = e
+        except Exception as e:
+            error = e
+        if error is not None:
+            self.parse_slots.release()
+            print(f"Error processing {url}: {str(error)}")
+            self.count('parse_errors')
+            future.set_result(False)
+            return
         
-        # Extract metadata
-        title = soup.title.string if soup.title else url
-        description = ""
-        category = None
-        tags = []
+        self.count('parsed')
+        with self.lock:
+            self.storing += 1
+        try:
+            stored = db_writer.submit(store_url, page['url'], page['title'], page['description'], page['domain'],
+                                      page['category'], page['category_source'], page['tags'], page['tokens'],
+                                      [url, final_url])
+        except Exception as e:
+            print(f"Error processing {url}: {str(e)}")
+            with self.lock:
+                self.storing -= 1
+            self.count('store_errors')
+            future.set_result(False)
+            return
+        finally:
+            self.parse_slots.release()
+        stored.add_done_callback(lambda stored: self.store_done(page, future, stored))
+    
+    def store_done(self, page, future, stored):
+        with self.lock:
+            self.storing -= 1
+        try:
+            result = stored.result()
+        except sqlite3.IntegrityError:
+            # Another worker stored the same URL while this one was fetching
+            result = None
+        except Exception as e:
+            print(f"Error processing {page['url']}: {str(e)}")
+            self.count('store_errors')
+            future.set_result(False)
+            return
+        if result is None:
+            # Another URL already led to this page
+            self.count('duplicates')
+            future.set_result(False)
+            return
         
-        # Get description
-        meta_desc = soup.find('meta', attrs={'name': 'description'}) or \
-                   soup.find('meta', attrs={'property': 'og:description'})
-        if meta_desc:
-            description = meta_desc.get('content', '')
-                
-        # Auto-detect category based on domain
-        domain_parts = domain.split('.')
-        if len(domain_parts) > 1:
-            main_domain = domain_parts[-2]
-            
-            # Simple domain to category mapping
-            domain_categories = {
-                'news': 'News',
-                'tech': 'Technology',
-                'edu': 'Education',
-                'shop': 'Shopping',
-                'blog': 'Education',
-                'social': 'Social'
+        url_id, tags = result
+        self.count('stored')
+        # Runs on the writer thread: whatever fails here, the caller's future must still resolve
+        try:
+            suggest_index.add(page['url'], page['title'], page['domain'], tags)
+            if page['category'] is None:
+                category_classifier.enqueue(url_id)
+            image_pipeline.enqueue(url_id, page['domain'], page['favicon_url'], page['image_url'])
+        except Exception as e:
+            print(f"Error after storing {page['url']}: {str(e)}")
+            self.count('post_store_errors')
+            future.set_exception(e)
+            return
+        future.set_result(True)
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'fetch': {'workers': self.fetch_workers, 'queue_depth': self.fetch_queue.qsize(),
+                          'queue_max': self.fetch_queue.maxsize, 'in_progress': self.fetching},
+                'parse': {'workers': self.parse_workers, 'queue_depth': self.parsing,
+                          'queue_max': self.max_parsing},
+                'store': {'in_progress': self.storing, 'writer_queue_depth': db_writer.queue.qsize()},
+                'counts': dict(self.counts)
             }
-            
-            for key, cat in domain_categories.items():
-                if key in main_domain:
-                    category = cat
-                    break
+
+crawl_pipeline = CrawlPipeline()
+
+def process_url(url):
+    """Crawl a single URL through the pipeline; True when it was stored as a new page"""
+    return crawl_pipeline.submit(url).result()
+
+def process_url_batch(urls):
+    """Process a batch of URLs concurrently and return how many were stored"""
+    futures = [crawl_pipeline.submit(url) for url in urls]
+    
+    # Wait for all tasks to complete; a page whose post-store steps failed was still stored
+    return sum(1 for future in futures if future.exception() is not None or future.result())
+
+# Admission control
+class IngestQueue:
+    """The urls.txt crawl queue with a depth limit
+    
+    Depth counts URLs waiting in the file plus the batch the crawler is
+    working on, so a burst of submissions is refused once the crawler is
+    max_depth behind instead of growing the file without bound. The drain
+    rate is a moving average of crawler throughput, used for Retry-After.
+    """
+    def __init__(self, path=URLS_FILE, max_depth=INGEST_QUEUE_MAX):
+        self.path = path
+        self.max_depth = max_depth
+        self.lock = threading.Lock()
+        self.waiting = self.count_waiting()
+        self.in_flight = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.drain_rate = None
+    
+    def count_waiting(self):
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'r') as f:
+            return sum(1 for line in f if line.strip())
+    
+    def depth(self):
+        return self.waiting + self.in_flight
+    
+    def add(self, url):
+        """Append a URL unless the queue is full; returns False when it was refused"""
+        with self.lock:
+            if self.depth() >= self.max_depth:
+                self.rejected += 1
+                return False
+            with open(self.path, 'a') as f:
+                f.write(url + '\n')
+            self.waiting += 1
+            self.accepted += 1
+            return True
+    
+    def take(self):
+        """Read and clear the file, returning its distinct URLs as the batch in flight"""
+        with self.lock:
+            if not os.path.exists(self.path):
+                return []
+            with open(self.path, 'r') as f:
+                urls = list({line.strip() for line in f if line.strip()})  # Use set to remove duplicates
+            open(self.path, 'w').close()
+            self.waiting = 0
+            self.in_flight = len(urls)
+            return urls
+    
+    def finish(self, count, seconds):
+        with self.lock:
+            self.in_flight = 0
+            if count and seconds > 0:
+                rate = count / seconds
+                self.drain_rate = rate if self.drain_rate is None else 0.7 * self.drain_rate + 0.3 * rate
+    
+    def retry_after(self):
+        """Seconds until the crawler should have made room for another URL"""
+        with self.lock:
+            excess = self.depth() - self.max_depth + 1
+            if not self.drain_rate:
+                # Nothing crawled yet to estimate from
+                return 30
+            return max(1, min(RETRY_AFTER_MAX, math.ceil(excess / self.drain_rate)))
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'depth': self.depth(),
+                'waiting': self.waiting,
+                'in_flight': self.in_flight,
+                'max_depth': self.max_depth,
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'drain_rate': round(self.drain_rate, 2) if self.drain_rate else None
+            }
+
+ingest_queue = IngestQueue()
+
+class RateLimiter:
+    """Per-client token buckets refilled at rate tokens a second up to burst
+    
+    Buckets live in an OrderedDict so the least recently seen clients are
+    dropped once there are more than max_clients; a dropped client simply
+    starts again with a full bucket.
+    """
+    def __init__(self, rate, burst, max_clients=RATE_LIMIT_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+    
+    def acquire(self, client):
+        """Take a token for client; returns 0 when allowed, else seconds until one is available"""
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+                self.allowed += 1
+            else:
+                wait = (1 - tokens) / self.rate
+                self.rejected += 1
+            self.buckets[client] = (tokens, now)
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+            return wait
+    
+    def stats(self):
+        with self.lock:
+            return {'rate': self.rate, 'burst': self.burst, 'clients': len(self.buckets),
+                    'allowed': self.allowed, 'rejected': self.rejected}
+
+rate_limiters = {name: RateLimiter(rate, burst) for name, (rate, burst) in RATE_LIMITS.items()}
+
+def client_id():
+    if CLIENT_IP_HEADER and request.headers.get(CLIENT_IP_HEADER):
+        return request.headers[CLIENT_IP_HEADER]
+    return request.remote_addr
+
+def too_many_requests(retry_after, message='Too many requests, please try again later'):
+    response = jsonify({'success': False, 'message': message})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+def process_urls():
+    """Process URLs from the queue file"""
+    while True:
+        try:
+            urls = ingest_queue.take()
+            if urls:
+                start = time.time()
+                process_url_batch(urls)
+                ingest_queue.finish(len(urls), time.time() - start)
                     
-        # Auto-generate some tags
-        if 'blog' in domain or 'blog' in title.lower():
-            tags.append('blog')
-        if 'forum' in domain or 'forum' in title.lower():
-            tags.append('forum')
-            
-        tags = ','.join(tags[:5]) if tags else None
-        
-        timestamp = time.time()
-        
-        # Insert into database
-        c.execute('''INSERT INTO urls 
-                     (url, title, description, domain, created_at, last_updated, category, tags)
-                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                  (url, title[:255], description[:500], domain, timestamp, timestamp, category, tags))
-        
-        # Update popular domains count
-        c.execute('''INSERT OR REPLACE INTO popular_domains 
-                     (domain, count) 
-                     VALUES (?, COALESCE((SELECT count FROM popular_domains WHERE domain = ?), 0) + 1)''',
-                  (domain, domain))
+        except Exception as e:
+            ingest_queue.finish(0, 0)
+            print(f"Error processing URLs: {str(e)}")
         
-        conn.commit()
+        time.sleep(5)
+
+# Start background thread
+thread = threading.Thread(target=process_urls)
+thread.daemon = True
+if not POOL_WORKER:
+    thread.start()
+
+# Category classifier
+_TOKEN_RE = re.compile(r'[a-z0-9]{2,}')
+STOPWORDS = frozenset('''
+a an and are as at be by for from has have in is it its of on or our that the this to
+was were will with you your we us my me www com org net http https html index home page
+'''.split())
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords or bare numbers"""
+    return [token for token in _TOKEN_RE.findall((text or '').lower())
+            if token not in STOPWORDS and not token.isdigit()]
+
+def document_tokens(title, description, domain):
+    return tokenize(title) + tokenize(description) + tokenize((domain or '').replace('.', ' ').replace('-', ' '))
+
+def train_category_model(rows):
+    """Build a multinomial naive Bayes model from (tokens, category) pairs
+    
+    The model keeps a matrix with one row of per-category log likelihoods per
+    token, so scoring a batch is a scatter-add of rows (see classifier_worker).
+    """
+    import numpy as np
+    
+    doc_counts = {}
+    token_counts = {}
+    for tokens, category in rows:
+        doc_counts[category] = doc_counts.get(category, 0) + 1
+        per_category = token_counts.setdefault(category, {})
+        for token in tokens:
+            per_category[token] = per_category.get(token, 0) + 1
+    
+    categories = sorted(doc_counts)
+    totals = {}
+    for per_category in token_counts.values():
+        for token, count in per_category.items():
+            totals[token] = totals.get(token, 0) + count
+    vocabulary = heapq.nlargest(CLASSIFIER_MAX_VOCABULARY, totals, key=totals.get)
+    
+    total_docs = sum(doc_counts.values())
+    priors = np.log(np.array([doc_counts[cat] for cat in categories], dtype=np.float64) / total_docs)
+    counts = np.array([[token_counts[cat].get(token, 0) for cat in categories] for token in vocabulary],
+                      dtype=np.float64).reshape(len(vocabulary), len(categories))
+    denominators = counts.sum(axis=0) + len(vocabulary) + 1
+    
+    return {'categories': categories, 'priors': priors,
+            'index': {token: i for i, token in enumerate(vocabulary)},
+            'likelihoods': np.log((counts + 1) / denominators),
+            'trained_rows': total_docs}
+
+def store_predictions(c, updates):
+    """Write (category, id) predictions, leaving rows categorised since scoring alone"""
+    c.executemany('''UPDATE urls SET category = ?, category_source = 'model'
+                     WHERE id = ? AND (category IS NULL OR category_source = 'model')''', updates)
+    return len(updates)
+
+class CategoryClassifier:
+    """Classifies uncategorised rows in batches on a process pool
+    
+    New rows are queued by process_url() and picked up by a background thread,
+    so fetch threads never wait on scoring. Only rule-assigned categories are
+    used for training, so the model does not learn from its own output.
+    """
+    def __init__(self, max_pending=CLASSIFIER_MAX_PENDING):
+        self.lock = threading.Lock()
+        self.pending = deque(maxlen=max_pending)
+        self.dropped = 0
+        self.model = None
+        self.pool = None
+        self.trained_at = 0
+    
+    def train(self):
+        conn = connect_db()
+        c = conn.cursor()
+        c.execute('''SELECT title, description, domain, category FROM urls
+                     WHERE category IS NOT NULL AND (category_source IS NULL OR category_source != 'model')
+                     ORDER BY id DESC LIMIT ?''', (CLASSIFIER_MAX_TRAINING_ROWS,))
+        rows = [(document_tokens(title, description, domain), category)
+                for title, description, domain, category in c.fetchall()]
         conn.close()
+        self.trained_at = time.time()
         
-        return True
+        if len(rows) < CLASSIFIER_MIN_TRAINING_ROWS or len({category for _, category in rows}) < 2:
+            return False
         
-    except Exception as e:
-        print(f"Error processing {url}: {str(e)}")
+        import classifier_worker
+        model = train_category_model(rows)
+        pool = ProcessPoolExecutor(max_workers=CLASSIFIER_WORKERS, mp_context=pool_context,
+                                   initializer=classifier_worker.init_worker, initargs=(model,))
+        with self.lock:
+            old_pool, self.pool, self.model = self.pool, pool, model
+        if old_pool:
+            old_pool.shutdown(wait=False)
+        return True
+    
+    def enqueue(self, url_id):
+        with self.lock:
+            if len(self.pending) == self.pending.maxlen:
+                self.dropped += 1
+            self.pending.append(url_id)
+    
+    def score_ids(self, c, url_ids):
+        """Score rows by id on the pool and return (category, id) for confident predictions"""
+        placeholders = ','.join('?' * len(url_ids))
+        c.execute(f"SELECT id, title, description, domain FROM urls WHERE id IN ({placeholders})", url_ids)
+        rows = c.fetchall()
+        if not rows or self.pool is None:
+            return []
+        import classifier_worker
+        predictions = self.pool.submit(classifier_worker.classify_batch,
+                                       [document_tokens(*row[1:]) for row in rows]).result()
+        return [(category, row[0]) for row, (category, confidence) in zip(rows, predictions)
+                if confidence >= CLASSIFIER_MIN_CONFIDENCE]
+    
+    def run_pending(self):
+        with self.lock:
+            if self.pool is None:
+                # Until there is a model, the newest max_pending rows stay queued for the first one
+                return 0
+            batch = [self.pending.popleft() for _ in range(min(CLASSIFIER_BATCH_SIZE, len(self.pending)))]
+        if not batch:
+            return 0
+        conn = connect_db()
+        try:
+            updates = self.score_ids(conn.cursor(), batch)
+        finally:
+            conn.close()
+        return db_writer.run(store_predictions, updates)
+    
+    def run_forever(self):
+        while True:
+            try:
+                if time.time() - self.trained_at > CLASSIFIER_RETRAIN_INTERVAL:
+                    self.train()
+                while self.run_pending():
+                    pass
+            except Exception as e:
+                print(f"Error classifying URLs: {str(e)}")
+            time.sleep(5)
+    
+    def backfill(self, reclassify=False, batch_size=CLASSIFIER_BATCH_SIZE):
+        """Classify the existing table in id order, storing each batch through db_writer"""
+        if self.pool is None and not self.train():
+            return None
+        condition = "category IS NULL"
+        if reclassify:
+            condition += " OR category_source = 'model'"
+        conn = connect_db()
+        c = conn.cursor()
+        last_id, scanned, classified = 0, 0, 0
+        while True:
+            c.execute(f"SELECT id FROM urls WHERE id > ? AND ({condition}) ORDER BY id LIMIT ?",
+                      (last_id, batch_size))
+            url_ids = [row[0] for row in c.fetchall()]
+            if not url_ids:
+                break
+            classified += db_writer.run(store_predictions, self.score_ids(c, url_ids))
+            scanned += len(url_ids)
+            last_id = url_ids[-1]
+        conn.close()
+        return scanned, classified
+
+category_classifier = CategoryClassifier()
+
+@app.cli.command('backfill-categories')
+@click.option('--reclassify', is_flag=True, help='Also re-score rows the classifier categorised before.')
+@click.option('--batch-size', default=CLASSIFIER_BATCH_SIZE, show_default=True)
+def backfill_categories_command(reclassify, batch_size):
+    """Classify uncategorised rows with the naive Bayes model."""
+    result = category_classifier.backfill(reclassify=reclassify, batch_size=batch_size)
+    if result is None:
+        print("Not enough categorised rows to train the classifier")
+    else:
+        print(f"Scanned {result[0]} URLs, categorised {result[1]}")
+
+# Classify new URLs in the background
+classifier_thread = threading.Thread(target=category_classifier.run_forever)
+classifier_thread.daemon = True
+if not POOL_WORKER:
+    classifier_thread.start()
+
+# Tags
+def parse_tags(tags):
+    """Split a comma-joined tags string into unique lowercase names"""
+    return list(dict.fromkeys(tag.strip().lower() for tag in (tags or '').split(',') if tag.strip()))
+
+def set_url_tags(c, url_id, tags):
+    """Make url_tags match a row's comma-joined tags; tag counts follow via triggers"""
+    names = parse_tags(tags)
+    if not names:
+        c.execute("DELETE FROM url_tags WHERE url_id = ?", (url_id,))
+        return
+    placeholders = ','.join('?' * len(names))
+    c.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", [(name,) for name in names])
+    c.execute(f'''DELETE FROM url_tags WHERE url_id = ?
+                  AND tag_id NOT IN (SELECT id FROM tags WHERE name IN ({placeholders}))''', [url_id] + names)
+    c.execute(f'''INSERT OR IGNORE INTO url_tags (url_id, tag_id)
+                  SELECT ?, id FROM tags WHERE name IN ({placeholders})''', [url_id] + names)
+
+def get_tag(name):
+    conn = connect_read()
+    c = conn.cursor()
+    c.execute("SELECT id, name, url_count FROM tags WHERE name = ?", (name.lower(),))
+    row = c.fetchone()
+    conn.close()
+    return dict(zip(['id', 'name', 'url_count'], row)) if row else None
+
+def get_tag_urls(tag_id, before=None, limit=TAG_PAGE_SIZE):
+    """Newest rows carrying a tag, continuing below the url id 'before'
+
+    Walks the (tag_id, url_id) index backwards, so every page costs the same.
+    """
+    conn = connect_read()
+    c = conn.cursor()
+    query = f'''SELECT {CARD_COLUMNS} FROM url_tags JOIN urls ON urls.id = url_tags.url_id
+               WHERE url_tags.tag_id = ?'''
+    params = [tag_id]
+    if before:
+        query += " AND url_tags.url_id < ?"
+        params.append(before)
+    query += " ORDER BY url_tags.url_id DESC LIMIT ?"
+    params.append(limit + 1)
+    
+    c.execute(query, params)
+    results = fetch_records(c)
+    conn.close()
+    
+    next_before = results[limit - 1]['id'] if len(results) > limit else None
+    return results[:limit], next_before
+
+def get_tag_cloud(limit=30):
+    conn = connect_read()
+    c = conn.cursor()
+    c.execute("SELECT name, url_count FROM tags WHERE url_count > 0 ORDER BY url_count DESC LIMIT ?", (limit,))
+    results = fetch_records(c)
+    conn.close()
+    return results
+
+# Keyword tags
+def get_state(c, key, default=None):
+    c.execute("SELECT value FROM app_state WHERE key = ?", (key,))
+    row = c.fetchone()
+    return row[0] if row else default
+
+def set_state(c, key, value):
+    c.execute("INSERT OR REPLACE INTO app_state (key, value) VALUES (?, ?)", (key, value))
+
+def rule_tags(domain, title):
+    """Tags implied by the domain or title alone"""
+    tags = []
+    if 'blog' in domain or 'blog' in title.lower():
+        tags.append('blog')
+    if 'forum' in domain or 'forum' in title.lower():
+        tags.append('forum')
+    return tags
+
+def keyword_terms(tokens):
+    """Term counts for a document, skipping tokens too short or long to make useful tags"""
+    return Counter(token for token in tokens if 3 <= len(token) <= 30)
+
+def fetch_doc_freqs(c, terms):
+    doc_freqs = {}
+    terms = list(terms)
+    for start in range(0, len(terms), 500):
+        chunk = terms[start:start + 500]
+        c.execute(f"SELECT term, df FROM term_stats WHERE term IN ({','.join('?' * len(chunk))})", chunk)
+        doc_freqs.update(c.fetchall())
+    return doc_freqs
+
+def is_tag_candidate(df, total_docs):
+    """Terms must recur across pages but not be so common they say nothing"""
+    if df < TAG_MIN_DF:
         return False
+    return total_docs < 20 or df / total_docs <= TAG_MAX_DF_RATIO
 
-def process_urls():
-    """Process URLs from the queue file"""
+def extract_keywords(c, tokens, limit=MAX_TAGS):
+    """Pick a new page's top TF-IDF terms and count the page into the corpus frequencies"""
+    counts = keyword_terms(tokens)
+    if not counts:
+        return []
+    
+    doc_freqs = fetch_doc_freqs(c, counts)
+    total_docs = int(get_state(c, 'tag_documents', 0)) + 1
+    length = sum(counts.values())
+    scored = []
+    for term, tf in counts.items():
+        df = doc_freqs.get(term, 0) + 1
+        if is_tag_candidate(df, total_docs):
+            scored.append((tf / length * (math.log((1 + total_docs) / (1 + df)) + 1), term))
+    
+    c.executemany('''INSERT INTO term_stats (term, df) VALUES (?, 1)
+                     ON CONFLICT(term) DO UPDATE SET df = df + 1''', [(term,) for term in counts])
+    set_state(c, 'tag_documents', total_docs)
+    return [term for _, term in heapq.nlargest(limit, scored)]
+
+def start_term_recount(c):
+    """Writer operation: create an empty staging table for recount_term_stats"""
+    c.execute("DROP TABLE IF EXISTS term_stats_rebuild")
+    c.execute("CREATE TABLE term_stats_rebuild (term TEXT PRIMARY KEY, df INTEGER) WITHOUT ROWID")
+
+def fold_term_counts(c, counts):
+    """Writer operation: add (term, df) counts to the staging table"""
+    c.executemany('''INSERT INTO term_stats_rebuild (term, df) VALUES (?, ?)
+                     ON CONFLICT(term) DO UPDATE SET df = df + excluded.df''', counts)
+
+def swap_term_stats(c, total_docs):
+    """Writer operation: replace term_stats with the staged recount"""
+    c.execute("DELETE FROM term_stats")
+    c.execute("INSERT INTO term_stats (term, df) SELECT term, df FROM term_stats_rebuild")
+    c.execute("DROP TABLE term_stats_rebuild")
+    set_state(c, 'tag_documents', total_docs)
+
+def recount_term_stats(batch_size=TAG_BATCH_SIZE):
+    """Recount document frequencies over the whole table
+    
+    Counts are accumulated in memory up to TAG_MAX_PENDING_TERMS distinct terms,
+    then folded into a staging table, so memory stays flat however many rows
+    there are. Reads are short autocommit statements that hold no lock between
+    batches, and every write goes through db_writer in batch-sized operations,
+    so this can run while the app is serving. The live table is swapped in one
+    operation at the end.
+    """
+    def fold(pending):
+        items = list(pending.items())
+        for start in range(0, len(items), batch_size):
+            db_writer.run(fold_term_counts, items[start:start + batch_size])
+        pending.clear()
+    
+    db_writer.run(start_term_recount)
+    conn = connect_db()
+    c = conn.cursor()
+    pending = Counter()
+    total_docs, last_id = 0, 0
     while True:
-        if os.path.exists(URLS_FILE):
-            try:
-                # Read and clear the file
-                with open(URLS_FILE, 'r') as f:
-                    urls = list({line.strip() for line in f if line.strip()})  # Use set to remove duplicates
-                open(URLS_FILE, 'w').close()
-                
-                # Process each URL concurrently
-                futures = []
-                for url in urls:
-                    futures.append(executor.submit(process_url, url))
-                
-                # Wait for all tasks to complete
-                for future in futures:
-                    future.result()
-                        
-            except Exception as e:
-                print(f"Error processing URLs: {str(e)}")
+        c.execute("SELECT id, title, description FROM urls WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size))
+        rows = c.fetchall()
+        if not rows:
+            break
+        for _, title, description in rows:
+            pending.update(keyword_terms(tokenize(title) + tokenize(description)).keys())
+        total_docs += len(rows)
+        last_id = rows[-1][0]
+        if len(pending) >= TAG_MAX_PENDING_TERMS:
+            fold(pending)
+    conn.close()
+    fold(pending)
+    
+    db_writer.run(swap_term_stats, total_docs)
+    return total_docs
+
+def retag_batch(c, rows, total_docs):
+    """Vectorised TF-IDF over a batch of (id, domain, title, description) rows; returns (tags, id) updates
+    
+    All (document, term) pairs of the batch go into flat NumPy arrays, are scored
+    in one pass and sorted by document then score, which leaves each document's
+    top terms at the front of its run.
+    """
+    import numpy as np  # only the batch pass needs NumPy
+    
+    doc_terms = [keyword_terms(tokenize(title) + tokenize(description)) for _, _, title, description in rows]
+    vocabulary = {}
+    doc_index, term_index, term_counts = [], [], []
+    for i, counts in enumerate(doc_terms):
+        for term, tf in counts.items():
+            doc_index.append(i)
+            term_index.append(vocabulary.setdefault(term, len(vocabulary)))
+            term_counts.append(tf)
+    
+    keywords = [[] for _ in rows]
+    if doc_index:
+        terms = list(vocabulary)
+        known = fetch_doc_freqs(c, terms)
+        df = np.array([known.get(term, 0) for term in terms], dtype=np.float64)
+        doc_index = np.array(doc_index)
+        term_index = np.array(term_index)
+        tf = np.array(term_counts, dtype=np.float64)
+        lengths = np.array([max(1, sum(counts.values())) for counts in doc_terms], dtype=np.float64)
         
-        time.sleep(5)
+        pair_df = df[term_index]
+        scores = tf / lengths[doc_index] * (np.log((1 + total_docs) / (1 + pair_df)) + 1)
+        candidate = pair_df >= TAG_MIN_DF
+        if total_docs >= 20:
+            candidate &= pair_df / total_docs <= TAG_MAX_DF_RATIO
+        scores = np.where(candidate, scores, -np.inf)
+        
+        order = np.lexsort((-scores, doc_index))
+        sorted_docs = doc_index[order]
+        run_starts = np.searchsorted(sorted_docs, np.arange(len(rows)))
+        rank = np.arange(len(order)) - run_starts[sorted_docs]
+        keep = order[(rank < MAX_TAGS) & np.isfinite(scores[order])]
+        for doc, term in zip(doc_index[keep].tolist(), term_index[keep].tolist()):
+            keywords[doc].append(terms[term])
+    
+    updates = []
+    for (url_id, domain, title, _), doc_keywords in zip(rows, keywords):
+        tags = rule_tags(domain or '', title or '')
+        tags += [keyword for keyword in doc_keywords if keyword not in tags]
+        updates.append((','.join(tags[:MAX_TAGS]) or None, url_id))
+    return updates
 
-# Start background thread
-thread = threading.Thread(target=process_urls)
-thread.daemon = True
-thread.start()
+def store_tags(c, updates):
+    """Writer operation: write (tags, id) updates and their url_tags rows"""
+    c.executemany("UPDATE urls SET tags = ? WHERE id = ?", updates)
+    for tags, url_id in updates:
+        set_url_tags(c, url_id, tags)
+    return len(updates)
+
+def retag_all(batch_size=TAG_BATCH_SIZE, recount=True):
+    """Recompute keyword tags for every row: recount frequencies, then score batch by batch
+    
+    Scoring reads on its own connection; each batch's tags are written in one
+    db_writer operation.
+    """
+    total_docs = recount_term_stats(batch_size) if recount else None
+    conn = connect_db()
+    c = conn.cursor()
+    if total_docs is None:
+        total_docs = int(get_state(c, 'tag_documents', 0))
+    last_id, tagged = 0, 0
+    while True:
+        c.execute("SELECT id, domain, title, description FROM urls WHERE id > ? ORDER BY id LIMIT ?",
+                  (last_id, batch_size))
+        rows = c.fetchall()
+        if not rows:
+            break
+        tagged += db_writer.run(store_tags, retag_batch(c, rows, total_docs))
+        last_id = rows[-1][0]
+    conn.close()
+    return tagged
+
+@app.cli.command('retag')
+@click.option('--no-recount', is_flag=True, help='Reuse the stored document frequencies.')
+@click.option('--batch-size', default=TAG_BATCH_SIZE, show_default=True)
+def retag_command(no_recount, batch_size):
+    """Recompute TF-IDF keyword tags for the whole table."""
+    print(f"Tagged {retag_all(batch_size=batch_size, recount=not no_recount)} URLs")
 
 # Helper functions
-def get_urls(limit=None, order_by='clicks', category=None, domain=None):
-    conn = sqlite3.connect(DATA_FILE)
+def get_urls(limit=None, order_by='clicks', category=None, domain=None, columns=CARD_COLUMNS):
+    conn = connect_read()
     c = conn.cursor()
     
-    query = "SELECT * FROM urls WHERE 1=1"
+    query = f"SELECT {columns} FROM urls WHERE 1=1"
     params = []
     
     if category:
@@ -250,6 +2242,8 @@ def get_urls(limit=None, order_by='clicks', category=None, domain=None):
     
     if order_by == 'clicks':
         query += " ORDER BY clicks DESC, rating DESC"
+    elif order_by == 'trending':
+        query += " ORDER BY trending DESC, clicks DESC"
     elif order_by == 'recent':
         query += " ORDER BY created_at DESC"
     elif order_by == 'rating':
@@ -261,23 +2255,78 @@ def get_urls(limit=None, order_by='clicks', category=None, domain=None):
         query += f" LIMIT {limit}"
     
     c.execute(query, params)
-    results = [dict(zip([column[0] for column in c.description], row)) for row in c.fetchall()]
+    results = fetch_records(c)
     conn.close()
     return results
 
-def search_urls(query, category=None, domain=None):
-    conn = sqlite3.connect(DATA_FILE)
+# Listing feeds: the sort columns of each order, ending in the id, and its ORDER BY.
+# NULLs sort as 0, matching the idx_urls_feed_* expression indexes
+FEED_ORDERS = {
+    'clicks': (('clicks', 'rating', 'id'), 'COALESCE(clicks, 0) DESC, COALESCE(rating, 0) DESC, id DESC'),
+    'recent': (('created_at', 'id'), 'COALESCE(created_at, 0) DESC, id DESC')
+}
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, order_by):
+    """Sort key values from an encode_cursor string, or None; raises ValueError for a malformed cursor"""
+    if not cursor:
+        return None
+    values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    if (not isinstance(values, list) or len(values) != len(FEED_ORDERS[order_by][0])
+            or not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values)):
+        raise ValueError('Invalid cursor')
+    return values
+
+def get_feed(order_by='clicks', category=None, domain=None, cursor=None, limit=FEED_PAGE_SIZE):
+    """One batch of a listing after cursor; returns (urls, cursor of the next batch or None)
+    
+    The cursor holds the sort key of the last row sent, so each batch is an
+    index range scan from there instead of an OFFSET that reads and skips
+    every earlier row.
+    """
+    columns, order = FEED_ORDERS[order_by]
+    keys = [f"COALESCE({column}, 0)" for column in columns[:-1]] + ['id']
+    query = f"SELECT {CARD_COLUMNS} FROM urls WHERE 1=1"
+    params = []
+    
+    if category:
+        query += " AND category = ?"
+        params.append(category)
+    
+    if domain:
+        query += " AND domain = ?"
+        params.append(domain)
+    
+    if cursor:
+        # The bound on the leading key alone is what SQLite turns into an index range
+        query += f" AND {keys[0]} <= ? AND ({', '.join(keys)}) < ({', '.join('?' * len(keys))})"
+        params.append(cursor[0])
+        params.extend(cursor)
+    
+    query += f" ORDER BY {order} LIMIT {limit + 1}"
+    
+    conn = connect_read()
     c = conn.cursor()
+    c.execute(query, params)
+    results = fetch_records(c)
+    conn.close()
     
+    next_cursor = encode_cursor([results[limit - 1][column] or 0 for column in columns]) if len(results) > limit else None
+    return results[:limit], next_cursor
+
+def search_filter(query, category=None, domain=None, rating=None):
+    """WHERE clause and parameters shared by search results and search facets"""
     query_str = f"%{query.lower()}%"
     
-    sql = '''SELECT * FROM urls 
-             WHERE (LOWER(title) LIKE ? OR 
+    sql = '''WHERE (LOWER(title) LIKE ? OR 
                    LOWER(description) LIKE ? OR 
                    LOWER(domain) LIKE ? OR
-                   LOWER(tags) LIKE ?)'''
+                   id IN (SELECT url_tags.url_id FROM tags JOIN url_tags ON url_tags.tag_id = tags.id
+                          WHERE tags.name = ?))'''
     
-    params = [query_str, query_str, query_str, query_str]
+    params = [query_str, query_str, query_str, query.lower().strip()]
     
     if category:
         sql += " AND category = ?"
@@ -287,85 +2336,489 @@ def search_urls(query, category=None, domain=None):
         sql += " AND domain LIKE ?"
         params.append(f"%{domain}%")
     
-    sql += " ORDER BY clicks DESC, rating DESC"
+    if rating is not None:
+        sql += " AND rating >= ? AND rating < ?"
+        params.extend([rating, rating + 1])
     
-    c.execute(sql, params)
-    results = [dict(zip([column[0] for column in c.description], row)) for row in c.fetchall()]
-    conn.close()
-    return results
+    return sql, params
 
-def get_paginated_urls(page=1, per_page=50, category=None, domain=None):
-    conn = sqlite3.connect(DATA_FILE)
-    c = conn.cursor()
-    
-    # Get total count
-    count_query = "SELECT COUNT(*) FROM urls WHERE 1=1"
-    count_params = []
-    
-    if category:
-        count_query += " AND category = ?"
-        count_params.append(category)
-        
-    if domain:
-        count_query += " AND domain LIKE ?"
-        count_params.append(f"%{domain}%")
-    
-    c.execute(count_query, count_params)
+def estimate_search_total(c, where, params):
+    """Number of matches, exact up to SEARCH_COUNT_LIMIT; returns (total, exact)"""
+    c.execute(f"SELECT COUNT(*) FROM (SELECT 1 FROM urls {where} LIMIT ?)", params + [SEARCH_COUNT_LIMIT + 1])
     total = c.fetchone()[0]
+    if total <= SEARCH_COUNT_LIMIT:
+        return total, True
     
-    # Get paginated results
-    offset = (page - 1) * per_page
-    query = "SELECT * FROM urls WHERE 1=1"
-    params = []
+    # Extrapolate from the match rate among the newest rows; ids approximate the row count
+    c.execute(f"SELECT COUNT(*) FROM (SELECT * FROM urls ORDER BY id DESC LIMIT ?) {where}",
+              [SEARCH_SAMPLE_ROWS] + params)
+    sample_matches = c.fetchone()[0]
+    c.execute("SELECT MAX(id) FROM urls")
+    rows = c.fetchone()[0] or 0
+    estimate = round(sample_matches / min(SEARCH_SAMPLE_ROWS, rows) * rows) if rows else 0
+    return max(estimate, total), False
+
+def search_urls(query, category=None, domain=None, rating=None, page=1, per_page=SEARCH_PAGE_SIZE):
+    """One page of search results ranked by clicks, with an estimated total
     
-    if category:
-        query += " AND category = ?"
-        params.append(category)
-        
-    if domain:
-        query += " AND domain LIKE ?"
-        params.append(f"%{domain}%")
+    The ORDER BY matches idx_urls_clicks, so the scan stops once a page's
+    worth of matches is found instead of collecting and sorting them all.
+    """
+    conn = connect_read()
+    c = conn.cursor()
     
-    query += " ORDER BY clicks DESC, rating DESC LIMIT ? OFFSET ?"
-    params.extend([per_page, offset])
+    where, params = search_filter(query, category, domain, rating)
+    total, exact = estimate_search_total(c, where, params)
+    total_pages = max(1, min((total + per_page - 1) // per_page, SEARCH_MAX_RESULTS // per_page))
+    page = max(1, min(page, total_pages))
+    offset = (page - 1) * per_page
     
-    c.execute(query, params)
-    results = [dict(zip([column[0] for column in c.description], row)) for row in c.fetchall()]
+    if total == 0:
+        results = []
+    else:
+        sql = f"SELECT {CARD_COLUMNS} FROM urls {where} ORDER BY clicks DESC, rating DESC LIMIT ? OFFSET ?"
+        c.execute(sql, params + [per_page, offset])
+        results = fetch_records(c)
     conn.close()
     
     return {
         'urls': results,
         'total': total,
+        'total_exact': exact,
         'page': page,
         'per_page': per_page,
-        'total_pages': (total + per_page - 1) // per_page
+        'total_pages': total_pages
+    }
+
+facet_cache = OrderedDict()
+facet_cache_lock = threading.Lock()
+
+def search_facets(query, category=None, domain=None, rating=None):
+    """Category, domain and rating-bucket counts for a search, from one grouped query
+
+    A single GROUP BY over (category, domain, star bucket) visits the matching
+    rows once; the three facets are folded out of its groups in Python. Only
+    the first SEARCH_COUNT_LIMIT matches are counted. Results are cached per
+    normalised query and filters for FACET_CACHE_TTL seconds.
+    """
+    key = (' '.join(query.lower().split()), category, domain, rating)
+    now = time.time()
+    with facet_cache_lock:
+        cached = facet_cache.get(key)
+        if cached and now - cached[0] < FACET_CACHE_TTL:
+            facet_cache.move_to_end(key)
+            return cached[1]
+    
+    conn = connect_read()
+    c = conn.cursor()
+    where, params = search_filter(query, category, domain, rating)
+    c.execute(f'''SELECT category, domain, CAST(rating AS INTEGER), COUNT(*)
+                  FROM (SELECT category, domain, rating FROM urls {where} LIMIT ?)
+                  GROUP BY category, domain, CAST(rating AS INTEGER)''', params + [SEARCH_COUNT_LIMIT])
+    
+    categories, domains, ratings = Counter(), Counter(), Counter()
+    total = 0
+    for row_category, row_domain, bucket, count in c.fetchall():
+        if row_category:
+            categories[row_category] += count
+        domains[row_domain] += count
+        ratings[min(bucket or 0, 5)] += count
+        total += count
+    conn.close()
+    
+    facets = {
+        'total': total,
+        'categories': categories.most_common(),
+        'domains': domains.most_common(FACET_DOMAIN_LIMIT),
+        'ratings': sorted(ratings.items(), reverse=True)
     }
+    with facet_cache_lock:
+        facet_cache[key] = (now, facets)
+        facet_cache.move_to_end(key)
+        while len(facet_cache) > FACET_CACHE_SIZE:
+            facet_cache.popitem(last=False)
+    return facets
 
 def get_categories():
-    conn = sqlite3.connect(DATA_FILE)
+    conn = connect_read()
     c = conn.cursor()
     c.execute("SELECT name, description FROM categories ORDER BY name")
-    results = [dict(zip([column[0] for column in c.description], row)) for row in c.fetchall()]
+    results = fetch_records(c)
     conn.close()
     return results
 
 def get_popular_domains(limit=10):
-    conn = sqlite3.connect(DATA_FILE)
+    conn = connect_read()
     c = conn.cursor()
-    c.execute("SELECT domain, count FROM popular_domains ORDER BY count DESC LIMIT ?", (limit,))
-    results = [dict(zip([column[0] for column in c.description], row)) for row in c.fetchall()]
+    c.execute(f"SELECT {DOMAIN_STATS_COLUMNS} FROM domain_stats ORDER BY url_count DESC LIMIT ?", (limit,))
+    results = fetch_records(c)
     conn.close()
     return results
 
+def get_domain_stats(domain):
+    conn = connect_read()
+    c = conn.cursor()
+    c.execute(f"SELECT {DOMAIN_STATS_COLUMNS} FROM domain_stats WHERE domain = ?", (domain,))
+    results = fetch_records(c)
+    conn.close()
+    return results[0] if results else None
+
+# Click stream and trending score
+#
+# A row's trending score is log(sum(exp(decay * (t - TRENDING_EPOCH)))) over its
+# clicks. Scaling every click by the same growing factor keeps the ranking equal
+# to that of the exponentially decayed click count, so scores never need to be
+# recomputed as time passes, and the log keeps the values small.
+TRENDING_DECAY = math.log(2) / TRENDING_HALF_LIFE
+
+click_buffer = {}
+click_buffer_lock = threading.Lock()
+last_window_prune = 0
+
+def logaddexp(a, b):
+    """log(exp(a) + exp(b)) without overflow; NULL counts as an empty sum"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+def trending_increment(count, timestamp):
+    return math.log(count) + TRENDING_DECAY * (timestamp - TRENDING_EPOCH)
+
+def record_click(url):
+    """Queue a click; it reaches the database on the next flush"""
+    with click_buffer_lock:
+        click_buffer[url] = click_buffer.get(url, 0) + 1
+        overflow = len(click_buffer) >= MAX_PENDING_CLICK_URLS
+    if overflow:
+        flush_clicks()
+
+def write_clicks(c, pending, now):
+    """Writer operation: add click counts to totals, hourly windows and trending scores
+    
+    Returns the clicked rows as (url, domain, tags, clicks added).
+    """
+    global last_window_prune
+    window_start = int(now // CLICK_WINDOW_SECONDS * CLICK_WINDOW_SECONDS)
+    c.connection.create_function('logaddexp', 2, logaddexp, deterministic=True)
+    
+    # Clicks on any alias of a page count towards its canonical row
+    url_ids = resolve_url_ids(c, list(pending))
+    counts = Counter()
+    for url, count in pending.items():
+        if url in url_ids:
+            counts[url_ids[url]] += count
+    # Bumps row_version itself so the per-row version trigger does not run a second UPDATE
+    c.executemany('''UPDATE urls SET clicks = clicks + ?, trending = logaddexp(trending, ?),
+                                     row_version = row_version + 1, last_updated = ?
+                     WHERE id = ?''',
+                  [(count, trending_increment(count, now), now, url_id) for url_id, count in counts.items()])
+    c.executemany('''INSERT INTO click_windows (url_id, window_start, clicks) VALUES (?, ?, ?)
+                     ON CONFLICT(url_id, window_start) DO UPDATE SET clicks = clicks + excluded.clicks''',
+                  [(url_id, window_start, count) for url_id, count in counts.items()])
+    
+    if now - last_window_prune > CLICK_WINDOW_SECONDS:
+        c.execute("DELETE FROM click_windows WHERE window_start < ?",
+                  (now - CLICK_WINDOW_RETENTION_DAYS * 86400,))
+        last_window_prune = now
+    
+    # The clicked rows as (url, domain, tags, weight change) for the suggestion index
+    changes = []
+    url_id_list = list(counts)
+    for i in range(0, len(url_id_list), 500):
+        chunk = url_id_list[i:i + 500]
+        c.execute(f"SELECT id, url, domain, tags FROM urls WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+        changes.extend((url, domain, tags, counts[url_id]) for url_id, url, domain, tags in c.fetchall())
+    return changes
+
+def flush_clicks():
+    """Write buffered clicks: totals, hourly windows and trending scores in one transaction"""
+    with click_buffer_lock:
+        pending = dict(click_buffer)
+        click_buffer.clear()
+    if not pending:
+        return 0
+    
+    try:
+        changes = db_writer.run(write_clicks, pending, time.time())
+        suggest_index.reweight(changes)
+        return sum(pending.values())
+    except Exception as e:
+        print(f"Error flushing clicks: {str(e)}")
+        # Put the clicks back so the next flush retries them
+        with click_buffer_lock:
+            for url, count in pending.items():
+                click_buffer[url] = click_buffer.get(url, 0) + count
+        return 0
+
+def flush_clicks_periodically():
+    while True:
+        time.sleep(CLICK_FLUSH_INTERVAL)
+        flush_clicks()
+
+def rescore_trending(c, url_ids):
+    """Writer operation: recompute the trending scores of url_ids from their click windows"""
+    placeholders = ','.join('?' * len(url_ids))
+    c.execute(f"SELECT url_id, window_start, clicks FROM click_windows WHERE url_id IN ({placeholders}) AND clicks > 0",
+              url_ids)
+    # Rows with no retained windows lose their score
+    scores = dict.fromkeys(url_ids)
+    for url_id, window_start, clicks in c.fetchall():
+        midpoint = window_start + CLICK_WINDOW_SECONDS / 2
+        scores[url_id] = logaddexp(scores[url_id], trending_increment(clicks, midpoint))
+    c.executemany("UPDATE urls SET trending = ? WHERE id = ? AND trending IS NOT ?",
+                  [(score, url_id, score) for url_id, score in scores.items()])
+    return sum(1 for score in scores.values() if score is not None)
+
+def rebuild_trending(batch_size=TRENDING_REBUILD_BATCH):
+    """Recompute every trending score from the retained click windows
+    
+    Walks the ids in batches and rescores each batch in one db_writer
+    operation, so clicks flushed meanwhile are never overwritten and the
+    write lock is only held for a batch at a time.
+    """
+    conn = connect_db()
+    c = conn.cursor()
+    last_id, scored = 0, 0
+    while True:
+        c.execute("SELECT id FROM urls WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size))
+        url_ids = [row[0] for row in c.fetchall()]
+        if not url_ids:
+            break
+        scored += db_writer.run(rescore_trending, url_ids)
+        last_id = url_ids[-1]
+    conn.close()
+    return scored
+
+@app.cli.command('rebuild-trending')
+@click.option('--batch-size', default=TRENDING_REBUILD_BATCH, show_default=True)
+def rebuild_trending_command(batch_size):
+    """Recompute trending scores from the click windows, e.g. after changing the half-life."""
+    print(f"Rebuilt trending scores for {rebuild_trending(batch_size=batch_size)} URLs")
+
+# Flush buffered clicks in the background and on shutdown
+click_thread = threading.Thread(target=flush_clicks_periodically)
+click_thread.daemon = True
+if not POOL_WORKER:
+    click_thread.start()
+    atexit.register(flush_clicks)
+
+# Typeahead suggestions
+_WORD_RE = re.compile(r'\w+')
+
+def suggest_key(text):
+    """Normalise text into a lowercase, single-spaced, length-capped index key"""
+    return ' '.join(text.lower().split())[:SUGGEST_MAX_KEY_LENGTH]
+
+def suggest_weight(clicks, rating):
+    return (clicks or 0) + (rating or 0) * 10
+
+class SuggestIndex:
+    """Prefix index over titles, domains and tags for the /suggest endpoint
+
+    Keys live in a sorted list with a parallel list of entry ids, so a prefix
+    lookup is a bisect. Keys of newly stored rows wait in a small sorted list
+    and are merged in SUGGEST_MERGE_SIZE at a time. Small ranges are ranked on
+    the fly; prefixes matching more than SUGGEST_SCAN_LIMIT keys rank a bounded
+    sample of them and keep their top entries in an LRU cache, which clicks and
+    ratings update as they change entry weights.
+    """
+    def __init__(self, max_keys=SUGGEST_MAX_KEYS, limit=SUGGEST_LIMIT):
+        self.max_keys = max_keys
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.ready = False
+        self._reset()
+    
+    def _reset(self):
+        self.keys = []
+        self.key_entries = []
+        self.new_pairs = []    # sorted (key, entry id) not merged into keys yet
+        self.entries = []      # entry id -> (kind, label, target)
+        self.weights = []      # entry id -> weight
+        self.entry_ids = {}    # (kind, target) -> entry id
+        self.top_cache = OrderedDict()    # prefix -> top entry ids, least recently used first
+    
+    @staticmethod
+    def entry_keys(kind, label):
+        """Index keys for an entry; titles are also reachable from their later words"""
+        if kind == 'domain':
+            keys = {suggest_key(label)}
+            if label.startswith('www.'):
+                keys.add(suggest_key(label[4:]))
+            return keys
+        key = suggest_key(label)
+        keys = {key}
+        if kind == 'title':
+            for match in list(_WORD_RE.finditer(key))[1:6]:
+                keys.add(key[match.start():])
+        return keys
+    
+    @staticmethod
+    def row_entries(url, title, domain, tags):
+        entries = []
+        if title:
+            entries.append(('title', title, url))
+        if domain:
+            entries.append(('domain', domain, domain))
+        for tag in (tags or '').split(','):
+            if tag.strip():
+                entries.append(('tag', tag.strip(), tag.strip().lower()))
+        return entries
+    
+    def rebuild(self):
+        """Rebuild the index from the urls table, most clicked rows first"""
+        try:
+            conn = connect_db()
+            c = conn.cursor()
+            c.execute("SELECT url, title, domain, tags, clicks, rating FROM urls ORDER BY clicks DESC, rating DESC")
+            
+            entries, weights, entry_ids, pairs = [], [], {}, []
+            while len(pairs) < self.max_keys:
+                rows = c.fetchmany(1000)
+                if not rows:
+                    break
+                for url, title, domain, tags, clicks, rating in rows:
+                    if len(pairs) >= self.max_keys:
+                        break
+                    weight = suggest_weight(clicks, rating)
+                    for kind, label, target in self.row_entries(url, title, domain, tags):
+                        entry_id = entry_ids.get((kind, target))
+                        if entry_id is not None:
+                            weights[entry_id] += weight
+                            continue
+                        entry_id = entry_ids[(kind, target)] = len(entries)
+                        entries.append((kind, label, target))
+                        weights.append(weight)
+                        pairs.extend((key, entry_id) for key in self.entry_keys(kind, label))
+            conn.close()
+            
+            pairs.sort()
+            with self.lock:
+                self._reset()
+                self.keys = [key for key, _ in pairs]
+                self.key_entries = [entry_id for _, entry_id in pairs]
+                self.entries = entries
+                self.weights = weights
+                self.entry_ids = entry_ids
+                self.ready = True
+        except Exception as e:
+            print(f"Error building suggestion index: {str(e)}")
+    
+    def add(self, url, title, domain, tags, clicks=0, rating=0):
+        """Add a newly stored row, keeping the index within max_keys"""
+        weight = suggest_weight(clicks, rating)
+        with self.lock:
+            for kind, label, target in self.row_entries(url, title, domain, tags):
+                entry_id = self.entry_ids.get((kind, target))
+                if entry_id is not None:
+                    self.weights[entry_id] += weight
+                    self._update_cache(entry_id)
+                    continue
+                keys = self.entry_keys(kind, label)
+                if len(self.keys) + len(self.new_pairs) + len(keys) > self.max_keys:
+                    continue
+                entry_id = self.entry_ids[(kind, target)] = len(self.entries)
+                self.entries.append((kind, label, target))
+                self.weights.append(weight)
+                for key in keys:
+                    bisect.insort(self.new_pairs, (key, entry_id))
+                self._update_cache(entry_id)
+            if len(self.new_pairs) >= SUGGEST_MERGE_SIZE:
+                self._merge()
+    
+    def _merge(self):
+        """Fold the pending keys of new rows into the sorted key lists in one pass"""
+        pairs = list(heapq.merge(zip(self.keys, self.key_entries), self.new_pairs))
+        self.keys = [key for key, _ in pairs]
+        self.key_entries = [entry_id for _, entry_id in pairs]
+        self.new_pairs = []
+    
+    def reweight(self, changes):
+        """Apply (url, domain, tags, weight change) updates from click and rating writes"""
+        with self.lock:
+            for url, domain, tags, change in changes:
+                if not change:
+                    continue
+                # Only the (kind, target) of each entry matters here, so the URL stands in for the title
+                for kind, _, target in self.row_entries(url, url, domain, tags):
+                    entry_id = self.entry_ids.get((kind, target))
+                    if entry_id is not None:
+                        self.weights[entry_id] += change
+                        self._update_cache(entry_id, dropped=change < 0)
+    
+    def _update_cache(self, entry_id, dropped=False):
+        """Fold an entry whose weight changed into the cached top lists of its prefixes
+        
+        A cached list an entry dropped within is discarded instead, since an
+        uncached entry may now outrank it.
+        """
+        kind, label, _ = self.entries[entry_id]
+        weight = self.weights[entry_id]
+        prefixes = {key[:n] for key in self.entry_keys(kind, label) for n in range(1, len(key) + 1)}
+        for prefix in prefixes & self.top_cache.keys():
+            top = self.top_cache[prefix]
+            if dropped:
+                if entry_id in top:
+                    del self.top_cache[prefix]
+                continue
+            if entry_id not in top:
+                if len(top) >= self.limit and weight <= self.weights[top[-1]]:
+                    continue
+                top.append(entry_id)
+            top.sort(key=lambda i: self.weights[i], reverse=True)
+            del top[self.limit:]
+    
+    def _top(self, prefix):
+        cached = self.top_cache.get(prefix)
+        if cached is not None:
+            self.top_cache.move_to_end(prefix)
+            return cached
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\uffff', start)
+        # Broad prefixes rank an even sample of their range, so a miss reads at most SUGGEST_MAX_SCAN keys
+        step = max(1, -(-(end - start) // SUGGEST_MAX_SCAN))
+        candidates = set(self.key_entries[start:end:step])
+        low = bisect.bisect_left(self.new_pairs, (prefix,))
+        high = bisect.bisect_left(self.new_pairs, (prefix + '\uffff',), low)
+        candidates.update(entry_id for _, entry_id in self.new_pairs[low:high])
+        top = heapq.nlargest(self.limit, candidates, key=self.weights.__getitem__)
+        if end - start + high - low > SUGGEST_SCAN_LIMIT:
+            self.top_cache[prefix] = top
+            if len(self.top_cache) > SUGGEST_MAX_CACHED_PREFIXES:
+                self.top_cache.popitem(last=False)
+        return top
+    
+    def suggest(self, prefix, limit=None):
+        """Return up to limit suggestions for a prefix, heaviest first"""
+        prefix = suggest_key(prefix)
+        if not prefix:
+            return []
+        with self.lock:
+            top = self._top(prefix)[:limit or self.limit]
+            return [{'type': self.entries[i][0], 'text': self.entries[i][1], 'target': self.entries[i][2]}
+                    for i in top]
+
+suggest_index = SuggestIndex()
+
+# Build the suggestion index in the background
+suggest_thread = threading.Thread(target=suggest_index.rebuild)
+suggest_thread.daemon = True
+if not POOL_WORKER:
+    suggest_thread.start()
+
 # Routes
 @app.route('/')
 def home():
-    top_urls = get_urls(limit=12, order_by='clicks')
+    top_urls = get_urls(limit=12, order_by='trending')
     recent_urls = get_urls(limit=12, order_by='recent')
     popular_domains = get_popular_domains()
     categories = get_categories()
+    tag_cloud = get_tag_cloud()
     
-    conn = sqlite3.connect(DATA_FILE)
+    conn = connect_read()
     c = conn.cursor()
     c.execute("SELECT COUNT(*) FROM urls")
     total_urls = c.fetchone()[0]
@@ -376,7 +2829,8 @@ def home():
                          recent_urls=recent_urls,
                          total_urls=total_urls,
                          popular_domains=popular_domains,
-                         categories=categories)
+                         categories=categories,
+                         tag_cloud=tag_cloud)
 
 @app.route('/add', methods=['POST'])
 def add_url():
@@ -384,6 +2838,10 @@ def add_url():
     if not url:
         return jsonify({'success': False, 'message': 'Please provide a URL'}), 400
     
+    wait = rate_limiters['add'].acquire(client_id())
+    if wait:
+        return too_many_requests(wait)
+    
     try:
         # Validate URL format
         if not validators.url(url):
@@ -397,8 +2855,9 @@ def add_url():
             return jsonify({'success': False, 'message': 'This URL already exists or is in processing queue'}), 400
         
         # Add to queue
-        with open(URLS_FILE, 'a') as f:
-            f.write(url + '\n')
+        if not ingest_queue.add(url):
+            return too_many_requests(ingest_queue.retry_after(),
+                                     'The crawler is busy, please try again later')
         
         return jsonify({'success': True, 'message': 'URL added to processing queue!'})
     
@@ -409,14 +2868,20 @@ def add_url():
 
 @app.route('/search')
 def search():
-    query = request.args.get('q', '').lower().strip()
+    query = request.args.get('q', '').lower().strip()[:SEARCH_MAX_QUERY_LENGTH]
     category = request.args.get('category', '')
     domain = request.args.get('domain', '')
+    rating = request.args.get('rating', '')
+    rating = int(rating) if rating.isdigit() and int(rating) <= 5 else None
+    page = request.args.get('page', '1')
+    page = int(page) if page.isdigit() else 1
     
     if not query and not category and not domain:
         return redirect(url_for('home'))
     
-    results = search_urls(query, category if category != 'all' else None, domain if domain != 'all' else None)
+    filters = (query, category if category != 'all' else None, domain if domain != 'all' else None, rating)
+    data = search_urls(*filters, page=page)
+    facets = search_facets(*filters)
     categories = get_categories()
     popular_domains = get_popular_domains()
     
@@ -424,68 +2889,95 @@ def search():
                          query=query,
                          category=category,
                          domain=domain,
-                         results=results,
+                         rating=rating,
+                         results=data['urls'],
+                         total=data['total'],
+                         total_exact=data['total_exact'],
+                         page=data['page'],
+                         total_pages=data['total_pages'],
+                         facets=facets,
                          categories=categories,
                          popular_domains=popular_domains)
 
+@app.route('/suggest')
+def suggest():
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', str(SUGGEST_LIMIT))
+    limit = min(int(limit), SUGGEST_LIMIT) if limit.isdigit() and int(limit) > 0 else SUGGEST_LIMIT
+    
+    return jsonify({'query': query, 'suggestions': suggest_index.suggest(query, limit)})
+
 @app.route('/click', methods=['POST'])
 def track_click():
     url = request.json.get('url')
     if url:
-        conn = sqlite3.connect(DATA_FILE)
-        c = conn.cursor()
-        c.execute("UPDATE urls SET clicks = clicks + 1 WHERE url = ?", (url,))
-        conn.commit()
-        conn.close()
+        wait = rate_limiters['click'].acquire(client_id())
+        if wait:
+            return too_many_requests(wait)
+        record_click(url)
         return jsonify({'success': True})
     return jsonify({'success': False}), 404
 
+def apply_rating(c, url, rating):
+    """Writer operation: fold a rating into the stored one, or return None for an unknown URL
+    
+    Returns the new rating and the row's suggestion weight change as
+    (url, domain, tags, change).
+    """
+    url_id = find_url_id(c, [url])
+    if url_id is None:
+        return None
+    
+    # Get current rating to calculate new average
+    c.execute("SELECT rating, url, domain, tags FROM urls WHERE id = ?", (url_id,))
+    current_rating, stored_url, domain, tags = c.fetchone()
+    
+    if current_rating == 0:
+        new_rating = rating
+    else:
+        new_rating = round((current_rating + rating) / 2, 1)
+    
+    c.execute("UPDATE urls SET rating = ? WHERE id = ?", (new_rating, url_id))
+    suggest_change = (stored_url, domain, tags,
+                      suggest_weight(0, new_rating) - suggest_weight(0, current_rating))
+    return new_rating, suggest_change
+
 @app.route('/rate', methods=['POST'])
 def rate_url():
     url = request.json.get('url')
     rating = request.json.get('rating')
     
     if url and rating in (1, 2, 3, 4, 5):
-        conn = sqlite3.connect(DATA_FILE)
-        c = conn.cursor()
-        
-        # Get current rating to calculate new average
-        c.execute("SELECT rating FROM urls WHERE url = ?", (url,))
-        current_rating = c.fetchone()[0]
-        
-        if current_rating == 0:
-            new_rating = rating
-        else:
-            new_rating = round((current_rating + rating) / 2, 1)
-        
-        c.execute("UPDATE urls SET rating = ? WHERE url = ?", (new_rating, url))
-        conn.commit()
-        conn.close()
+        result = db_writer.run(apply_rating, url, rating)
+        if result is None:
+            return jsonify({'success': False}), 404
+        new_rating, suggest_change = result
+        suggest_index.reweight([suggest_change])
         return jsonify({'success': True, 'new_rating': new_rating})
     return jsonify({'success': False}), 400
 
 @app.route('/all')
 def all_urls():
     try:
-        # Get and validate page number
-        page = request.args.get('page', '1')
-        if not page.isdigit() or int(page) < 1:
-            page = 1
-        else:
-            page = int(page)
-        
         category = request.args.get('category', 'all')
         domain = request.args.get('domain', 'all')
         
-        # Get paginated data
+        # First batch; the page loads the rest from /feed as it scrolls
+        feed = {'order': 'clicks', 'variant': 'default'}
+        if category != 'all':
+            feed['category'] = category
+        if domain != 'all':
+            feed['domain'] = domain
+        try:
+            cursor = decode_cursor(request.args.get('cursor'), 'clicks')
+        except ValueError:
+            cursor = None
+        
         try:
-            data = get_paginated_urls(
-                page=page, 
-                category=category if category != 'all' else None,
-                domain=domain if domain != 'all' else None
-            )
+            urls, next_cursor = get_feed('clicks', category=feed.get('category'), domain=feed.get('domain'),
+                                         cursor=cursor)
         except Exception as e:
-            print(f"Error getting paginated URLs: {str(e)}")
+            print(f"Error getting URLs: {str(e)}")
             return render_template('error.html', message="Could not load URLs. Please try again later."), 500
         
         # Get categories and popular domains
@@ -498,10 +2990,9 @@ def all_urls():
             popular_domains = []
         
         return render_template('all.html', 
-                            urls=data.get('urls', []), 
-                            page=data.get('page', 1), 
-                            total_pages=data.get('total_pages', 1),
-                            total=data.get('total', 0),
+                            urls=urls, 
+                            next_cursor=next_cursor,
+                            feed=feed,
                             category=category,
                             domain=domain,
                             categories=categories,
@@ -511,103 +3002,520 @@ def all_urls():
         print(f"Unexpected error in all_urls: {str(e)}")
         return render_template('error.html', message="An unexpected error occurred."), 500
 
-def get_paginated_urls(page=1, per_page=50, category=None, domain=None):
-    conn = None
+@app.route('/category/<category_name>')
+def category_view(category_name):
+    try:
+        cursor = decode_cursor(request.args.get('cursor'), 'clicks')
+    except ValueError:
+        cursor = None
+    top_urls, next_cursor = get_feed('clicks', category=category_name, cursor=cursor)
+    recent_urls = get_urls(limit=12, order_by='recent', category=category_name)
+    
+    conn = connect_read()
+    c = conn.cursor()
+    c.execute("SELECT description FROM categories WHERE name = ?", (category_name,))
+    category_desc = c.fetchone()
+    category_desc = category_desc[0] if category_desc else ""
+    
+    c.execute("SELECT COUNT(*) FROM urls WHERE category = ?", (category_name,))
+    total_urls = c.fetchone()[0]
+    conn.close()
+    
+    return render_template('category.html', 
+                         category_name=category_name,
+                         category_desc=category_desc,
+                         top_urls=top_urls,
+                         next_cursor=next_cursor,
+                         feed={'order': 'clicks', 'variant': 'category', 'category': category_name},
+                         recent_urls=recent_urls,
+                         total_urls=total_urls)
+
+@app.route('/tag/<tag_name>')
+def tag_view(tag_name):
+    tag = get_tag(tag_name)
+    if not tag:
+        abort(404)
+    
+    before = request.args.get('before', '')
+    before = int(before) if before.isdigit() else None
+    urls, next_before = get_tag_urls(tag['id'], before=before)
+    
+    return render_template('tag.html',
+                         tag=tag,
+                         urls=urls,
+                         next_before=next_before)
+
+@app.route('/feed')
+def feed():
+    """Next batch of a listing for infinite scroll: the rows, their rendered cards and the next cursor"""
+    order_by = request.args.get('order', 'clicks')
+    variant = request.args.get('variant', 'default')
+    if order_by not in FEED_ORDERS or variant not in CARD_VARIANTS:
+        return jsonify({'success': False, 'message': 'Unknown order or card variant'}), 400
+    
+    limit = request.args.get('limit', '')
+    limit = min(int(limit), FEED_MAX_PAGE_SIZE) if limit.isdigit() and int(limit) > 0 else FEED_PAGE_SIZE
+    try:
+        cursor = decode_cursor(request.args.get('cursor'), order_by)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+    
+    urls, next_cursor = get_feed(order_by,
+                                 category=request.args.get('category') or None,
+                                 domain=request.args.get('domain') or None,
+                                 cursor=cursor,
+                                 limit=limit)
+    return jsonify({
+        'success': True,
+        'urls': [url._asdict() for url in urls],
+        'html': ''.join(card_cache.render(url, variant) for url in urls),
+        'next_cursor': next_cursor
+    })
+
+@app.route('/domain/<domain_name>')
+def domain_view(domain_name):
     try:
-        conn = sqlite3.connect(DATA_FILE)
+        cursor = decode_cursor(request.args.get('cursor'), 'clicks')
+    except ValueError:
+        cursor = None
+    urls, next_cursor = get_feed('clicks', domain=domain_name, cursor=cursor)
+    stats = get_domain_stats(domain_name)
+    
+    return render_template('domain.html', 
+                         domain_name=domain_name,
+                         stats=stats,
+                         urls=urls,
+                         next_cursor=next_cursor,
+                         feed={'order': 'clicks', 'variant': 'domain', 'domain': domain_name})
+
+def is_admin_request():
+    """Admin pages need ADMIN_TOKEN when it is set, otherwise a local client"""
+    if ADMIN_TOKEN:
+        token = request.args.get('token') or request.headers.get('X-Admin-Token')
+        return token == ADMIN_TOKEN
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/admin/queries')
+def admin_queries():
+    if not is_admin_request():
+        abort(403)
+    
+    sort = request.args.get('sort', 'total_ms')
+    stats = get_query_stats(sort=sort)
+    with query_stats_lock:
+        recent_slow = list(slow_queries)[::-1]
+    
+    if request.args.get('format') == 'json':
+        return jsonify({'threshold_ms': SLOW_QUERY_MS, 'stats': stats, 'slow': recent_slow})
+    
+    return render_template('admin_queries.html',
+                         sort=sort,
+                         stats=stats,
+                         recent_slow=recent_slow,
+                         threshold_ms=SLOW_QUERY_MS,
+                         token=request.args.get('token', ''))
+
+@app.route('/img/<name>')
+def image_file(name):
+    # Names are content hashes, so a file never changes once written
+    response = send_from_directory(IMAGE_DIR, name, max_age=IMAGE_CACHE_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/admin/metrics')
+def admin_metrics():
+    if not is_admin_request():
+        abort(403)
+    return jsonify({
+        'writer': db_writer.metrics(),
+        'images': {'dropped': image_pipeline.dropped},
+        'card_cache': card_cache.stats(),
+        'maintenance': maintenance.stats(),
+        'ingest_queue': ingest_queue.stats(),
+        'crawler': crawl_pipeline.stats(),
+        'rate_limits': {name: limiter.stats() for name, limiter in rate_limiters.items()},
+        'read_replica': read_replica.stats() if read_replica else None,
+        'warmup': warmup.stats()
+    })
+
+@app.route('/admin/queries/reset', methods=['POST'])
+def admin_queries_reset():
+    if not is_admin_request():
+        abort(403)
+    reset_query_stats()
+    return jsonify({'success': True})
+
+# Streaming export
+def export_rows(since=None, after_id=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield urls rows as tuples of EXPORT_COLUMNS in keyset batches
+    
+    With since, rows whose last_updated is later than it come out in
+    (last_updated, id) order, otherwise every row with an id above after_id
+    in id order. Each batch is its own short read, so a long export never
+    holds a lock that would stall the writer and memory stays at one batch.
+    """
+    columns = ', '.join(EXPORT_COLUMNS)
+    if since is not None:
+        query = f'''SELECT {columns} FROM urls WHERE (last_updated, id) > (?, ?)
+                    ORDER BY last_updated, id LIMIT ?'''
+        key = (since, after_id or 0)
+    else:
+        query = f'''SELECT {columns} FROM urls WHERE id > ? ORDER BY id LIMIT ?'''
+        key = (after_id or 0,)
+    
+    while True:
+        # Not connect_read: a replica snapshot could lag behind the export watermark
+        conn = connect_db()
         c = conn.cursor()
+        c.execute(query, key + (batch_size,))
+        rows = c.fetchall()
+        conn.close()
         
-        # Build base queries
-        base_query = "FROM urls WHERE 1=1"
-        params = []
-        
-        if category:
-            base_query += " AND category = ?"
-            params.append(category)
-            
-        if domain:
-            base_query += " AND domain LIKE ?"
-            params.append(f"%{domain}%")
-        
-        # Get total count
-        count_query = f"SELECT COUNT(*) {base_query}"
-        c.execute(count_query, params)
-        total = c.fetchone()[0]
-        
-        # Calculate total pages
-        total_pages = max(1, (total + per_page - 1) // per_page)
-        
-        # Validate page number
-        page = max(1, min(page, total_pages))
-        
-        # Get paginated results
-        offset = (page - 1) * per_page
-        query = f"SELECT * {base_query} ORDER BY clicks DESC, rating DESC LIMIT ? OFFSET ?"
-        params.extend([per_page, offset])
-        
-        c.execute(query, params)
-        results = [dict(zip([column[0] for column in c.description], row)) for row in c.fetchall()]
-        
-        return {
-            'urls': results,
-            'total': total,
-            'page': page,
-            'per_page': per_page,
-            'total_pages': total_pages
-        }
-        
-    except Exception as e:
-        print(f"Error in get_paginated_urls: {str(e)}")
-        raise
-    finally:
-        if conn:
-            conn.close()
+        for row in rows:
+            yield row
+        if len(rows) < batch_size:
+            return
+        last = rows[-1]
+        key = (last[EXPORT_COLUMNS.index('last_updated')], last[0]) if since is not None else (last[0],)
+
+def export_chunks(rows, fmt='ndjson', chunk_bytes=EXPORT_CHUNK_BYTES):
+    """Encode rows as NDJSON or CSV and yield them in chunks of about chunk_bytes"""
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        write_row = writer.writerow
+    else:
+        def write_row(row):
+            buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False, separators=(',', ':')))
+            buffer.write('\n')
+    
+    for row in rows:
+        write_row(row)
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def gzip_chunks(chunks):
+    """Compress a stream of byte chunks into one gzip member"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def parse_export_args(since, after_id):
+    """Validate the since/after_id parameters, raising ValueError for bad input"""
+    since = float(since) if since not in (None, '') else None
+    after_id = int(after_id) if after_id not in (None, '') else None
+    return since, after_id
+
+@app.route('/export')
+def export():
+    if not is_admin_request():
+        abort(403)
+    
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({'success': False, 'message': 'format must be ndjson or csv'}), 400
+    try:
+        since, after_id = parse_export_args(request.args.get('since'), request.args.get('after_id'))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'since and after_id must be numbers'}), 400
+    
+    # Rows changed after this moment are left for the next incremental export
+    started = time.time()
+    chunks = export_chunks(export_rows(since, after_id), fmt)
+    filename = f'urls.{fmt}'
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    if request.args.get('compress') == 'gzip':
+        chunks = gzip_chunks(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={filename}',
+        'X-Export-Started': f'{started:.6f}'
+    })
+
+@app.cli.command('export')
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default='ndjson', show_default=True)
+@click.option('--since', help='Only rows updated after this Unix timestamp.')
+@click.option('--after-id', help='Only rows with a larger id (or, with --since, the tie-breaker).')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+@click.option('--output', default='-', help='File to write, stdout by default.')
+def export_command(fmt, since, after_id, compress, output):
+    """Stream the urls table as NDJSON or CSV."""
+    try:
+        since, after_id = parse_export_args(since, after_id)
+    except ValueError:
+        print("Error: --since and --after-id must be numbers")
+        return
+    
+    started = time.time()
+    chunks = export_chunks(export_rows(since, after_id), fmt)
+    if compress:
+        chunks = gzip_chunks(chunks)
+    with click.open_file(output, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    # Pass this as --since next time to export only what changed in between
+    click.echo(f"Export started at {started:.6f}", err=True)
+
+# Front-end assets
+_CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+_CSS_CLASS_RE = re.compile(r'\.((?:\\[0-9a-fA-F]{1,6} ?|\\.|[A-Za-z0-9_-])+)')
+_CSS_ESCAPE_RE = re.compile(r'\\([0-9a-fA-F]{1,6} ?|.)')
+_CSS_URL_RE = re.compile(r'url\(\s*[\'"]?([^\'")]+)[\'"]?\s*\)')
+_CANDIDATE_RE = re.compile(r'[A-Za-z0-9_:/.%-]+')
+
+def load_asset_manifest():
+    """URLs for the built assets, or the CDN stylesheet and unhashed script when not built"""
+    try:
+        with open(ASSET_MANIFEST) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    return {
+        'css': f"/static/dist/{manifest['app.css']}" if 'app.css' in manifest else None,
+        'js': f"/static/dist/{manifest['app.js']}" if 'app.js' in manifest else '/static/js/app.js'
+    }
 
-@app.route('/category/<category_name>')
-def category_view(category_name):
-    page = int(request.args.get('page', 1))
-    top_urls = get_urls(limit=12, order_by='clicks', category=category_name)
-    recent_urls = get_urls(limit=12, order_by='recent', category=category_name)
+asset_urls = load_asset_manifest()
+
+def unescape_css(name):
+    def replace(match):
+        value = match.group(1)
+        if len(value.strip()) > 1 or value.strip() and value[0] in '0123456789abcdefABCDEF':
+            return chr(int(value.strip(), 16))
+        return value
+    return _CSS_ESCAPE_RE.sub(replace, name)
+
+def split_css(text):
+    """Split a stylesheet into (prelude, body) pairs; at-rule bodies are left as text"""
+    blocks = []
+    i = 0
+    while True:
+        start = text.find('{', i)
+        if start < 0:
+            break
+        prelude = text[i:start]
+        # Block-less statements such as @charset or @import end with a semicolon
+        if ';' in prelude:
+            statements, prelude = prelude.rsplit(';', 1)
+            blocks.append((statements.strip() + ';', None))
+        depth = 1
+        end = start + 1
+        while depth:
+            if text[end] == '{':
+                depth += 1
+            elif text[end] == '}':
+                depth -= 1
+            end += 1
+        blocks.append((prelude.strip(), text[start + 1:end - 1]))
+        i = end
+    return blocks
+
+def split_selectors(prelude):
+    """Split a selector list on commas outside parentheses"""
+    selectors, depth, current = [], 0, ''
+    for char in prelude:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        if char == ',' and depth == 0:
+            selectors.append(current.strip())
+            current = ''
+        else:
+            current += char
+    selectors.append(current.strip())
+    return selectors
+
+def purge_css(text, used_classes):
+    """Drop style rules whose selectors mention a class the templates never use"""
+    output = []
+    for prelude, body in split_css(_CSS_COMMENT_RE.sub('', text)):
+        if body is None:
+            # The bundle is served as UTF-8 and @charset is only valid first in a file
+            if not prelude.startswith('@charset'):
+                output.append(prelude)
+        elif prelude.startswith(('@media', '@supports')):
+            inner = purge_css(body, used_classes)
+            if inner:
+                output.append(f"{prelude}{{{inner}}}")
+        elif prelude.startswith('@'):
+            # @font-face, @keyframes and friends are kept as they are
+            output.append(f"{prelude}{{{body}}}")
+        else:
+            selectors = [selector for selector in split_selectors(prelude)
+                         if all(unescape_css(name) in used_classes for name in _CSS_CLASS_RE.findall(selector))]
+            if selectors:
+                output.append(f"{','.join(selectors)}{{{body.strip()}}}")
+    return ''.join(output)
+
+def collect_used_classes():
+    """Every token in the templates and shared script that could be a class name
     
-    conn = sqlite3.connect(DATA_FILE)
-    c = conn.cursor()
-    c.execute("SELECT description FROM categories WHERE name = ?", (category_name,))
-    category_desc = c.fetchone()
-    category_desc = category_desc[0] if category_desc else ""
+    Like Tailwind's own purge this over-collects (any word counts), which is
+    harmless; the point is that classes used nowhere are never kept.
+    """
+    sources = [os.path.join('templates', name) for name in os.listdir('templates') if name.endswith('.html')]
+    sources.append(ASSET_JS_SOURCE)
+    used = set()
+    for path in sources:
+        with open(path, encoding='utf-8') as f:
+            used.update(_CANDIDATE_RE.findall(f.read()))
+    return used
+
+def fetch_asset_source(url):
+    """Download a vendor file once into ASSET_CACHE_DIR and return its bytes"""
+    os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+    path = os.path.join(ASSET_CACHE_DIR, hashlib.sha256(url.encode('utf-8')).hexdigest()[:16] + '-' + os.path.basename(urlparse(url).path))
+    if not os.path.exists(path):
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()
+        with open(path + '.tmp', 'wb') as f:
+            f.write(response.content)
+        os.replace(path + '.tmp', path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+def write_hashed_asset(name, data):
+    """Write data under static/dist as name.<content hash>.ext and return the file name"""
+    base, ext = os.path.splitext(name)
+    hashed_name = f"{base}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+    path = os.path.join(ASSET_DIST_DIR, hashed_name)
+    if not os.path.exists(path):
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+    return hashed_name
+
+def build_assets():
+    """Build the purged stylesheet and shared script and point the manifest at them"""
+    global asset_urls
+    os.makedirs(ASSET_DIST_DIR, exist_ok=True)
+    used_classes = collect_used_classes()
     
-    c.execute("SELECT COUNT(*) FROM urls WHERE category = ?", (category_name,))
-    total_urls = c.fetchone()[0]
-    conn.close()
+    css_parts = []
+    for source_url in ASSET_CSS_SOURCES:
+        css = purge_css(fetch_asset_source(source_url).decode('utf-8'), used_classes)
+        
+        # Fonts and images the kept rules refer to are fingerprinted alongside
+        def rewrite_url(match):
+            target = match.group(1)
+            if target.startswith('data:'):
+                return match.group(0)
+            absolute = urljoin(source_url, target)
+            hashed_name = write_hashed_asset(os.path.basename(urlparse(absolute).path), fetch_asset_source(absolute))
+            return f"url({hashed_name})"
+        css_parts.append(_CSS_URL_RE.sub(rewrite_url, css))
     
-    return render_template('category.html', 
-                         category_name=category_name,
-                         category_desc=category_desc,
-                         top_urls=top_urls,
-                         recent_urls=recent_urls,
-                         total_urls=total_urls)
+    with open(ASSET_JS_SOURCE, 'rb') as f:
+        script = f.read()
+    manifest = {
+        'app.css': write_hashed_asset('app.css', '\n'.join(css_parts).encode('utf-8')),
+        'app.js': write_hashed_asset('app.js', script)
+    }
+    with open(ASSET_MANIFEST + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(ASSET_MANIFEST + '.tmp', ASSET_MANIFEST)
+    asset_urls = load_asset_manifest()
+    return manifest
 
-@app.route('/domain/<domain_name>')
-def domain_view(domain_name):
-    page = int(request.args.get('page', 1))
-    urls = get_urls(limit=50, order_by='clicks', domain=domain_name)
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Build the purged, content-hashed CSS and JS bundle."""
+    manifest = build_assets()
+    for name, hashed_name in manifest.items():
+        size = os.path.getsize(os.path.join(ASSET_DIST_DIR, hashed_name))
+        print(f"{name} -> static/dist/{hashed_name} ({size / 1024:.1f} KB)")
+
+@app.context_processor
+def inject_assets():
+    return {'assets': asset_urls}
+
+@app.after_request
+def cache_built_assets(response):
+    # Built files are named after their content, so they never change
+    if request.path.startswith('/static/dist/') and response.status_code == 200:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = ASSET_CACHE_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+# Rendered card cache
+CARD_VARIANTS = {
+    'default': {'show_domain': True, 'show_category': True, 'show_thumbnail': False, 'footer': 'visits'},
+    'home': {'show_domain': True, 'show_category': True, 'show_thumbnail': True, 'footer': 'visits'},
+    'home_recent': {'show_domain': True, 'show_category': True, 'show_thumbnail': True, 'footer': 'added'},
+    'category': {'show_domain': True, 'show_category': False, 'show_thumbnail': False, 'footer': 'visits'},
+    'category_recent': {'show_domain': True, 'show_category': False, 'show_thumbnail': False, 'footer': 'added'},
+    'domain': {'show_domain': False, 'show_category': True, 'show_thumbnail': False, 'footer': 'visits'}
+}
+
+class CardCache:
+    """LRU of rendered URL cards keyed by (id, row_version, variant)
     
-    conn = sqlite3.connect(DATA_FILE)
-    c = conn.cursor()
-    c.execute("SELECT count FROM popular_domains WHERE domain = ?", (domain_name,))
-    domain_count = c.fetchone()
-    domain_count = domain_count[0] if domain_count else 0
-    conn.close()
+    Every change to a rendered column bumps urls.row_version (see
+    init_urls_table), so a changed row simply misses and its old fragments age out of the LRU.
+    """
+    def __init__(self, max_size=CARD_CACHE_SIZE):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
     
-    return render_template('domain.html', 
-                         domain_name=domain_name,
-                         domain_count=domain_count,
-                         urls=urls)
+    def render(self, url, variant):
+        key = (url.get('id'), url.get('row_version'), variant)
+        if key[0] is None or key[1] is None:
+            # Rows from queries that do not select the version cannot be cached
+            return self.render_uncached(url, variant)
+        with self.lock:
+            html = self.entries.get(key)
+            if html is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+        
+        html = self.render_uncached(url, variant)
+        with self.lock:
+            self.entries[key] = html
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return html
+    
+    def render_uncached(self, url, variant):
+        template = app.jinja_env.get_template('card.html')
+        return Markup(template.render(url=url, **CARD_VARIANTS[variant]))
+    
+    def stats(self):
+        with self.lock:
+            return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+card_cache = CardCache()
+
+@app.template_filter('card')
+def card_filter(url, variant='default'):
+    return card_cache.render(url, variant)
 
 # Template filters
 @app.template_filter('domain')
 def domain_filter(url):
     return urlparse(url).netloc
 
+@app.template_filter('image_url')
+def image_url_filter(digest, size, ext):
+    return url_for('image_file', name=image_file_name(digest, size, ext))
+
 @app.template_filter('time')
 def time_filter(timestamp):
     return datetime.fromtimestamp(timestamp).strftime('%b %d, %Y')
@@ -630,8 +3538,12 @@ index_template = '''
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Yamajodo</title>
       <link rel="icon" href="/static/icon.ico" type="image/x-icon">
+    {% if assets.css %}
+    <link href="{{ assets.css }}" rel="stylesheet">
+    {% else %}
     <link href="https://cdn.jsdelivr.net/npm/tailwindcss@2.2.19/dist/tailwind.min.css" rel="stylesheet">
     <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css">
+    {% endif %}
     <style>
         .star-rating {
             color: #fbbf24;
@@ -684,12 +3596,13 @@ index_template = '''
         
         <!-- Search Box -->
         <div class="max-w-2xl mx-auto mb-10">
-            <form action="/search" method="get" class="flex">
-                <input type="text" name="q" placeholder="Search websites..." 
+            <form action="/search" method="get" class="flex relative">
+                <input type="text" name="q" id="searchInput" placeholder="Search websites..." autocomplete="off"
                        class="flex-grow px-4 py-2 border border-gray-300 rounded-l-lg focus:outline-none focus:ring-2 focus:ring-blue-500">
                 <button type="submit" class="bg-blue-600 text-white px-6 py-2 rounded-r-lg hover:bg-blue-700 transition">
                     <i class="fas fa-search"></i> Search
                 </button>
+                <div id="suggestions" class="absolute left-0 right-0 top-full mt-1 bg-white rounded-lg shadow-md z-10 hidden-content"></div>
             </form>
         </div>
         
@@ -701,6 +3614,9 @@ index_template = '''
             <button onclick="toggleVisibility('domains')" class="px-4 py-2 bg-blue-100 text-blue-800 rounded-lg hover:bg-blue-200 transition">
                 <i class="fas fa-globe mr-2"></i>Toggle Domains
             </button>
+            <button onclick="toggleVisibility('tags')" class="px-4 py-2 bg-blue-100 text-blue-800 rounded-lg hover:bg-blue-200 transition">
+                <i class="fas fa-tags mr-2"></i>Toggle Tags
+            </button>
             <button onclick="toggleVisibility('addUrlForm')" class="px-4 py-2 bg-green-100 text-green-800 rounded-lg hover:bg-green-200 transition">
                 <i class="fas fa-plus mr-2"></i>Add URL
             </button>
@@ -740,46 +3656,34 @@ index_template = '''
                 {% for domain in popular_domains %}
                 <a href="/domain/{{ domain.domain }}" class="px-4 py-2 bg-white rounded-lg hover:bg-gray-100 transition flex items-center">
                     <span class="text-gray-800">{{ domain.domain }}</span>
-                    <span class="ml-2 bg-blue-100 text-blue-800 text-xs px-2 py-1 rounded-full">{{ domain.count }}</span>
+                    <span class="ml-2 bg-blue-100 text-blue-800 text-xs px-2 py-1 rounded-full">{{ domain.url_count }}</span>
                 </a>
                 {% endfor %}
             </div>
         </div>
         
-        <!-- Popular Websites -->
+        <!-- Tag Cloud (Hidden by default) -->
+        <div id="tags" class="hidden-content mb-12">
+            <h2 class="text-2xl font-semibold mb-6 text-gray-800 border-b pb-2">Popular Tags</h2>
+            <div class="flex flex-wrap gap-2">
+                {% for tag in tag_cloud %}
+                <a href="/tag/{{ tag.name }}" class="px-4 py-2 bg-white rounded-lg hover:bg-gray-100 transition flex items-center">
+                    <span class="text-gray-800">#{{ tag.name }}</span>
+                    <span class="ml-2 bg-blue-100 text-blue-800 text-xs px-2 py-1 rounded-full">{{ tag.url_count }}</span>
+                </a>
+                {% endfor %}
+            </div>
+        </div>
+        
+        <!-- Trending Websites -->
         <div class="mb-12">
             <h2 class="text-2xl font-semibold mb-6 text-gray-800 border-b pb-2 flex justify-between items-center">
-                <span>Popular Websites</span>
-                <a href="/all?page=1" class="text-sm font-normal text-blue-600 hover:underline">View All</a>
+                <span>Trending Websites</span>
+                <a href="/all" class="text-sm font-normal text-blue-600 hover:underline">View All</a>
             </h2>
             <div class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
                 {% for url in top_urls %}
-                <div class="url-item bg-white rounded-lg p-4 shadow-sm hover:shadow-md transition" onclick="window.open('{{ url.url }}', '_blank'); trackClick('{{ url.url }}')">
-                    <div class="flex items-start">
-                        <div class="flex-1">
-                            <h3 class="font-semibold text-lg mb-1">
-                                {{ url.title|shorten(50) }}
-                            </h3>
-                            <div class="flex items-center mb-2">
-                                <span class="text-sm text-gray-500">{{ url.domain|domain }}</span>
-                                {% if url.category %}
-                                <span class="ml-2 text-xs px-2 py-1 rounded bg-blue-100 text-blue-800">{{ url.category }}</span>
-                                {% endif %}
-                            </div>
-                        </div>
-                    </div>
-                    <p class="text-gray-600 text-sm mb-3">{{ url.description|shorten(100) }}</p>
-                    <div class="flex justify-between items-center">
-                        <div class="star-rating" title="{{ url.rating }} stars" onclick="event.stopPropagation();">
-                            {% for i in range(1, 6) %}
-                                <span onclick="rateUrl('{{ url.url }}', {{ i }})" class="cursor-pointer">
-                                    {{ '★' if i <= url.rating|round else '☆' }}
-                                </span>
-                            {% endfor %}
-                        </div>
-                        <span class="text-xs text-gray-500">{{ "{:,}".format(url.clicks) }} visits</span>
-                    </div>
-                </div>
+                {{ url|card('home') }}
                 {% endfor %}
             </div>
         </div>
@@ -789,94 +3693,13 @@ index_template = '''
             <h2 class="text-2xl font-semibold mb-6 text-gray-800 border-b pb-2">Recently Added</h2>
             <div class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
                 {% for url in recent_urls %}
-                <div class="url-item bg-white rounded-lg p-4 shadow-sm hover:shadow-md transition" onclick="window.open('{{ url.url }}', '_blank'); trackClick('{{ url.url }}')">
-                    <div class="flex items-start">
-                        <div class="flex-1">
-                            <h3 class="font-semibold text-lg mb-1">
-                                {{ url.title|shorten(50) }}
-                            </h3>
-                            <div class="flex items-center mb-2">
-                                <span class="text-sm text-gray-500">{{ url.domain|domain }}</span>
-                                {% if url.category %}
-                                <span class="ml-2 text-xs px-2 py-1 rounded bg-blue-100 text-blue-800">{{ url.category }}</span>
-                                {% endif %}
-                            </div>
-                        </div>
-                    </div>
-                    <p class="text-gray-600 text-sm mb-3">{{ url.description|shorten(100) }}</p>
-                    <div class="flex justify-between items-center">
-                        <div class="star-rating" title="{{ url.rating }} stars" onclick="event.stopPropagation();">
-                            {% for i in range(1, 6) %}
-                                <span onclick="rateUrl('{{ url.url }}', {{ i }})" class="cursor-pointer">
-                                    {{ '★' if i <= url.rating|round else '☆' }}
-                                </span>
-                            {% endfor %}
-                        </div>
-                        <span class="text-xs text-gray-500">Added: {{ url.created_at|time }}</span>
-                    </div>
-                </div>
+                {{ url|card('home_recent') }}
                 {% endfor %}
             </div>
         </div>
     </div>
     
-    <script>
-        function addUrl(e) {
-            e.preventDefault();
-            const url = document.getElementById('urlInput').value.trim();
-            if (!url) return;
-            
-            fetch('/add', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
-                body: `url=${encodeURIComponent(url)}`
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    alert('URL added successfully! It will be processed shortly.');
-                    document.getElementById('urlInput').value = '';
-                    setTimeout(() => location.reload(), 1500);
-                } else {
-                    alert('Error: ' + data.message);
-                }
-            })
-            .catch(error => {
-                alert('An error occurred: ' + error);
-            });
-        }
-        
-        function trackClick(url) {
-            fetch('/click', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ url })
-            });
-        }
-        
-        function rateUrl(url, rating) {
-            fetch('/rate', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ url, rating })
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    location.reload();
-                }
-            });
-        }
-        
-        function toggleVisibility(id) {
-            const element = document.getElementById(id);
-            if (element.style.display === 'none' || element.style.display === '') {
-                element.style.display = 'block';
-            } else {
-                element.style.display = 'none';
-            }
-        }
-    </script>
+    <script src="{{ assets.js }}"></script>
 </body>
 </html>
 '''
@@ -889,8 +3712,12 @@ search_template = '''
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Search Results for "{{ query }}"</title>
+    {% if assets.css %}
+    <link href="{{ assets.css }}" rel="stylesheet">
+    {% else %}
     <link href="https://cdn.jsdelivr.net/npm/tailwindcss@2.2.19/dist/tailwind.min.css" rel="stylesheet">
     <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css">
+    {% endif %}
     <style>
         .star-rating {
             color: #fbbf24;
@@ -912,7 +3739,7 @@ search_template = '''
             <h1 class="text-3xl font-bold text-blue-800 mb-2">
                 {% if query %}Search Results for "{{ query }}"{% else %}Browse Websites{% endif %}
             </h1>
-            <p class="text-gray-600">{{ results|length }} results found</p>
+            <p class="text-gray-600">{% if total_exact %}{{ "{:,}".format(total) }} results found{% else %}About {{ "{:,}".format(total) }} results{% endif %}</p>
         </header>
         
         <!-- Search Filters -->
@@ -950,38 +3777,66 @@ search_template = '''
             </form>
         </div>
         
+        <div class="grid grid-cols-1 md:grid-cols-4 gap-8">
+        <!-- Facets -->
+        <aside class="md:col-span-1 space-y-6">
+            <div class="bg-white p-4 rounded-lg shadow-sm">
+                <h3 class="font-semibold text-gray-800 mb-2">Category</h3>
+                {% for name, count in facets.categories %}
+                <a href="{{ url_for('search', q=query, category=name, domain=domain or None, rating=rating) }}" class="flex justify-between text-sm py-1 hover:text-blue-600 {% if name == category %}font-semibold text-blue-600{% else %}text-gray-700{% endif %}">
+                    <span>{{ name }}</span><span class="text-gray-500">{{ "{:,}".format(count) }}</span>
+                </a>
+                {% else %}
+                <p class="text-sm text-gray-500">None</p>
+                {% endfor %}
+            </div>
+            <div class="bg-white p-4 rounded-lg shadow-sm">
+                <h3 class="font-semibold text-gray-800 mb-2">Domain</h3>
+                {% for name, count in facets.domains %}
+                <a href="{{ url_for('search', q=query, category=category or None, domain=name, rating=rating) }}" class="flex justify-between text-sm py-1 hover:text-blue-600 {% if name == domain %}font-semibold text-blue-600{% else %}text-gray-700{% endif %}">
+                    <span class="truncate mr-2">{{ name }}</span><span class="text-gray-500">{{ "{:,}".format(count) }}</span>
+                </a>
+                {% endfor %}
+            </div>
+            <div class="bg-white p-4 rounded-lg shadow-sm">
+                <h3 class="font-semibold text-gray-800 mb-2">Rating</h3>
+                {% for bucket, count in facets.ratings %}
+                <a href="{{ url_for('search', q=query, category=category or None, domain=domain or None, rating=bucket) }}" class="flex justify-between text-sm py-1 hover:text-blue-600 {% if bucket == rating %}font-semibold text-blue-600{% else %}text-gray-700{% endif %}">
+                    <span class="star-rating">{% if bucket %}{{ '★' * bucket }}{{ '☆' * (5 - bucket) }}{% else %}<span class="text-gray-500">Unrated</span>{% endif %}</span>
+                    <span class="text-gray-500">{{ "{:,}".format(count) }}</span>
+                </a>
+                {% endfor %}
+                {% if rating is not none %}
+                <a href="{{ url_for('search', q=query, category=category or None, domain=domain or None) }}" class="block text-sm text-blue-600 hover:underline mt-2">Any rating</a>
+                {% endif %}
+            </div>
+        </aside>
+        
         <!-- Search Results -->
+        <div class="md:col-span-3">
         {% if results %}
         <div class="space-y-4">
             {% for url in results %}
-                        <div class="url-item bg-white rounded-lg p-4 shadow-sm hover:shadow-md transition" onclick="window.open('{{ url.url }}', '_blank'); trackClick('{{ url.url }}')">
-                <div class="flex items-start">
-                    <div class="flex-1">
-                        <h3 class="font-semibold text-lg mb-1">
-                            {{ url.title|shorten(50) }}
-                        </h3>
-                        <div class="flex items-center mb-2">
-                            <span class="text-sm text-gray-500">{{ url.domain|domain }}</span>
-                            {% if url.category %}
-                            <span class="ml-2 text-xs px-2 py-1 rounded bg-blue-100 text-blue-800">{{ url.category }}</span>
-                            {% endif %}
-                        </div>
-                    </div>
-                </div>
-                <p class="text-gray-600 text-sm mb-3">{{ url.description|shorten(100) }}</p>
-                <div class="flex justify-between items-center">
-                    <div class="star-rating" title="{{ url.rating }} stars" onclick="event.stopPropagation();">
-                        {% for i in range(1, 6) %}
-                            <span onclick="rateUrl('{{ url.url }}', {{ i }})" class="cursor-pointer">
-                                {{ '★' if i <= url.rating|round else '☆' }}
-                            </span>
-                        {% endfor %}
-                    </div>
-                    <span class="text-xs text-gray-500">{{ "{:,}".format(url.clicks) }} visits</span>
-                </div>
-            </div>
+            {{ url|card('default') }}
             {% endfor %}
         </div>
+        
+        <!-- Pagination -->
+        {% if total_pages > 1 %}
+        <div class="flex justify-center items-center mt-8">
+            {% if page > 1 %}
+            <a href="{{ url_for('search', q=query, category=category or None, domain=domain or None, rating=rating, page=page - 1) }}" class="px-4 py-2 border border-gray-300 rounded-l-lg hover:bg-gray-100 transition">
+                <i class="fas fa-chevron-left"></i> Previous
+            </a>
+            {% endif %}
+            <span class="px-4 py-2 border border-gray-300 text-gray-600">Page {{ page }} of {{ total_pages }}</span>
+            {% if page < total_pages %}
+            <a href="{{ url_for('search', q=query, category=category or None, domain=domain or None, rating=rating, page=page + 1) }}" class="px-4 py-2 border border-gray-300 rounded-r-lg hover:bg-gray-100 transition">
+                Next <i class="fas fa-chevron-right"></i>
+            </a>
+            {% endif %}
+        </div>
+        {% endif %}
         {% else %}
         <div class="bg-white p-8 rounded-lg shadow-md text-center">
             <i class="fas fa-search fa-3x text-gray-300 mb-4"></i>
@@ -989,6 +3844,8 @@ search_template = '''
             <p class="text-gray-500">Try different search terms or filters</p>
         </div>
         {% endif %}
+        </div>
+        </div>
         
         <!-- Back to Home -->
         <div class="mt-8 text-center">
@@ -998,29 +3855,7 @@ search_template = '''
         </div>
     </div>
     
-    <script>
-        function trackClick(url) {
-            fetch('/click', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ url })
-            });
-        }
-        
-        function rateUrl(url, rating) {
-            fetch('/rate', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ url, rating })
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    location.reload();
-                }
-            });
-        }
-    </script>
+    <script src="{{ assets.js }}"></script>
 </body>
 </html>
 '''
@@ -1032,9 +3867,13 @@ all_template = '''
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>All Websites - Page {{ page }}</title>
+    <title>All Websites - Web Directory</title>
+    {% if assets.css %}
+    <link href="{{ assets.css }}" rel="stylesheet">
+    {% else %}
     <link href="https://cdn.jsdelivr.net/npm/tailwindcss@2.2.19/dist/tailwind.min.css" rel="stylesheet">
     <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css">
+    {% endif %}
     <style>
         .star-rating {
             color: #fbbf24;
@@ -1047,10 +3886,6 @@ all_template = '''
             transform: translateY(-2px);
             box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1), 0 2px 4px -1px rgba(0, 0, 0, 0.06);
         }
-        .pagination .active {
-            background-color: #3b82f6;
-            color: white;
-        }
     </style>
 </head>
 <body class="bg-gray-50">
@@ -1058,7 +3893,7 @@ all_template = '''
         <!-- Header -->
         <header class="text-center mb-12">
             <h1 class="text-3xl font-bold text-blue-800 mb-2">All Websites</h1>
-            <p class="text-gray-600">Page {{ page }} of {{ total_pages }} ({{ "{:,}".format(total) }} total)</p>
+            <p class="text-gray-600">Most visited first</p>
         </header>
         
         <!-- Search and Filters -->
@@ -1095,69 +3930,12 @@ all_template = '''
         </div>
         
         <!-- All URLs List -->
-        <div class="space-y-4 mb-8">
+        <div id="feedList" class="space-y-4 mb-8">
             {% for url in urls %}
-            <div class="url-item bg-white rounded-lg p-4 shadow-sm hover:shadow-md transition" onclick="window.open('{{ url.url }}', '_blank'); trackClick('{{ url.url }}')">
-                <div class="flex items-start">
-                    <div class="flex-1">
-                        <h3 class="font-semibold text-lg mb-1">
-                            {{ url.title|shorten(50) }}
-                        </h3>
-                        <div class="flex items-center mb-2">
-                            <span class="text-sm text-gray-500">{{ url.domain|domain }}</span>
-                            {% if url.category %}
-                            <span class="ml-2 text-xs px-2 py-1 rounded bg-blue-100 text-blue-800">{{ url.category }}</span>
-                            {% endif %}
-                        </div>
-                    </div>
-                </div>
-                <p class="text-gray-600 text-sm mb-3">{{ url.description|shorten(100) }}</p>
-                <div class="flex justify-between items-center">
-                    <div class="star-rating" title="{{ url.rating }} stars" onclick="event.stopPropagation();">
-                        {% for i in range(1, 6) %}
-                            <span onclick="rateUrl('{{ url.url }}', {{ i }})" class="cursor-pointer">
-                                {{ '★' if i <= url.rating|round else '☆' }}
-                            </span>
-                        {% endfor %}
-                    </div>
-                    <span class="text-xs text-gray-500">{{ "{:,}".format(url.clicks) }} visits</span>
-                </div>
-            </div>
+            {{ url|card('default') }}
             {% endfor %}
         </div>
-        
-        <!-- Pagination -->
-        <div class="flex justify-center mb-8">
-            <div class="inline-flex rounded-md shadow-sm">
-                {% if page > 1 %}
-                <a href="/all?page={{ page - 1 }}{% if category != 'all' %}&category={{ category }}{% endif %}{% if domain != 'all' %}&domain={{ domain }}{% endif %}" 
-                   class="px-4 py-2 border border-gray-300 rounded-l-lg hover:bg-gray-100 transition">
-                    <i class="fas fa-chevron-left"></i> Previous
-                </a>
-                {% endif %}
-                
-                {% for p in range(1, total_pages + 1) %}
-                    {% if p == page %}
-                    <a href="/all?page={{ p }}{% if category != 'all' %}&category={{ category }}{% endif %}{% if domain != 'all' %}&domain={{ domain }}{% endif %}" 
-                       class="px-4 py-2 border border-gray-300 bg-blue-600 text-white">
-                        {{ p }}
-                    </a>
-                    {% else %}
-                    <a href="/all?page={{ p }}{% if category != 'all' %}&category={{ category }}{% endif %}{% if domain != 'all' %}&domain={{ domain }}{% endif %}" 
-                       class="px-4 py-2 border border-gray-300 hover:bg-gray-100 transition">
-                        {{ p }}
-                    </a>
-                    {% endif %}
-                {% endfor %}
-                
-                {% if page < total_pages %}
-                <a href="/all?page={{ page + 1 }}{% if category != 'all' %}&category={{ category }}{% endif %}{% if domain != 'all' %}&domain={{ domain }}{% endif %}" 
-                   class="px-4 py-2 border border-gray-300 rounded-r-lg hover:bg-gray-100 transition">
-                    Next <i class="fas fa-chevron-right"></i>
-                </a>
-                {% endif %}
-            </div>
-        </div>
+        {% include 'feed_more.html' %}
         
         <!-- Back to Home -->
         <div class="text-center">
@@ -1167,29 +3945,7 @@ all_template = '''
         </div>
     </div>
     
-    <script>
-        function trackClick(url) {
-            fetch('/click', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ url })
-            });
-        }
-        
-        function rateUrl(url, rating) {
-            fetch('/rate', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ url, rating })
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    location.reload();
-                }
-            });
-        }
-    </script>
+    <script src="{{ assets.js }}"></script>
 </body>
 </html>
 '''
@@ -1202,8 +3958,12 @@ category_template = '''
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{{ category_name }} - Web Directory</title>
+    {% if assets.css %}
+    <link href="{{ assets.css }}" rel="stylesheet">
+    {% else %}
     <link href="https://cdn.jsdelivr.net/npm/tailwindcss@2.2.19/dist/tailwind.min.css" rel="stylesheet">
     <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css">
+    {% endif %}
     <style>
         .star-rating {
             color: #fbbf24;
@@ -1227,69 +3987,26 @@ category_template = '''
             <p class="text-gray-600 mt-2">{{ "{:,}".format(total_urls) }} websites in this category</p>
         </header>
         
-        <!-- Popular in Category -->
+        <!-- Recently Added in Category -->
         <div class="mb-12">
-            <h2 class="text-2xl font-semibold mb-6 text-gray-800 border-b pb-2">Popular in {{ category_name }}</h2>
+            <h2 class="text-2xl font-semibold mb-6 text-gray-800 border-b pb-2">Recently Added in {{ category_name }}</h2>
             <div class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
-                {% for url in top_urls %}
-                <div class="url-item bg-white rounded-lg p-4 shadow-sm hover:shadow-md transition" onclick="window.open('{{ url.url }}', '_blank'); trackClick('{{ url.url }}')">
-                    <div class="flex items-start">
-                        <div class="flex-1">
-                            <h3 class="font-semibold text-lg mb-1">
-                                {{ url.title|shorten(50) }}
-                            </h3>
-                            <div class="flex items-center mb-2">
-                                <span class="text-sm text-gray-500">{{ url.domain|domain }}</span>
-                            </div>
-                        </div>
-                    </div>
-                    <p class="text-gray-600 text-sm mb-3">{{ url.description|shorten(100) }}</p>
-                    <div class="flex justify-between items-center">
-                        <div class="star-rating" title="{{ url.rating }} stars" onclick="event.stopPropagation();">
-                            {% for i in range(1, 6) %}
-                                <span onclick="rateUrl('{{ url.url }}', {{ i }})" class="cursor-pointer">
-                                    {{ '★' if i <= url.rating|round else '☆' }}
-                                </span>
-                            {% endfor %}
-                        </div>
-                        <span class="text-xs text-gray-500">{{ "{:,}".format(url.clicks) }} visits</span>
-                    </div>
-                </div>
+                {% for url in recent_urls %}
+                {{ url|card('category_recent') }}
                 {% endfor %}
             </div>
         </div>
         
-        <!-- Recently Added in Category -->
+        <!-- Popular in Category, last since it keeps loading as it scrolls -->
         <div class="mb-12">
-            <h2 class="text-2xl font-semibold mb-6 text-gray-800 border-b pb-2">Recently Added in {{ category_name }}</h2>
-            <div class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
-                {% for url in recent_urls %}
-                <div class="url-item bg-white rounded-lg p-4 shadow-sm hover:shadow-md transition" onclick="window.open('{{ url.url }}', '_blank'); trackClick('{{ url.url }}')">
-                    <div class="flex items-start">
-                        <div class="flex-1">
-                            <h3 class="font-semibold text-lg mb-1">
-                                {{ url.title|shorten(50) }}
-                            </h3>
-                            <div class="flex items-center mb-2">
-                                <span class="text-sm text-gray-500">{{ url.domain|domain }}</span>
-                            </div>
-                        </div>
-                    </div>
-                    <p class="text-gray-600 text-sm mb-3">{{ url.description|shorten(100) }}</p>
-                    <div class="flex justify-between items-center">
-                        <div class="star-rating" title="{{ url.rating }} stars" onclick="event.stopPropagation();">
-                            {% for i in range(1, 6) %}
-                                <span onclick="rateUrl('{{ url.url }}', {{ i }})" class="cursor-pointer">
-                                    {{ '★' if i <= url.rating|round else '☆' }}
-                                </span>
-                            {% endfor %}
-                        </div>
-                        <span class="text-xs text-gray-500">Added: {{ url.created_at|time }}</span>
-                    </div>
-                </div>
+            <h2 class="text-2xl font-semibold mb-6 text-gray-800 border-b pb-2">Popular in {{ category_name }}</h2>
+            <div id="feedList" class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
+                {% for url in top_urls %}
+                {{ url|card('category') }}
                 {% endfor %}
             </div>
         </div>
+        {% include 'feed_more.html' %}
         
         <!-- Back to Home -->
         <div class="text-center">
@@ -1299,29 +4016,7 @@ category_template = '''
         </div>
     </div>
     
-    <script>
-        function trackClick(url) {
-            fetch('/click', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ url })
-            });
-        }
-        
-        function rateUrl(url, rating) {
-            fetch('/rate', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ url, rating })
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    location.reload();
-                }
-            });
-        }
-    </script>
+    <script src="{{ assets.js }}"></script>
 </body>
 </html>
 '''
@@ -1334,8 +4029,12 @@ domain_template = '''
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{{ domain_name }} - Web Directory</title>
+    {% if assets.css %}
+    <link href="{{ assets.css }}" rel="stylesheet">
+    {% else %}
     <link href="https://cdn.jsdelivr.net/npm/tailwindcss@2.2.19/dist/tailwind.min.css" rel="stylesheet">
     <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css">
+    {% endif %}
     <style>
         .star-rating {
             color: #fbbf24;
@@ -1355,39 +4054,27 @@ domain_template = '''
         <!-- Header -->
         <header class="text-center mb-12">
             <h1 class="text-3xl font-bold text-blue-800 mb-2">{{ domain_name }}</h1>
-            <p class="text-gray-600">{{ "{:,}".format(domain_count) }} websites from this domain</p>
+            <p class="text-gray-600">{{ "{:,}".format(stats.url_count if stats else 0) }} websites from this domain</p>
+            {% if stats %}
+            <p class="text-sm text-gray-500 mt-2">
+                <span class="mr-4"><i class="fas fa-mouse-pointer"></i> {{ "{:,}".format(stats.clicks) }} clicks</span>
+                {% if stats.rating %}
+                <span class="mr-4"><i class="fas fa-star star-rating"></i> {{ stats.rating }} average rating</span>
+                {% endif %}
+                {% if stats.last_crawled %}
+                <span><i class="fas fa-clock"></i> Last crawled {{ stats.last_crawled|time }}</span>
+                {% endif %}
+            </p>
+            {% endif %}
         </header>
         
         <!-- Websites from this domain -->
-        <div class="space-y-4">
+        <div id="feedList" class="space-y-4">
             {% for url in urls %}
-            <div class="url-item bg-white rounded-lg p-4 shadow-sm hover:shadow-md transition" onclick="window.open('{{ url.url }}', '_blank'); trackClick('{{ url.url }}')">
-                <div class="flex items-start">
-                    <div class="flex-1">
-                        <h3 class="font-semibold text-lg mb-1">
-                            {{ url.title|shorten(50) }}
-                        </h3>
-                        {% if url.category %}
-                        <div class="mb-2">
-                            <span class="text-xs px-2 py-1 rounded bg-blue-100 text-blue-800">{{ url.category }}</span>
-                        </div>
-                        {% endif %}
-                    </div>
-                </div>
-                <p class="text-gray-600 text-sm mb-3">{{ url.description|shorten(100) }}</p>
-                <div class="flex justify-between items-center">
-                    <div class="star-rating" title="{{ url.rating }} stars" onclick="event.stopPropagation();">
-                        {% for i in range(1, 6) %}
-                            <span onclick="rateUrl('{{ url.url }}', {{ i }})" class="cursor-pointer">
-                                {{ '★' if i <= url.rating|round else '☆' }}
-                            </span>
-                        {% endfor %}
-                    </div>
-                    <span class="text-xs text-gray-500">{{ "{:,}".format(url.clicks) }} visits</span>
-                </div>
-            </div>
+            {{ url|card('domain') }}
             {% endfor %}
         </div>
+        {% include 'feed_more.html' %}
         
         <!-- Back to Home -->
         <div class="mt-8 text-center">
@@ -1397,48 +4084,309 @@ domain_template = '''
         </div>
     </div>
     
-    <script>
-        function trackClick(url) {
-            fetch('/click', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ url })
-            });
+    <script src="{{ assets.js }}"></script>
+</body>
+</html>
+'''
+
+# Tag template
+tag_template = '''
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>#{{ tag.name }} - Web Directory</title>
+    {% if assets.css %}
+    <link href="{{ assets.css }}" rel="stylesheet">
+    {% else %}
+    <link href="https://cdn.jsdelivr.net/npm/tailwindcss@2.2.19/dist/tailwind.min.css" rel="stylesheet">
+    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css">
+    {% endif %}
+    <style>
+        .star-rating {
+            color: #fbbf24;
         }
-        
-        function rateUrl(url, rating) {
-            fetch('/rate', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ url, rating })
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    location.reload();
-                }
-            });
+        .url-item {
+            transition: all 0.2s;
+            cursor: pointer;
+        }
+        .url-item:hover {
+            transform: translateY(-2px);
+            box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1), 0 2px 4px -1px rgba(0, 0, 0, 0.06);
         }
-    </script>
+    </style>
+</head>
+<body class="bg-gray-50">
+    <div class="container mx-auto px-4 py-8">
+        <!-- Header -->
+        <header class="text-center mb-12">
+            <h1 class="text-3xl font-bold text-blue-800 mb-2">#{{ tag.name }}</h1>
+            <p class="text-gray-600">{{ "{:,}".format(tag.url_count) }} websites with this tag</p>
+        </header>
+        
+        <!-- Websites with this tag, newest first -->
+        <div class="space-y-4">
+            {% for url in urls %}
+            {{ url|card('default') }}
+            {% endfor %}
+        </div>
+        
+        <!-- Next page -->
+        {% if next_before %}
+        <div class="mt-8 text-center">
+            <a href="/tag/{{ tag.name }}?before={{ next_before }}" class="inline-block bg-blue-600 text-white px-6 py-2 rounded-lg hover:bg-blue-700 transition">
+                Older <i class="fas fa-chevron-right"></i>
+            </a>
+        </div>
+        {% endif %}
+        
+        <!-- Back to Home -->
+        <div class="mt-8 text-center">
+            <a href="/" class="inline-block bg-gray-200 text-gray-700 px-6 py-2 rounded-lg hover:bg-gray-300 transition">
+                <i class="fas fa-arrow-left"></i> Back to Home
+            </a>
+        </div>
+    </div>
+    
+    <script src="{{ assets.js }}"></script>
+</body>
+</html>
+'''
+
+# URL card template, rendered once per row version (see CardCache)
+card_template = '''<div class="url-item bg-white rounded-lg p-4 shadow-sm hover:shadow-md transition" onclick="window.open('{{ url.url }}', '_blank'); trackClick('{{ url.url }}')">
+    <div class="flex items-start">
+        {% if url.favicon %}
+        <img src="{{ url.favicon|image_url(32, 'png') }}" srcset="{{ url.favicon|image_url(64, 'png') }} 2x" width="16" height="16" class="mr-2 mt-1.5" loading="lazy" alt="">
+        {% endif %}
+        <div class="flex-1">
+            <h3 class="font-semibold text-lg mb-1">
+                {{ url.title|shorten(50) }}
+            </h3>
+            {% if show_domain %}
+            <div class="flex items-center mb-2">
+                <span class="text-sm text-gray-500">{{ url.domain|domain }}</span>
+                {% if show_category and url.category %}
+                <span class="ml-2 text-xs px-2 py-1 rounded bg-blue-100 text-blue-800">{{ url.category }}</span>
+                {% endif %}
+            </div>
+            {% elif url.category %}
+            <div class="mb-2">
+                <span class="text-xs px-2 py-1 rounded bg-blue-100 text-blue-800">{{ url.category }}</span>
+            </div>
+            {% endif %}
+        </div>
+    </div>
+    {% if show_thumbnail and url.thumbnail %}
+    <img src="{{ url.thumbnail|image_url(320, 'webp') }}" srcset="{{ url.thumbnail|image_url(320, 'webp') }} 320w, {{ url.thumbnail|image_url(640, 'webp') }} 640w" sizes="(min-width: 1024px) 320px, 100vw" width="320" height="180" class="w-full h-auto rounded mb-3" loading="lazy" alt="">
+    {% endif %}
+    <p class="text-gray-600 text-sm mb-3">{{ url.description|shorten(100) }}</p>
+    <div class="flex justify-between items-center">
+        <div class="star-rating" title="{{ url.rating }} stars" onclick="event.stopPropagation();">
+            {% for i in range(1, 6) %}
+                <span onclick="rateUrl('{{ url.url }}', {{ i }})" class="cursor-pointer">
+                    {{ '★' if i <= url.rating|round else '☆' }}
+                </span>
+            {% endfor %}
+        </div>
+        {% if footer == 'added' %}
+        <span class="text-xs text-gray-500">Added: {{ url.created_at|time }}</span>
+        {% else %}
+        <span class="text-xs text-gray-500">{{ "{:,}".format(url.clicks) }} visits</span>
+        {% endif %}
+    </div>
+</div>
+'''
+
+# Admin query stats template
+admin_queries_template = '''
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Query Stats - Admin</title>
+    {% if assets.css %}
+    <link href="{{ assets.css }}" rel="stylesheet">
+    {% else %}
+    <link href="https://cdn.jsdelivr.net/npm/tailwindcss@2.2.19/dist/tailwind.min.css" rel="stylesheet">
+    {% endif %}
+</head>
+<body class="bg-gray-50">
+    <div class="container mx-auto px-4 py-8">
+        <header class="mb-8">
+            <h1 class="text-3xl font-bold text-blue-800 mb-2">Query Stats</h1>
+            <p class="text-gray-600">Statements over {{ threshold_ms }} ms are written to the slow query log with their plan.</p>
+        </header>
+        
+        <!-- Top offenders -->
+        <div class="bg-white p-6 rounded-lg shadow-md mb-8 overflow-x-auto">
+            <h2 class="text-xl font-semibold mb-4 text-gray-800">Top Statements</h2>
+            <table class="w-full text-sm">
+                <thead>
+                    <tr class="text-left text-gray-600 border-b">
+                        {% for key, label in [('count', 'Calls'), ('total_ms', 'Total ms'), ('avg_ms', 'Avg ms'), ('max_ms', 'Max ms'), ('slow_count', 'Slow')] %}
+                        <th class="py-2 pr-4">
+                            <a href="?sort={{ key }}{% if token %}&token={{ token }}{% endif %}" class="{% if sort == key %}text-blue-600 font-semibold{% else %}hover:underline{% endif %}">{{ label }}</a>
+                        </th>
+                        {% endfor %}
+                        <th class="py-2">Fingerprint</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {% for row in stats %}
+                    <tr class="border-b align-top">
+                        <td class="py-2 pr-4">{{ "{:,}".format(row.count) }}</td>
+                        <td class="py-2 pr-4">{{ "%.1f"|format(row.total_ms) }}</td>
+                        <td class="py-2 pr-4">{{ "%.2f"|format(row.avg_ms) }}</td>
+                        <td class="py-2 pr-4">{{ "%.1f"|format(row.max_ms) }}</td>
+                        <td class="py-2 pr-4">{{ row.slow_count }}</td>
+                        <td class="py-2 font-mono text-xs">{{ row.fingerprint }}</td>
+                    </tr>
+                    {% endfor %}
+                </tbody>
+            </table>
+        </div>
+        
+        <!-- Recent slow statements -->
+        <div class="bg-white p-6 rounded-lg shadow-md">
+            <h2 class="text-xl font-semibold mb-4 text-gray-800">Recent Slow Statements</h2>
+            {% for entry in recent_slow %}
+            <div class="border-b py-3">
+                <div class="text-sm text-gray-600 mb-1">{{ entry.time|time }} &middot; {{ entry.duration_ms }} ms</div>
+                <div class="font-mono text-xs mb-1">{{ entry.sql }}</div>
+                <div class="font-mono text-xs text-gray-500 mb-1">params: {{ entry.params }}</div>
+                {% for step in entry.plan %}
+                <div class="font-mono text-xs text-green-700">{{ step }}</div>
+                {% endfor %}
+            </div>
+            {% else %}
+            <p class="text-gray-500">No slow statements recorded.</p>
+            {% endfor %}
+        </div>
+    </div>
 </body>
 </html>
 '''
 
+# "Load more" link after a #feedList; static/js/app.js follows it with /feed requests as it
+# scrolls into view, and without scripts it opens the next batch as a page
+feed_more_template = '''{% if next_cursor %}
+<div class="text-center mt-8 mb-8">
+    <a href="?{{ dict(request.args, cursor=next_cursor)|urlencode }}" class="feed-more inline-block bg-blue-600 text-white px-6 py-2 rounded-lg hover:bg-blue-700 transition"
+       data-feed="/feed?{{ feed|urlencode }}" data-cursor="{{ next_cursor }}">
+        Load more <i class="fas fa-chevron-right"></i>
+    </a>
+</div>
+{% endif %}
+'''
+
 # Write template files
-with open(os.path.join(template_dir, 'index.html'), 'w') as f:
-    f.write(index_template)
+if not POOL_WORKER:
+    with open(os.path.join(template_dir, 'index.html'), 'w') as f:
+        f.write(index_template)
+    
+    with open(os.path.join(template_dir, 'search.html'), 'w') as f:
+        f.write(search_template)
+    
+    with open(os.path.join(template_dir, 'all.html'), 'w') as f:
+        f.write(all_template)
+    
+    with open(os.path.join(template_dir, 'category.html'), 'w') as f:
+        f.write(category_template)
+    
+    with open(os.path.join(template_dir, 'domain.html'), 'w') as f:
+        f.write(domain_template)
+    
+    with open(os.path.join(template_dir, 'tag.html'), 'w') as f:
+        f.write(tag_template)
+    
+    with open(os.path.join(template_dir, 'admin_queries.html'), 'w') as f:
+        f.write(admin_queries_template)
+    
+    with open(os.path.join(template_dir, 'card.html'), 'w') as f:
+        f.write(card_template)
+    
+    with open(os.path.join(template_dir, 'feed_more.html'), 'w') as f:
+        f.write(feed_more_template)
+
+# Boot warm-up
+class Warmup:
+    """Requests the hot pages once so a new worker starts warm
+    
+    Going through the test client compiles the templates, fills the card
+    cache and pulls the pages the hot queries read into the OS page cache,
+    exactly as the first real requests would. It waits for the suggestion
+    index and the read replica first, so those requests hit the data they
+    will be served from.
+    """
+    def __init__(self):
+        self.done = not WARMUP
+        self.started_at = None
+        self.duration_ms = None
+        self.requests = 0
+        self.errors = 0
+    
+    def hot_paths(self):
+        paths = ['/', '/all', '/suggest?q=a']
+        paths.extend(f"/category/{category['name']}" for category in get_categories())
+        paths.extend(f"/domain/{domain['domain']}" for domain in get_popular_domains(WARMUP_DOMAINS))
+        paths.extend('/search?' + urlencode({'q': tag['name']}) for tag in get_tag_cloud(WARMUP_SEARCHES))
+        return paths
+    
+    def run(self):
+        self.started_at = time.time()
+        start = time.perf_counter()
+        try:
+            suggest_thread.join(WARMUP_TIMEOUT)
+            while read_replica and not read_replica.ready and time.perf_counter() - start < WARMUP_TIMEOUT:
+                time.sleep(0.1)
+            
+            for name in app.jinja_env.list_templates():
+                app.jinja_env.get_template(name)
+            client = app.test_client()
+            for path in self.hot_paths():
+                status = client.get(path, environ_overrides={'warmup': True}).status_code
+                self.requests += 1
+                if status >= 500:
+                    self.errors += 1
+        except Exception as e:
+            print(f"Error warming up: {str(e)}")
+        # A failed warm-up still leaves the worker able to serve, just cold
+        self.duration_ms = (time.perf_counter() - start) * 1000
+        self.done = True
+    
+    def stats(self):
+        return {
+            'done': self.done,
+            'started_at': self.started_at,
+            'duration_ms': round(self.duration_ms, 1) if self.duration_ms is not None else None,
+            'requests': self.requests,
+            'errors': self.errors
+        }
 
-with open(os.path.join(template_dir, 'search.html'), 'w') as f:
-    f.write(search_template)
+warmup = Warmup()
 
-with open(os.path.join(template_dir, 'all.html'), 'w') as f:
-    f.write(all_template)
+@app.route('/ready')
+def ready():
+    """Readiness check for the load balancer: 503 until this worker process has warmed up"""
+    if not warmup.done:
+        return jsonify({'ready': False, 'warmup': warmup.stats()}), 503
+    return jsonify({'ready': True})
 
-with open(os.path.join(template_dir, 'category.html'), 'w') as f:
-    f.write(category_template)
+def serving():
+    """Whether this process serves requests, rather than running a flask CLI command like build-assets"""
+    if os.environ.get('FLASK_RUN_FROM_CLI') != 'true':
+        return True
+    # flask run imports the app inside its own command; other commands load it before theirs starts
+    context = click.get_current_context(silent=True)
+    return context is not None and context.info_name == 'run'
 
-with open(os.path.join(template_dir, 'domain.html'), 'w') as f:
-    f.write(domain_template)
+if WARMUP and not POOL_WORKER and serving():
+    warmup_thread = threading.Thread(target=warmup.run)
+    warmup_thread.daemon = True
+    warmup_thread.start()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8080, threaded=True)
\ No newline at end of file
@@ -0,0 +1,234 @@
+"""Crawler throughput benchmark against a local stub web server
+
+Starts a stub HTTP server in a separate process that serves synthetic
+pages with configurable size, latency, redirects, encodings and failure
+rate, then runs the ingestion pipeline (process_url_batch) end to end
+against it and reports URLs/second, CPU per URL, peak memory and DB write
+time as JSON. Pages are parsed in worker processes, so CPU and memory are
+reported for this process and for the workers separately; reports from
+before the parser pool only have the single-process figures:
+
+    python benchmarks/crawler_benchmark.py --urls 500 --page-kb 40 --latency-ms 50 --output crawl.json
+
+The benchmark uses a fresh url_data.db in --workdir for every run.
+"""
+import os
+import sys
+import time
+import random
+import socket
+import argparse
+import resource
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import load_app, run_metadata, write_report
+
+FILLER = {
+    'utf-8': 'Ünïcödé text — naïve café résumé 東京 Москва. ',
+    'iso-8859-1': 'Café crème, déjà vu, façade, jalapeño. ',
+    'windows-1251': 'Привет мир, это тестовая страница. ',
+    'shift_jis': '日本語のテストページです。',
+}
+
+
+def build_page(index, config, encoding):
+    """Return the encoded HTML body for a synthetic page"""
+    rng = random.Random(index)
+    title = f"Synthetic page {index} {FILLER[encoding].split()[0]}"
+    description = f"Benchmark page number {index} served by the stub server. {FILLER[encoding]}"
+    meta_charset = f'<meta charset="{encoding}">' if config['meta_charset'] else ''
+    links = ''.join(f'<li><a href="/page/{rng.randint(0, 10 ** 6)}">link {i}</a></li>' for i in range(20))
+    head = (f'<!DOCTYPE html><html><head>{meta_charset}<title>{title}</title>'
+            f'<meta name="description" content="{description}"></head><body><ul>{links}</ul>')
+    body = []
+    size = len(head)
+    target = config['page_kb'] * 1024
+    while size < target:
+        paragraph = f"<p>{FILLER[encoding] * 8}</p>"
+        body.append(paragraph)
+        size += len(paragraph)
+    return (head + ''.join(body) + '</body></html>').encode(encoding, errors='replace')
+
+
+def make_handler(config):
+    encodings = config['encodings']
+    pages = {}
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            parts = self.path.strip('/').split('/')
+            if len(parts) < 2 or parts[0] != 'page' or not parts[1].isdigit():
+                self.send_error(404)
+                return
+            index = int(parts[1])
+            rng = random.Random(index)
+
+            if config['latency_ms']:
+                time.sleep(config['latency_ms'] / 1000.0)
+
+            roll = rng.random()
+            if roll < config['failure_rate']:
+                if rng.random() < 0.5:
+                    self.send_error(500)
+                else:
+                    # Drop the connection without a response
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                return
+
+            if len(parts) == 2 and rng.random() < config['redirect_rate']:
+                self.send_response(301)
+                self.send_header('Location', f'/page/{index}/final')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            encoding = encodings[index % len(encodings)]
+            if index not in pages:
+                pages[index] = build_page(index, config, encoding)
+            payload = pages[index]
+            self.send_response(200)
+            if config['header_charset']:
+                self.send_header('Content-Type', f'text/html; charset={encoding}')
+            else:
+                self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return StubHandler
+
+
+def serve(config, port_queue):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(config))
+    server.daemon_threads = True
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def worker_usage(pools):
+    """CPU seconds and peak RSS (kB) of each live pool worker process, read from /proc (Linux only)"""
+    ticks = os.sysconf('SC_CLK_TCK')
+    usage = []
+    for pool in pools:
+        for pid in list(getattr(pool, '_processes', None) or {}):
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    # Fields after the parenthesised command name; utime and stime are the 12th and 13th
+                    fields = f.read().rsplit(')', 1)[1].split()
+                with open(f'/proc/{pid}/status') as f:
+                    peak_kb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+            except (OSError, StopIteration):
+                continue
+            usage.append(((int(fields[11]) + int(fields[12])) / ticks, peak_kb))
+    return usage
+
+
+def db_write_ms(app_module):
+    """Total time spent in write statements and commits according to the query stats"""
+    total = 0.0
+    for row in app_module.get_query_stats(limit=None):
+        if row['fingerprint'].split(' ', 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'COMMIT'):
+            total += row['total_ms']
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--workdir', default='/tmp/yamajodo-crawl-bench')
+    parser.add_argument('--urls', type=int, default=300)
+    parser.add_argument('--page-kb', type=int, default=30)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--redirect-rate', type=float, default=0.1)
+    parser.add_argument('--failure-rate', type=float, default=0.05)
+    parser.add_argument('--encodings', default='utf-8,iso-8859-1,windows-1251,shift_jis')
+    parser.add_argument('--no-header-charset', action='store_true',
+                        help='Only declare the charset in a <meta> tag')
+    parser.add_argument('--no-meta-charset', action='store_true')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    config = {
+        'page_kb': args.page_kb,
+        'latency_ms': args.latency_ms,
+        'redirect_rate': args.redirect_rate,
+        'failure_rate': args.failure_rate,
+        'encodings': args.encodings.split(','),
+        'header_charset': not args.no_header_charset,
+        'meta_charset': not args.no_meta_charset
+    }
+    output = os.path.abspath(args.output) if args.output else None
+    workdir = os.path.abspath(args.workdir)
+    os.makedirs(workdir, exist_ok=True)
+    for name in ('url_data.db', 'urls.txt'):
+        if os.path.exists(os.path.join(workdir, name)):
+            os.remove(os.path.join(workdir, name))
+
+    # Start the server before importing the app so the fork happens without its threads
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(config, port_queue), daemon=True)
+    server.start()
+    port = port_queue.get(timeout=10)
+
+    app_module = load_app(workdir)
+    app_module.reset_query_stats()
+    urls = [f'http://127.0.0.1:{port}/page/{i}' for i in range(args.urls)]
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    stored = app_module.process_url_batch(urls)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    write_ms = db_write_ms(app_module)
+    # The workers are children of the fork server, so RUSAGE_CHILDREN never sees them:
+    # sample them while they are still alive, then shut the pools down
+    pools = [app_module.crawl_pipeline.parser, app_module.category_classifier.pool]
+    workers = worker_usage(pool for pool in pools if pool is not None)
+    for pool in pools:
+        if pool is not None:
+            pool.shutdown()
+    worker_cpu = sum(cpu_s for cpu_s, _ in workers)
+
+    server.terminate()
+
+    report = {
+        'benchmark': 'crawler',
+        'metadata': run_metadata(),
+        'config': dict(config, urls=args.urls, max_workers=app_module.MAX_WORKERS,
+                       parse_workers=app_module.PARSE_WORKERS),
+        'results': {
+            'stored': stored,
+            'failed': args.urls - stored,
+            'wall_s': round(wall, 3),
+            'urls_per_s': round(args.urls / wall, 2) if wall else 0.0,
+            'main_process': {
+                'cpu_ms_per_url': round(cpu / args.urls * 1000, 3),
+                'peak_rss_mb': round(rss_after / 1024, 1),
+                'peak_rss_growth_mb': round((rss_after - rss_before) / 1024, 1)
+            },
+            'worker_processes': {
+                'count': len(workers),
+                'cpu_ms_per_url': round(worker_cpu / args.urls * 1000, 3),
+                'max_peak_rss_mb': round(max((peak for _, peak in workers), default=0) / 1024, 1),
+                'total_peak_rss_mb': round(sum(peak for _, peak in workers) / 1024, 1)
+            },
+            'total_cpu_ms_per_url': round((cpu + worker_cpu) / args.urls * 1000, 3),
+            'db_write_ms': round(write_ms, 3),
+            'db_write_ms_per_stored_url': round(write_ms / stored, 3) if stored else 0.0,
+            'stages': app_module.crawl_pipeline.stats()
+        }
+    }
+    write_report(report, output)
+
+
+if __name__ == '__main__':
+    main()
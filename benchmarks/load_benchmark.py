@@ -0,0 +1,334 @@
+"""Load benchmark for the web routes against a synthetic large catalogue
+
+Generate a catalogue (100k-10M rows) into a work directory, then drive
+/, /all, /feed, /search, /category/<name>, /domain/<name>, /click and /rate with
+a mixed read/write workload and report throughput and latency percentiles
+as JSON:
+
+    python benchmarks/load_benchmark.py generate --workdir /tmp/bench --rows 100000
+    python benchmarks/load_benchmark.py run --workdir /tmp/bench --duration 30 --output results.json
+
+By default requests go through the Flask test client. Pass --base-url to
+drive a running server instead (start it from the work directory so it
+serves the generated url_data.db).
+
+Every request comes from one client address, so with the test client the
+per-client rate limits are lifted unless --keep-rate-limits is passed; a
+running server keeps its own. Rate-limited (429) responses are counted
+separately and left out of the latency figures.
+"""
+import os
+import sys
+import time
+import random
+import json
+import base64
+import sqlite3
+import argparse
+import threading
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import load_app, summarize_latencies, run_metadata, write_report
+
+WORDS = '''
+the best free online guide news tech code python data cloud web app open source
+learn course school university science health travel food recipe music video game
+sport market shop store deal price money bank finance invest crypto stock job
+career design photo art book library forum community blog review tutorial docs
+api developer linux server security privacy mobile android apple windows home
+garden car auto energy climate weather map city hotel flight movie series stream
+radio podcast social chat mail search engine wiki history math physics chemistry
+biology kids family fashion style beauty fitness yoga pet dog cat shopping local
+world daily tools tips startup business marketing analytics ai machine learning
+'''.split()
+
+TLDS = ['com'] * 12 + ['org'] * 3 + ['net'] * 2 + ['io', 'dev', 'co.uk', 'edu', 'de', 'info']
+SUBDOMAINS = ['www.'] * 6 + [''] * 4 + ['blog.', 'news.', 'shop.', 'forum.', 'docs.']
+CATEGORIES = ['Technology', 'Education', 'Entertainment', 'Business', 'News', 'Shopping', 'Social']
+RATINGS = [0.0] * 11 + [1.0, 2.0, 3.0, 3.5, 4.0, 4.0, 4.5, 5.0, 5.0]
+BATCH_SIZE = 20000
+
+
+def zipf_weights(n, s=1.1):
+    """Cumulative Zipf weights for use with random.choices(cum_weights=...)"""
+    total = 0.0
+    weights = []
+    for rank in range(1, n + 1):
+        total += 1.0 / rank ** s
+        weights.append(total)
+    return weights
+
+
+def make_domains(count, rng):
+    domains = set()
+    while len(domains) < count:
+        name = rng.choice(WORDS) + rng.choice(WORDS) + (str(rng.randint(1, 99)) if rng.random() < 0.2 else '')
+        domains.add(rng.choice(SUBDOMAINS) + name + '.' + rng.choice(TLDS))
+    domains = list(domains)
+    rng.shuffle(domains)
+    return domains
+
+
+def generate_rows(rows, rng):
+    """Yield urls rows with skewed domain popularity, clicks and ratings"""
+    domains = make_domains(max(100, rows // 25), rng)
+    domain_weights = zipf_weights(len(domains))
+    word_weights = zipf_weights(len(WORDS), 0.9)
+    now = time.time()
+
+    for i in range(rows):
+        domain = rng.choices(domains, cum_weights=domain_weights)[0]
+        title_words = rng.choices(WORDS, cum_weights=word_weights, k=rng.randint(2, 8))
+        description = ' '.join(rng.choices(WORDS, cum_weights=word_weights, k=rng.randint(8, 30)))
+        slug = '-'.join(title_words[:4])
+        url = f"https://{domain}/{slug}-{i}"
+        title = ' '.join(title_words).title()
+        clicks = min(int((rng.paretovariate(1.16) - 1) * 10), 10000000)
+        rating = rng.choice(RATINGS)
+        created_at = now - rng.random() * 730 * 86400
+        category = rng.choice(CATEGORIES) if rng.random() < 0.55 else None
+        tags = []
+        if 'blog' in domain or 'blog' in title_words:
+            tags.append('blog')
+        if 'forum' in domain or 'forum' in title_words:
+            tags.append('forum')
+        yield (url, title, description, domain, rating, clicks, created_at,
+               created_at + rng.random() * 86400, category, ','.join(tags) or None)
+
+
+def generate(args):
+    workdir = os.path.abspath(args.workdir)
+    os.makedirs(workdir, exist_ok=True)
+    db_path = os.path.join(workdir, 'url_data.db')
+    if os.path.exists(db_path):
+        if not args.force:
+            sys.exit(f"{db_path} already exists, pass --force to replace it")
+        os.remove(db_path)
+
+    # Importing the app creates the schema in the work directory
+    app_module = load_app(workdir)
+
+    rng = random.Random(args.seed)
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA synchronous = OFF')
+    start = time.time()
+    batch = []
+    inserted = 0
+    for row in generate_rows(args.rows, rng):
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            inserted += insert_batch(conn, batch)
+            batch = []
+            print(f"  {inserted:,} rows ({time.time() - start:.0f}s)", file=sys.stderr)
+    if batch:
+        inserted += insert_batch(conn, batch)
+
+    # /click and /rate find rows through their aliases
+    conn.create_function('alias_key', 1, app_module.alias_key, deterministic=True)
+    conn.execute('''INSERT OR IGNORE INTO url_aliases (alias, url_id)
+                    SELECT alias_key(url), id FROM urls ORDER BY id''')
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    print(f"Generated {inserted:,} rows in {time.time() - start:.1f}s into {db_path}", file=sys.stderr)
+
+
+def insert_batch(conn, batch):
+    conn.executemany('''INSERT INTO urls
+                        (url, title, description, domain, rating, clicks, created_at, last_updated, category, tags)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', batch)
+    conn.commit()
+    return len(batch)
+
+
+class Workload:
+    """Picks the next request from a mixed read/write distribution over sampled data"""
+    READS = [('home', 20), ('all', 5), ('feed', 10), ('search', 25), ('category', 10), ('domain', 10)]
+    WRITES = [('click', 4), ('rate', 1)]
+
+    def __init__(self, db_path, write_ratio, seed):
+        conn = sqlite3.connect(db_path)
+        self.urls = [row[0] for row in conn.execute(
+            'SELECT url FROM urls WHERE id IN (SELECT abs(random()) % (SELECT MAX(id) FROM urls) + 1 FROM urls LIMIT 5000)')]
+        # Feed cursors positioned at sampled rows stand in for deep infinite scrolling
+        # (same encoding as app.encode_cursor)
+        self.cursors = [base64.urlsafe_b64encode(json.dumps(list(row)).encode()).decode().rstrip('=')
+                        for row in conn.execute(
+                            'SELECT clicks, rating, id FROM urls WHERE id IN (SELECT abs(random()) % (SELECT MAX(id) FROM urls) + 1 FROM urls LIMIT 500)')]
+        self.domains = [row[0] for row in conn.execute('SELECT domain FROM domain_stats ORDER BY url_count DESC LIMIT 500')]
+        self.categories = [row[0] for row in conn.execute('SELECT name FROM categories')]
+        conn.close()
+        self.write_ratio = write_ratio
+        self.seed = seed
+        self.domain_weights = zipf_weights(len(self.domains) or 1)
+        self.word_weights = zipf_weights(len(WORDS), 0.9)
+
+    def next_request(self, rng):
+        """Return (name, method, path, json_body)"""
+        if rng.random() < self.write_ratio and self.urls:
+            name = rng.choices([w[0] for w in self.WRITES], weights=[w[1] for w in self.WRITES])[0]
+            url = rng.choice(self.urls)
+            if name == 'click':
+                return name, 'POST', '/click', {'url': url}
+            return name, 'POST', '/rate', {'url': url, 'rating': rng.randint(1, 5)}
+
+        name = rng.choices([r[0] for r in self.READS], weights=[r[1] for r in self.READS])[0]
+        if name == 'home':
+            return name, 'GET', '/', None
+        if name == 'all':
+            return name, 'GET', '/all', None
+        if name == 'feed':
+            cursor = rng.choice(self.cursors) if self.cursors else ''
+            return name, 'GET', f'/feed?order=clicks&variant=default&cursor={cursor}', None
+        if name == 'search':
+            return name, 'GET', '/search?q=' + rng.choices(WORDS, cum_weights=self.word_weights)[0], None
+        if name == 'category':
+            return name, 'GET', '/category/' + rng.choice(self.categories), None
+        domain = rng.choices(self.domains, cum_weights=self.domain_weights)[0] if self.domains else 'example.com'
+        return name, 'GET', '/domain/' + domain, None
+
+
+def make_sender(args, app_module):
+    """Return a per-thread factory of send(method, path, body) -> status"""
+    if args.base_url:
+        import requests
+
+        def factory():
+            session = requests.Session()
+
+            def send(method, path, body):
+                return session.request(method, args.base_url.rstrip('/') + path, json=body, timeout=60).status_code
+            return send
+        return factory
+
+    def factory():
+        client = app_module.app.test_client()
+
+        def send(method, path, body):
+            return client.open(path, method=method, json=body).status_code
+        return send
+    return factory
+
+
+def run(args):
+    workdir = os.path.abspath(args.workdir)
+    output = os.path.abspath(args.output) if args.output else None
+    db_path = os.path.join(workdir, 'url_data.db')
+    if not os.path.exists(db_path):
+        sys.exit(f"{db_path} not found, run the generate command first")
+
+    app_module = None if args.base_url else load_app(workdir)
+    if app_module and not args.keep_rate_limits:
+        for limiter in app_module.rate_limiters.values():
+            limiter.rate = limiter.burst = 10 ** 9
+    workload = Workload(db_path, args.write_ratio, args.seed)
+    sender_factory = make_sender(args, app_module)
+
+    results = defaultdict(list)
+    errors = defaultdict(int)
+    rate_limited = defaultdict(int)
+    lock = threading.Lock()
+    start = time.time()
+    measure_from = start + args.warmup
+    deadline = measure_from + args.duration
+
+    def worker(index):
+        rng = random.Random(args.seed + index)
+        send = sender_factory()
+        local = defaultdict(list)
+        local_errors = defaultdict(int)
+        local_limited = defaultdict(int)
+        while True:
+            name, method, path, body = workload.next_request(rng)
+            began = time.perf_counter()
+            try:
+                status = send(method, path, body)
+            except Exception:
+                status = None
+            elapsed = time.perf_counter() - began
+            now = time.time()
+            if now >= deadline:
+                break
+            if now < measure_from:
+                continue
+            if status == 429:
+                local_limited[name] += 1
+                continue
+            local[name].append(elapsed)
+            if status is None or status >= 500:
+                local_errors[name] += 1
+        with lock:
+            for name, values in local.items():
+                results[name].extend(values)
+            for name, count in local_errors.items():
+                errors[name] += count
+            for name, count in local_limited.items():
+                rate_limited[name] += count
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    all_latencies = [value for values in results.values() for value in values]
+    routes = {}
+    for name in sorted(set(results) | set(rate_limited)):
+        values = results.get(name, [])
+        routes[name] = summarize_latencies(values)
+        routes[name]['throughput_rps'] = round(len(values) / args.duration, 2)
+        routes[name]['errors'] = errors.get(name, 0)
+        routes[name]['rate_limited'] = rate_limited.get(name, 0)
+
+    report = {
+        'benchmark': 'load',
+        'metadata': run_metadata(),
+        'config': {
+            'rows': sqlite3.connect(db_path).execute('SELECT COUNT(*) FROM urls').fetchone()[0],
+            'threads': args.threads,
+            'duration_s': args.duration,
+            'warmup_s': args.warmup,
+            'write_ratio': args.write_ratio,
+            'target': args.base_url or 'test-client',
+            'rate_limits': 'server' if args.base_url else ('app' if args.keep_rate_limits else 'lifted')
+        },
+        'overall': dict(summarize_latencies(all_latencies),
+                        throughput_rps=round(len(all_latencies) / args.duration, 2),
+                        errors=sum(errors.values()),
+                        rate_limited=sum(rate_limited.values())),
+        'routes': routes
+    }
+    write_report(report, output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    gen = subparsers.add_parser('generate', help='Generate a synthetic url_data.db')
+    gen.add_argument('--workdir', required=True)
+    gen.add_argument('--rows', type=int, default=100000)
+    gen.add_argument('--seed', type=int, default=42)
+    gen.add_argument('--force', action='store_true', help='Replace an existing database')
+    gen.set_defaults(func=generate)
+
+    bench = subparsers.add_parser('run', help='Drive the routes and report latency')
+    bench.add_argument('--workdir', required=True)
+    bench.add_argument('--duration', type=float, default=30)
+    bench.add_argument('--warmup', type=float, default=3)
+    bench.add_argument('--threads', type=int, default=4)
+    bench.add_argument('--write-ratio', type=float, default=0.2)
+    bench.add_argument('--seed', type=int, default=42)
+    bench.add_argument('--base-url', help='Drive a running server instead of the test client')
+    bench.add_argument('--keep-rate-limits', action='store_true',
+                       help="Keep the app's per-client rate limits with the test client")
+    bench.add_argument('--output', help='Write the JSON report here instead of stdout')
+    bench.set_defaults(func=run)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Row materialisation benchmark: SELECT * dicts against projected records
+
+Reads the same rows from a generated catalogue with each strategy and
+reports rows/second and the memory held per 10k rows as JSON:
+
+    python benchmarks/rows_benchmark.py --workdir /tmp/bench --rows 50000 --output rows.json
+
+Strategies:
+    select_star_dicts   SELECT * with dict(zip(...)) per row (the old helpers)
+    select_star_row     SELECT * with sqlite3.Row as the row factory
+    projected_records   CARD_COLUMNS with fetch_records (what the list views use now)
+
+The catalogue in --workdir is generated with load_benchmark.py when it
+does not exist yet.
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import load_app, run_metadata, write_report
+from load_benchmark import generate_rows, insert_batch, BATCH_SIZE
+
+
+def select_star_dicts(conn, app_module, limit):
+    c = conn.cursor()
+    c.execute("SELECT * FROM urls ORDER BY id LIMIT ?", (limit,))
+    return [dict(zip([column[0] for column in c.description], row)) for row in c.fetchall()]
+
+
+def select_star_row(conn, app_module, limit):
+    conn.row_factory = sqlite3.Row
+    try:
+        c = conn.cursor()
+        c.execute("SELECT * FROM urls ORDER BY id LIMIT ?", (limit,))
+        return c.fetchall()
+    finally:
+        conn.row_factory = None
+
+
+def projected_records(conn, app_module, limit):
+    c = conn.cursor()
+    c.execute(f"SELECT {app_module.CARD_COLUMNS} FROM urls ORDER BY id LIMIT ?", (limit,))
+    return app_module.fetch_records(c)
+
+
+STRATEGIES = [select_star_dicts, select_star_row, projected_records]
+
+
+def ensure_catalogue(workdir, rows, seed):
+    """Import the app in workdir and fill its database with rows synthetic URLs if it is empty"""
+    app_module = load_app(workdir)
+    conn = sqlite3.connect(os.path.join(workdir, 'url_data.db'))
+    existing = conn.execute('SELECT COUNT(*) FROM urls').fetchone()[0]
+    if existing < rows:
+        rng = random.Random(seed)
+        batch = []
+        for row in generate_rows(rows - existing, rng):
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                insert_batch(conn, batch)
+                batch = []
+        if batch:
+            insert_batch(conn, batch)
+    conn.close()
+    return app_module
+
+
+def measure(strategy, conn, app_module, rows, repeat):
+    """Best-of-repeat rows/second, and traced bytes held by one materialised result"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = strategy(conn, app_module, rows)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        count = len(result)
+        del result
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = strategy(conn, app_module, rows)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+
+    return {
+        'rows': count,
+        'rows_per_s': round(count / best, 1) if best else 0.0,
+        'best_ms': round(best * 1000, 3),
+        'bytes_per_10k_rows': round(held / count * 10000) if count else 0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--workdir', default='/tmp/yamajodo-rows-bench')
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    workdir = os.path.abspath(args.workdir)
+    app_module = ensure_catalogue(workdir, args.rows, args.seed)
+
+    conn = sqlite3.connect(os.path.join(workdir, 'url_data.db'))
+    results = {strategy.__name__: measure(strategy, conn, app_module, args.rows, args.repeat)
+               for strategy in STRATEGIES}
+    conn.close()
+
+    report = {
+        'benchmark': 'rows',
+        'metadata': run_metadata(),
+        'config': {'rows': args.rows, 'repeat': args.repeat, 'columns': app_module.CARD_COLUMNS},
+        'results': results
+    }
+    write_report(report, output)
+
+
+if __name__ == '__main__':
+    main()
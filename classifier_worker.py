@@ -0,0 +1,45 @@
+"""Category scoring run in the classifier's worker processes (see app.CategoryClassifier)
+
+Kept out of app.py so workers started from the fork server import only this
+module and NumPy, not the app with its database and background threads.
+"""
+import numpy as np
+
+# Set in each worker process by the pool initializer
+_model = None
+
+
+def init_worker(model):
+    global _model
+    _model = model
+
+
+def classify_batch(docs):
+    """Score a batch of token lists; returns (category, confidence) pairs
+
+    Every known token adds its row of per-category log likelihoods to its
+    document's priors, as one scatter-add over the whole batch.
+    """
+    model = _model
+    index = model['index']
+    doc_ids, token_ids = [], []
+    for doc_id, tokens in enumerate(docs):
+        for token in tokens:
+            token_id = index.get(token)
+            if token_id is not None:
+                doc_ids.append(doc_id)
+                token_ids.append(token_id)
+    doc_ids = np.array(doc_ids, dtype=np.intp)
+    token_ids = np.array(token_ids, dtype=np.intp)
+
+    scores = np.tile(model['priors'], (len(docs), 1))
+    np.add.at(scores, doc_ids, model['likelihoods'][token_ids])
+    best = scores.argmax(axis=1)
+    # Softmax of the winning class
+    confidence = 1 / np.exp(scores - scores[np.arange(len(docs)), best][:, None]).sum(axis=1)
+    # Documents with nothing the model has seen get no category, since only the priors would speak
+    known = np.bincount(doc_ids, minlength=len(docs)) > 0
+
+    categories = model['categories']
+    return [(categories[label], float(score)) if seen else (None, 0.0)
+            for label, score, seen in zip(best, confidence, known)]
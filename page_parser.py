@@ -0,0 +1,44 @@
+"""HTML parsing run in the crawler's parser processes (see app.CrawlPipeline)
+
+Kept out of app.py so workers started from the fork server import only this
+module and BeautifulSoup, not the app with its database and background threads.
+The app turns the raw fields returned here into a row (see app.build_page).
+"""
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+
+def find_favicon_url(soup, page_url):
+    """The page's declared icon, falling back to /favicon.ico"""
+    for link in soup.find_all('link', href=True):
+        rel = [value.lower() for value in link.get('rel', [])]
+        if 'icon' in rel or 'apple-touch-icon' in rel:
+            return urljoin(page_url, link['href'])
+    return urljoin(page_url, '/favicon.ico')
+
+
+def find_preview_image_url(soup, page_url):
+    meta_image = soup.find('meta', attrs={'property': 'og:image'}) or \
+                 soup.find('meta', attrs={'name': 'twitter:image'})
+    if meta_image and meta_image.get('content'):
+        return urljoin(page_url, meta_image['content'])
+    return None
+
+
+def parse_html(final_url, content, charset):
+    """Extract title, description and link URLs from a raw page; links come back absolute"""
+    # Without a charset header BeautifulSoup sniffs the encoding from the markup
+    soup = BeautifulSoup(content, 'html.parser', from_encoding=charset)
+
+    canonical = soup.find('link', rel='canonical', href=True)
+    meta_desc = soup.find('meta', attrs={'name': 'description'}) or \
+                soup.find('meta', attrs={'property': 'og:description'})
+
+    return {
+        'title': str(soup.title.string) if soup.title and soup.title.string else None,
+        'description': meta_desc.get('content', '') if meta_desc else '',
+        'canonical_url': urljoin(final_url, canonical['href'].strip()) if canonical else None,
+        'favicon_url': find_favicon_url(soup, final_url),
+        'image_url': find_preview_image_url(soup, final_url)
+    }
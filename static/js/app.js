@@ -0,0 +1,150 @@
+// Shared page scripts; `flask build-assets` copies this to static/dist under a content hash
+
+function addUrl(e) {
+    e.preventDefault();
+    const url = document.getElementById('urlInput').value.trim();
+    if (!url) return;
+    
+    fetch('/add', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
+        body: `url=${encodeURIComponent(url)}`
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            alert('URL added successfully! It will be processed shortly.');
+            document.getElementById('urlInput').value = '';
+            setTimeout(() => location.reload(), 1500);
+        } else {
+            alert('Error: ' + data.message);
+        }
+    })
+    .catch(error => {
+        alert('An error occurred: ' + error);
+    });
+}
+
+function trackClick(url) {
+    fetch('/click', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ url })
+    });
+}
+
+function rateUrl(url, rating) {
+    fetch('/rate', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ url, rating })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            location.reload();
+        }
+    });
+}
+
+function toggleVisibility(id) {
+    const element = document.getElementById(id);
+    if (element.style.display === 'none' || element.style.display === '') {
+        element.style.display = 'block';
+    } else {
+        element.style.display = 'none';
+    }
+}
+
+// Typeahead suggestions, on pages with a #searchInput and a #suggestions box
+const suggestIcons = { title: 'fa-link', domain: 'fa-globe', tag: 'fa-tag' };
+let suggestTimer = null;
+
+function showSuggestions(items) {
+    const box = document.getElementById('suggestions');
+    box.innerHTML = '';
+    items.forEach(item => {
+        const link = document.createElement('a');
+        link.className = 'block px-4 py-2 hover:bg-gray-100 text-gray-800';
+        if (item.type === 'title') {
+            link.href = item.target;
+            link.target = '_blank';
+            link.onclick = () => trackClick(item.target);
+        } else if (item.type === 'domain') {
+            link.href = '/domain/' + encodeURIComponent(item.target);
+        } else {
+            link.href = '/tag/' + encodeURIComponent(item.target);
+        }
+        const icon = document.createElement('i');
+        icon.className = 'fas ' + suggestIcons[item.type] + ' mr-2 text-gray-400';
+        link.appendChild(icon);
+        link.appendChild(document.createTextNode(item.text));
+        box.appendChild(link);
+    });
+    box.style.display = items.length ? 'block' : 'none';
+}
+
+const searchInput = document.getElementById('searchInput');
+if (searchInput && document.getElementById('suggestions')) {
+    searchInput.addEventListener('input', e => {
+        clearTimeout(suggestTimer);
+        const q = e.target.value.trim();
+        if (!q) {
+            showSuggestions([]);
+            return;
+        }
+        suggestTimer = setTimeout(() => {
+            fetch('/suggest?q=' + encodeURIComponent(q))
+                .then(response => response.json())
+                .then(data => showSuggestions(data.suggestions));
+        }, 100);
+    });
+    
+    document.addEventListener('click', e => {
+        if (!e.target.closest('#suggestions')) {
+            showSuggestions([]);
+        }
+    });
+}
+
+// Infinite scroll: the .feed-more link after #feedList loads the next batch from /feed
+// when it comes into view (or is clicked)
+function loadFeed(link) {
+    if (link.dataset.loading) return;
+    link.dataset.loading = '1';
+    
+    fetch(link.dataset.feed + '&cursor=' + encodeURIComponent(link.dataset.cursor))
+        .then(response => response.json())
+        .then(data => {
+            document.getElementById('feedList').insertAdjacentHTML('beforeend', data.html);
+            delete link.dataset.loading;
+            if (!data.next_cursor) {
+                link.parentElement.remove();
+                return;
+            }
+            link.dataset.cursor = data.next_cursor;
+            // A short batch can leave the link in view, which the observer does not report again
+            if (link.getBoundingClientRect().top < window.innerHeight + 600) {
+                loadFeed(link);
+            }
+        })
+        .catch(() => {
+            delete link.dataset.loading;
+        });
+}
+
+const feedMore = document.querySelector('.feed-more');
+if (feedMore && document.getElementById('feedList')) {
+    feedMore.addEventListener('click', e => {
+        e.preventDefault();
+        loadFeed(feedMore);
+    });
+    
+    if ('IntersectionObserver' in window) {
+        new IntersectionObserver(entries => {
+            if (entries[0].isIntersecting) {
+                loadFeed(feedMore);
+            }
+        }, { rootMargin: '600px' }).observe(feedMore);
+    }
+}
@@ -0,0 +1,55 @@
+"""Shared fixtures: app.py imported from a scratch copy with an empty database"""
+import os
+import sys
+import shutil
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """Import app.py from a copy in a temporary directory
+
+    Importing app writes templates/*.html next to app.py and opens url_data.db in
+    the working directory, so the copy keeps the tree and its database untouched.
+    """
+    workdir = tmp_path_factory.mktemp('app')
+    for name in ('app.py', 'classifier_worker.py', 'page_parser.py'):
+        shutil.copy(os.path.join(REPO_DIR, name), workdir)
+    shutil.copytree(os.path.join(REPO_DIR, 'static'), workdir / 'static')
+    (workdir / 'templates').mkdir()
+    os.environ['WARMUP'] = '0'
+    os.chdir(workdir)
+    sys.path.insert(0, str(workdir))
+    import app
+    return app
+
+
+@pytest.fixture
+def add_url(app_module):
+    """Insert a urls row and its alias through the writer thread and return its id"""
+    def add(url, **fields):
+        fields = {'title': url, 'description': '', 'domain': url.split('/')[2], **fields}
+        fields['url'] = url
+        columns = ', '.join(fields)
+
+        def insert(c):
+            c.execute(f"INSERT INTO urls ({columns}) VALUES ({', '.join('?' * len(fields))})",
+                      list(fields.values()))
+            url_id = c.lastrowid
+            app_module.add_url_aliases(c, url_id, [url])
+            return url_id
+        return app_module.db_writer.run(insert)
+    return add
+
+
+@pytest.fixture
+def fresh_db(app_module, tmp_path, monkeypatch):
+    """Connection to a new database; the app's DATA_FILE points at it for the test"""
+    monkeypatch.setattr(app_module, 'DATA_FILE', str(tmp_path / 'url_data.db'))
+    app_module.init_db()
+    conn = app_module.connect_db()
+    yield conn
+    conn.close()
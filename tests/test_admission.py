@@ -0,0 +1,77 @@
+"""Token bucket rate limits and the bounded crawl queue behind /add"""
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_rate_limiter_allows_burst_then_refills(app_module, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(app_module.time, 'monotonic', clock)
+    limiter = app_module.RateLimiter(rate=2, burst=3)
+
+    assert [limiter.acquire('a') for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire('a') == 0.5
+    # Other clients have their own buckets
+    assert limiter.acquire('b') == 0
+
+    clock.now += 0.5
+    assert limiter.acquire('a') == 0
+    assert limiter.acquire('a') > 0
+    assert limiter.stats()['allowed'] == 5 and limiter.stats()['rejected'] == 2
+
+
+def test_rate_limiter_forgets_least_recent_clients(app_module):
+    limiter = app_module.RateLimiter(rate=1, burst=1, max_clients=2)
+    for client in ('a', 'b', 'c'):
+        limiter.acquire(client)
+    assert list(limiter.buckets) == ['b', 'c']
+    # A forgotten client starts again with a full bucket
+    assert limiter.acquire('a') == 0
+
+
+def test_client_id_uses_proxy_header_only_when_configured(app_module, monkeypatch):
+    headers = {'Fly-Client-IP': '203.0.113.7'}
+    with app_module.app.test_request_context(headers=headers, environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+        assert app_module.client_id() == '10.0.0.1'
+        monkeypatch.setattr(app_module, 'CLIENT_IP_HEADER', 'Fly-Client-IP')
+        assert app_module.client_id() == '203.0.113.7'
+
+
+def test_ingest_queue_refuses_when_full(app_module, tmp_path):
+    queue = app_module.IngestQueue(path=str(tmp_path / 'urls.txt'), max_depth=3)
+    assert all(queue.add(f'http://queue.example/{i}') for i in range(3))
+    assert not queue.add('http://queue.example/3')
+
+    batch = queue.take()
+    assert len(batch) == 3
+    # The batch in flight still counts towards the depth until the crawler finishes it
+    assert not queue.add('http://queue.example/4')
+    queue.finish(len(batch), 2.0)
+    assert queue.add('http://queue.example/4')
+    assert queue.stats()['accepted'] == 4 and queue.stats()['rejected'] == 2
+
+
+def test_ingest_queue_take_drops_duplicates(app_module, tmp_path):
+    queue = app_module.IngestQueue(path=str(tmp_path / 'urls.txt'), max_depth=10)
+    for url in ('http://queue.example/a', 'http://queue.example/b', 'http://queue.example/a'):
+        queue.add(url)
+    assert sorted(queue.take()) == ['http://queue.example/a', 'http://queue.example/b']
+
+
+def test_ingest_queue_retry_after_follows_drain_rate(app_module, tmp_path):
+    queue = app_module.IngestQueue(path=str(tmp_path / 'urls.txt'), max_depth=2)
+    queue.add('http://queue.example/1')
+    queue.add('http://queue.example/2')
+    assert queue.retry_after() == 30
+
+    queue.take()
+    queue.finish(2, 4.0)
+    queue.add('http://queue.example/3')
+    queue.add('http://queue.example/4')
+    # One URL over the limit at half a URL a second
+    assert queue.retry_after() == 2
@@ -0,0 +1,49 @@
+"""URL alias keys and collapsing variants onto one stored page"""
+import pytest
+
+
+@pytest.mark.parametrize('variant', [
+    'https://example.com/docs',
+    'http://www.example.com/docs/',
+    'https://EXAMPLE.com:443/docs#intro',
+    '  http://example.com:80/docs//  ',
+])
+def test_variants_share_a_key(app_module, variant):
+    assert app_module.alias_key(variant) == 'example.com/docs'
+
+
+def test_key_keeps_query_and_non_default_port(app_module):
+    assert app_module.alias_key('http://example.com:8080/a/?q=1') == 'example.com:8080/a?q=1'
+    assert app_module.alias_key('http://example.com/a?q=1') != app_module.alias_key('http://example.com/a?q=2')
+
+
+def test_canonical_is_kept_only_on_the_same_site(app_module):
+    page = 'https://blog.example.com/post?utm_source=feed'
+    assert app_module.same_site_canonical('https://www.blog.example.com/post', page) == \
+        'https://www.blog.example.com/post'
+    assert app_module.same_site_canonical('https://syndicator.example/post', page) is None
+    assert app_module.same_site_canonical('/post', page) is None
+
+
+def store(app_module, url, aliases):
+    return app_module.db_writer.run(app_module.store_url, url, url, '', 'alias.example', None, None,
+                                    [], [], aliases)
+
+
+def test_later_variants_collapse_onto_the_canonical_row(app_module):
+    stored = store(app_module, 'https://alias.example/page', ['http://alias.example/page?ref=home'])
+    assert stored is not None
+    url_id = stored[0]
+
+    # Reached through a redirect from a new URL: no second row, the new URL becomes an alias
+    assert store(app_module, 'https://www.alias.example/page/',
+                 ['http://short.example/x', 'https://www.alias.example/page/']) is None
+
+    conn = app_module.connect_db()
+    rows = conn.execute("SELECT COUNT(*) FROM urls WHERE domain = 'alias.example'").fetchone()[0]
+    resolved = app_module.resolve_url_ids(conn.cursor(), ['http://short.example/x',
+                                                         'http://alias.example/page?ref=home'])
+    conn.close()
+    assert rows == 1
+    assert resolved == {'http://short.example/x': url_id, 'http://alias.example/page?ref=home': url_id}
+    assert app_module.is_duplicate_url('short.example/x')
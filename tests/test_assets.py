@@ -0,0 +1,42 @@
+"""Purging the vendor stylesheet down to the classes the templates use"""
+import glob
+import re
+
+
+def css_class(name):
+    return '.' + re.sub(r'([^A-Za-z0-9_-])', r'\\\1', name)
+
+
+def template_classes():
+    classes = set()
+    for path in glob.glob('templates/*.html') + glob.glob('static/js/*.js'):
+        with open(path, encoding='utf-8') as f:
+            for attribute in re.findall(r'class="([^"]*)"', f.read()):
+                classes.update(name for name in attribute.split() if re.fullmatch(r'[\w:/.%-]+', name))
+    return classes
+
+
+def test_every_template_class_survives(app_module):
+    classes = template_classes()
+    assert 'hover:bg-blue-700' in classes
+    css = ''.join(f"{css_class(name)}{{color:red}}" for name in sorted(classes))
+    css += '.never-used-anywhere{color:blue}'
+    purged = app_module.purge_css(css, app_module.collect_used_classes())
+    kept = {app_module.unescape_css(name) for name in app_module._CSS_CLASS_RE.findall(purged)}
+    assert kept == classes
+
+
+def test_rules_are_purged_per_selector(app_module):
+    css = '''@charset "UTF-8";
+/* vendor banner */
+.used, .unused{margin:0}
+.unused > .used{margin:1px}
+a{color:inherit}
+.md\\:flex:hover{display:flex}
+@media (min-width: 768px){.used{padding:0}.unused{padding:1px}}
+@media print{.unused{display:none}}
+@font-face{font-family:x;src:url(x.woff2)}'''
+    purged = app_module.purge_css(css, {'used', 'md:flex'})
+    assert purged == ('.used{margin:0}a{color:inherit}.md\\:flex:hover{display:flex}'
+                      '@media (min-width: 768px){.used{padding:0}}'
+                      '@font-face{font-family:x;src:url(x.woff2)}')
@@ -0,0 +1,55 @@
+"""row_version bumps and the rendered card cache keyed on them"""
+import time
+
+
+def fetch_card_row(app_module, url_id):
+    conn = app_module.connect_db()
+    c = conn.cursor()
+    c.execute(f"SELECT {app_module.CARD_COLUMNS} FROM urls WHERE id = ?", (url_id,))
+    row = app_module.fetch_records(c)[0]
+    conn.close()
+    return row
+
+
+def update(app_module, sql, *params):
+    app_module.db_writer.run(lambda c: c.execute(sql, params))
+
+
+def test_rendered_column_change_bumps_row_version(app_module, add_url):
+    url_id = add_url('http://version.example/title', description='First description')
+    version = fetch_card_row(app_module, url_id)['row_version']
+
+    update(app_module, "UPDATE urls SET title = ? WHERE id = ?", 'New title', url_id)
+    assert fetch_card_row(app_module, url_id)['row_version'] == version + 1
+
+    # Unrendered columns and unchanged values leave the version alone
+    update(app_module, "UPDATE urls SET trending = 1.5, category_source = 'rule' WHERE id = ?", url_id)
+    update(app_module, "UPDATE urls SET title = ? WHERE id = ?", 'New title', url_id)
+    assert fetch_card_row(app_module, url_id)['row_version'] == version + 1
+
+
+def test_click_flush_bumps_row_version_once(app_module, add_url):
+    url = 'http://version.example/clicks'
+    url_id = add_url(url)
+    before = fetch_card_row(app_module, url_id)
+
+    app_module.db_writer.run(app_module.write_clicks, {url: 3}, time.time())
+    after = fetch_card_row(app_module, url_id)
+    assert after['clicks'] == before['clicks'] + 3
+    assert after['row_version'] == before['row_version'] + 1
+
+
+def test_card_cache_misses_after_update(app_module, add_url):
+    url_id = add_url('http://version.example/cache', title='Cached title', description='Some text')
+    cache = app_module.CardCache()
+
+    with app_module.app.test_request_context():
+        row = fetch_card_row(app_module, url_id)
+        first = cache.render(row, 'default')
+        assert cache.render(row, 'default') is first
+        assert cache.stats()['hits'] == 1
+
+        update(app_module, "UPDATE urls SET title = ? WHERE id = ?", 'Renamed title', url_id)
+        html = cache.render(fetch_card_row(app_module, url_id), 'default')
+        assert 'Renamed title' in html and 'Cached title' not in html
+        assert cache.stats()['misses'] == 2
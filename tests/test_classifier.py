@@ -0,0 +1,23 @@
+"""Naive Bayes category model and its batch scoring"""
+
+
+def test_classify_batch_scores_known_tokens(app_module):
+    import classifier_worker
+    rows = [(['football', 'league'], 'Sports'), (['match', 'football'], 'Sports'),
+            (['python', 'code'], 'Tech'), (['software', 'python'], 'Tech')]
+    classifier_worker.init_worker(app_module.train_category_model(rows))
+
+    results = classifier_worker.classify_batch([['football', 'results'], ['unseen'], [], ['python']])
+    assert [category for category, _ in results] == ['Sports', None, None, 'Tech']
+    assert results[0][1] > 0.5 and results[1][1] == 0.0
+    assert classifier_worker.classify_batch([]) == []
+
+
+def test_pending_rows_are_capped_before_a_model_exists(app_module):
+    classifier = app_module.CategoryClassifier(max_pending=3)
+    for url_id in range(1, 6):
+        classifier.enqueue(url_id)
+    assert classifier.run_pending() == 0
+    # The oldest ids are dropped; backfill-categories picks them up later
+    assert list(classifier.pending) == [3, 4, 5]
+    assert classifier.dropped == 2
@@ -0,0 +1,74 @@
+"""Crawler parse stage: page_parser in the parser processes and the pool's recovery"""
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+PAGE = b'''<html><head><title>Example page</title>
+<meta name="description" content="A page about tech news">
+<link rel="canonical" href="/canonical/">
+<link rel="icon" href="/static/icon.png">
+<meta property="og:image" content="https://cdn.example.net/preview.jpg">
+</head><body></body></html>'''
+
+
+def test_parse_html_returns_absolute_links():
+    import page_parser
+    parsed = page_parser.parse_html('https://www.technews.example/page?ref=1', PAGE, None)
+    assert parsed == {
+        'title': 'Example page',
+        'description': 'A page about tech news',
+        'canonical_url': 'https://www.technews.example/canonical/',
+        'favicon_url': 'https://www.technews.example/static/icon.png',
+        'image_url': 'https://cdn.example.net/preview.jpg'
+    }
+    bare = page_parser.parse_html('http://bare.example/', b'<html></html>', None)
+    assert bare['title'] is None and bare['canonical_url'] is None
+    assert bare['favicon_url'] == 'http://bare.example/favicon.ico'
+
+
+def test_build_page_keeps_only_same_site_canonicals(app_module):
+    import page_parser
+    parsed = page_parser.parse_html('https://www.technews.example/page?ref=1', PAGE, None)
+    page = app_module.build_page('https://www.technews.example/page?ref=1', parsed)
+    assert page['url'] == 'https://www.technews.example/canonical/'
+    assert page['domain'] == 'www.technews.example'
+    assert (page['category'], page['category_source']) == ('News', 'rule')
+
+    syndicated = dict(parsed, canonical_url='https://elsewhere.example/original')
+    page = app_module.build_page('http://plain.example/copy', syndicated)
+    assert page['url'] == 'http://plain.example/copy'
+    assert page['category'] is None and page['title'] == 'Example page'
+
+
+def broken_parser(pipeline):
+    """Kill the pool's only process and return the pool with the future that failed on it"""
+    parser = pipeline.parser
+    crashed = parser.submit(os._exit, 1)
+    with pytest.raises(BrokenProcessPool):
+        crashed.result(timeout=60)
+    return parser, crashed
+
+
+def test_parser_pool_is_replaced_after_a_crash(app_module):
+    pipeline = app_module.CrawlPipeline(parse_workers=1)
+    pipeline.parser = ProcessPoolExecutor(max_workers=1, mp_context=app_module.pool_context)
+    broken, crashed = broken_parser(pipeline)
+
+    # A page that was on the broken pool fails and swaps the pool once
+    future = Future()
+    pipeline.parse_slots.acquire()
+    pipeline.parse_done('http://crash.example/', 'http://crash.example/', future, broken, crashed)
+    assert future.result() is False
+    assert pipeline.parser is not broken
+    assert pipeline.counts['parser_restarts'] == 1 and pipeline.counts['parse_errors'] == 1
+
+    # Later pages parse on the new pool, and a broken pool found at submit is replaced there
+    _, parsed = pipeline.submit_parse('http://after.example/', PAGE, None)
+    assert parsed.result(timeout=60)['title'] == 'Example page'
+    broken_parser(pipeline)
+    parser, parsed = pipeline.submit_parse('http://after.example/', PAGE, None)
+    assert parsed.result(timeout=60)['title'] == 'Example page'
+    assert pipeline.counts['parser_restarts'] == 2
+    parser.shutdown()
@@ -0,0 +1,45 @@
+"""Batched writes on the single writer connection"""
+import time
+from concurrent.futures import Future
+
+import pytest
+
+
+def insert(value, fail=False):
+    def operation(c):
+        c.execute("INSERT INTO writer_test (value) VALUES (?)", (value,))
+        if fail:
+            raise ValueError(f'failed after inserting {value}')
+        return value
+    return operation
+
+
+def test_failed_operation_rolls_back_alone(app_module):
+    conn = app_module.connect_db()
+    conn.isolation_level = None
+    conn.execute("CREATE TABLE IF NOT EXISTS writer_test (value INTEGER)")
+    conn.execute("DELETE FROM writer_test")
+
+    writer = app_module.DBWriter()
+    batch = [(insert(value, fail=value == 2), (), Future(), time.perf_counter()) for value in (1, 2, 3)]
+    writer.write_batch(conn, batch)
+
+    futures = [future for _, _, future, _ in batch]
+    assert futures[0].result() == 1 and futures[2].result() == 3
+    with pytest.raises(ValueError):
+        futures[1].result()
+    assert [row[0] for row in conn.execute("SELECT value FROM writer_test ORDER BY value")] == [1, 3]
+    assert writer.metrics()['failed_operations'] == 1 and writer.metrics()['batches'] == 1
+    conn.close()
+
+
+def test_writer_thread_keeps_going_after_a_failure(app_module):
+    app_module.db_writer.run(lambda c: c.execute("CREATE TABLE IF NOT EXISTS writer_test (value INTEGER)"))
+    with pytest.raises(ValueError):
+        app_module.db_writer.run(insert(10, fail=True))
+    assert app_module.db_writer.run(insert(11)) == 11
+
+    conn = app_module.connect_db()
+    values = {row[0] for row in conn.execute("SELECT value FROM writer_test WHERE value >= 10")}
+    conn.close()
+    assert values == {11}
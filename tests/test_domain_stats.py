@@ -0,0 +1,59 @@
+"""domain_stats kept current by triggers on every write to urls"""
+
+
+def stats(conn):
+    return {row[0]: row[1:] for row in conn.execute(
+        "SELECT domain, url_count, clicks, rating_sum, rated_count, last_crawled FROM domain_stats")}
+
+
+def add_row(conn, url, domain, clicks=0, rating=0, created_at=None):
+    conn.execute("INSERT INTO urls (url, title, domain, clicks, rating, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                 (url, url, domain, clicks, rating, created_at))
+    return conn.execute("SELECT id FROM urls WHERE url = ?", (url,)).fetchone()[0]
+
+
+def rebuilt(app_module, conn):
+    """domain_stats as rebuild_domain_stats computes it from scratch, leaving the table as it was"""
+    conn.execute("SAVEPOINT rebuild")
+    app_module.rebuild_domain_stats(conn.cursor())
+    result = stats(conn)
+    conn.execute("ROLLBACK TO rebuild")
+    conn.execute("RELEASE rebuild")
+    return result
+
+
+def test_inserts_and_updates_fold_into_totals(app_module, fresh_db):
+    first = add_row(fresh_db, 'http://a.example/1', 'a.example', clicks=3, rating=4, created_at=100)
+    add_row(fresh_db, 'http://a.example/2', 'a.example', clicks=1, created_at=200)
+    add_row(fresh_db, 'http://b.example/1', 'b.example', rating=2, created_at=50)
+    assert stats(fresh_db) == {'a.example': (2, 4, 4, 1, 200), 'b.example': (1, 0, 2, 1, 50)}
+
+    fresh_db.execute("UPDATE urls SET clicks = clicks + 5, rating = 3 WHERE id = ?", (first,))
+    # Updates that change neither clicks nor rating leave the totals alone
+    fresh_db.execute("UPDATE urls SET title = 'Renamed', trending = 2 WHERE id = ?", (first,))
+    assert stats(fresh_db)['a.example'] == (2, 9, 3, 1, 200)
+    assert stats(fresh_db) == rebuilt(app_module, fresh_db)
+
+
+def test_moves_and_deletes_adjust_both_domains(app_module, fresh_db):
+    moved = add_row(fresh_db, 'http://c.example/1', 'c.example', clicks=2, rating=5)
+    add_row(fresh_db, 'http://c.example/2', 'c.example', clicks=1)
+
+    fresh_db.execute("UPDATE urls SET domain = 'd.example' WHERE id = ?", (moved,))
+    assert stats(fresh_db) == {'c.example': (1, 1, 0, 0, None), 'd.example': (1, 2, 5, 1, None)}
+
+    # A domain's row goes once its last URL does
+    fresh_db.execute("DELETE FROM urls WHERE id = ?", (moved,))
+    assert stats(fresh_db) == {'c.example': (1, 1, 0, 0, None)}
+    assert stats(fresh_db) == rebuilt(app_module, fresh_db)
+
+
+def test_popular_domains_read_the_stats(app_module, fresh_db):
+    for i in range(3):
+        add_row(fresh_db, f'http://big.example/{i}', 'big.example', rating=4 if i else 0)
+    add_row(fresh_db, 'http://small.example/', 'small.example')
+    fresh_db.commit()
+
+    popular = app_module.get_popular_domains(2)
+    assert [domain['domain'] for domain in popular] == ['big.example', 'small.example']
+    assert popular[0]['url_count'] == 3 and popular[0]['rating'] == 4.0
@@ -0,0 +1,60 @@
+"""Keyset-batched export and its streamed, optionally gzipped, response"""
+import csv
+import gzip
+import io
+import json
+
+
+def add_rows(conn, updated):
+    conn.executemany("INSERT INTO urls (url, title, domain, last_updated) VALUES (?, ?, 'export.example', ?)",
+                     [(f'http://export.example/{i}', f'Row {i}', t) for i, t in enumerate(updated)])
+    conn.commit()
+
+
+def test_rows_come_in_short_keyset_batches(app_module, fresh_db, monkeypatch):
+    add_rows(fresh_db, [10, 20, 30, 40, 50])
+    connections = []
+    connect_db = app_module.connect_db
+    monkeypatch.setattr(app_module, 'connect_db', lambda: connections.append(1) or connect_db())
+
+    ids = [row[0] for row in app_module.export_rows(batch_size=2)]
+    assert ids == [1, 2, 3, 4, 5]
+    # Two full batches and a short one, each read on its own connection
+    assert len(connections) == 3
+    assert [row[0] for row in app_module.export_rows(after_id=3, batch_size=2)] == [4, 5]
+
+
+def test_since_orders_by_update_time_and_breaks_ties_by_id(app_module, fresh_db):
+    add_rows(fresh_db, [30, 20, 20, 10, 20])
+    rows = list(app_module.export_rows(since=15, batch_size=2))
+    assert [row[0] for row in rows] == [2, 3, 5, 1]
+    # Resuming from the middle of a tie picks up the rest of it
+    assert [row[0] for row in app_module.export_rows(since=20, after_id=3, batch_size=2)] == [5, 1]
+
+
+def test_chunks_split_at_the_size_limit(app_module):
+    rows = [(i, f'http://x/{i}') + (None,) * (len(app_module.EXPORT_COLUMNS) - 2) for i in range(20)]
+    chunks = list(app_module.export_chunks(rows, chunk_bytes=256))
+    assert len(chunks) > 1
+    lines = b''.join(chunks).decode('utf-8').splitlines()
+    assert [json.loads(line)['id'] for line in lines] == list(range(20))
+
+
+def test_export_route_streams_gzipped_csv(app_module, fresh_db):
+    add_rows(fresh_db, [10, 20, 30])
+    client = app_module.app.test_client()
+    response = client.get('/export?format=csv&compress=gzip')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'application/gzip'
+    assert 'urls.csv.gz' in response.headers['Content-Disposition']
+    rows = list(csv.reader(io.StringIO(gzip.decompress(response.data).decode('utf-8'))))
+    assert rows[0] == app_module.EXPORT_COLUMNS
+    assert [row[1] for row in rows[1:]] == [f'http://export.example/{i}' for i in range(3)]
+
+
+def test_export_route_rejects_bad_input_and_remote_clients(app_module, fresh_db):
+    client = app_module.app.test_client()
+    assert client.get('/export?format=xml').status_code == 400
+    assert client.get('/export?since=yesterday').status_code == 400
+    assert client.get('/export', environ_base={'REMOTE_ADDR': '203.0.113.7'}).status_code == 403
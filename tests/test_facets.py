@@ -0,0 +1,45 @@
+"""Search facet counts from one grouped query"""
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(app_module):
+    app_module.facet_cache.clear()
+    yield
+    app_module.facet_cache.clear()
+
+
+def add_rows(conn, rows):
+    conn.executemany("INSERT INTO urls (url, title, domain, category, rating) VALUES (?, 'facet page', ?, ?, ?)",
+                     [(f'http://{domain}/{i}', domain, category, rating)
+                      for i, (domain, category, rating) in enumerate(rows)])
+    conn.commit()
+
+
+def test_counts_fold_out_of_the_grouped_rows(app_module, fresh_db):
+    add_rows(fresh_db, [('a.example', 'News', 4.5), ('a.example', 'News', 4.0),
+                        ('b.example', 'Technology', 3.2), ('b.example', None, None),
+                        ('c.example', 'News', 5.0)])
+    facets = app_module.search_facets('facet')
+    assert facets['total'] == 5
+    assert facets['categories'] == [('News', 3), ('Technology', 1)]
+    assert dict(facets['domains']) == {'a.example': 2, 'b.example': 2, 'c.example': 1}
+    # Unrated rows land in the 0 bucket
+    assert facets['ratings'] == [(5, 1), (4, 2), (3, 1), (0, 1)]
+
+
+def test_filters_apply_and_results_are_cached(app_module, fresh_db):
+    add_rows(fresh_db, [('a.example', 'News', 4.5), ('b.example', 'News', 2.0), ('b.example', 'Shopping', 2.5)])
+    facets = app_module.search_facets('facet', category='News')
+    assert facets['total'] == 2 and facets['categories'] == [('News', 2)]
+    assert app_module.search_facets('facet', rating=2)['domains'] == [('b.example', 2)]
+
+    add_rows(fresh_db, [('d.example', 'News', 1.0)])
+    # Whitespace and case variants of a query share the cached entry
+    assert app_module.search_facets('  FACET ', category='News') == facets
+
+
+def test_only_the_first_matches_are_counted(app_module, fresh_db, monkeypatch):
+    add_rows(fresh_db, [('a.example', 'News', 1.0)] * 6)
+    monkeypatch.setattr(app_module, 'SEARCH_COUNT_LIMIT', 4)
+    assert app_module.search_facets('facet')['total'] == 4
@@ -0,0 +1,93 @@
+"""Content-addressed image files and the per-domain favicon fetch"""
+import io
+import os
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+
+@pytest.fixture
+def image_dir(app_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, 'IMAGE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def png_bytes(size=(100, 80), color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_images_are_resized_once_per_content_hash(app_module, image_dir, monkeypatch):
+    data = png_bytes()
+    digest = app_module.render_images(data, (320, 640), 'webp', crop=True)
+    with Image.open(image_dir / f'{digest}-320.webp') as thumbnail:
+        assert thumbnail.size == (320, 180)
+    assert sorted(os.listdir(image_dir)) == [f'{digest}-320.webp', f'{digest}-640.webp']
+
+    # The same bytes from another page reuse the files without decoding anything
+    monkeypatch.setattr(app_module.Image, 'open', lambda *args: pytest.fail('image decoded again'))
+    assert app_module.render_images(data, (320, 640), 'webp', crop=True) == digest
+
+
+def test_oversized_images_are_refused_before_decoding(app_module, image_dir, monkeypatch):
+    monkeypatch.setattr(app_module, 'IMAGE_MAX_PIXELS', 100)
+    with pytest.raises(ValueError):
+        app_module.render_images(png_bytes(), (32,), 'png')
+    assert os.listdir(image_dir) == []
+
+
+def test_a_domain_favicon_is_fetched_once_and_its_lock_released(app_module, image_dir, monkeypatch):
+    fetched = []
+
+    def fetch_image(url):
+        fetched.append(url)
+        time.sleep(0.05)
+        return png_bytes(color='blue')
+    monkeypatch.setattr(app_module, 'fetch_image', fetch_image)
+    pipeline = app_module.ImagePipeline(workers=1, max_pending=1)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        pipeline.domain_favicon('icons.example', 'http://icons.example/favicon.ico'))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(fetched) == 1
+    assert len(set(results)) == 1 and results[0]
+    assert pipeline.domain_locks == {}
+
+
+def test_failed_favicons_are_remembered_and_release_the_lock(app_module, image_dir, monkeypatch):
+    def fetch_image(url):
+        raise ValueError('not an image')
+    monkeypatch.setattr(app_module, 'fetch_image', fetch_image)
+    pipeline = app_module.ImagePipeline(workers=1, max_pending=1)
+    assert pipeline.domain_favicon('broken-icon.example', 'http://broken-icon.example/favicon.ico') is None
+    assert pipeline.domain_locks == {}
+
+    monkeypatch.setattr(app_module, 'fetch_image', lambda url: pytest.fail('refetched a failed favicon'))
+    assert pipeline.domain_favicon('broken-icon.example', 'http://broken-icon.example/favicon.ico') is None
+
+
+def test_jobs_are_dropped_when_the_queue_is_full(app_module, monkeypatch):
+    release = threading.Event()
+    pipeline = app_module.ImagePipeline(workers=1, max_pending=1)
+    monkeypatch.setattr(pipeline, 'process', lambda *args: release.wait(5))
+    assert pipeline.enqueue(1, 'full.example', None, None)
+    assert not pipeline.enqueue(2, 'full.example', None, None)
+    assert pipeline.dropped == 1
+    release.set()
+    pipeline.pool.shutdown(wait=True)
+
+
+def test_images_are_served_as_immutable(app_module, image_dir):
+    digest = app_module.render_images(png_bytes(), (32,), 'png')
+    response = app_module.app.test_client().get(f'/img/{digest}-32.png')
+    assert response.status_code == 200
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == app_module.IMAGE_CACHE_MAX_AGE
+    response.close()
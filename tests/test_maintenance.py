@@ -0,0 +1,14 @@
+"""Database maintenance tasks"""
+
+
+def test_new_databases_use_wal_and_checkpoint_truncates_it(app_module, fresh_db):
+    assert fresh_db.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    fresh_db.execute("INSERT INTO urls (url, title, domain) VALUES ('http://wal.example/', 'x', 'wal.example')")
+    fresh_db.commit()
+
+    result = app_module.checkpoint_db()
+    assert 'skipped' not in result
+    assert result['journal_mode'] == 'wal'
+    assert result['busy'] == 0
+    assert result['log_pages'] == 0
+    assert fresh_db.execute("SELECT COUNT(*) FROM urls").fetchone()[0] == 1
@@ -0,0 +1,51 @@
+"""SQL fingerprints, per-fingerprint stats and the slow-query log"""
+import json
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def empty_stats(app_module):
+    app_module.reset_query_stats()
+    yield
+    app_module.reset_query_stats()
+
+
+def test_literals_and_in_lists_share_a_fingerprint(app_module):
+    fingerprint = app_module.fingerprint_sql
+    assert fingerprint("SELECT * FROM urls WHERE id = 42 AND title = 'it''s'") == \
+        'SELECT * FROM urls WHERE id = ? AND title = ?'
+    assert fingerprint("SELECT id FROM urls WHERE id IN (?, ?, ?)") == \
+        fingerprint("SELECT id FROM urls\n  WHERE id IN (?,?)") == 'SELECT id FROM urls WHERE id IN (...)'
+
+
+def test_statements_and_their_fetches_are_timed(app_module, fresh_db):
+    for url_id in (1, 2, 3):
+        fresh_db.execute("SELECT url FROM urls WHERE id = ?", (url_id,)).fetchall()
+    stats = {row['fingerprint']: row for row in app_module.get_query_stats(sort='count')}
+    select = stats['SELECT url FROM urls WHERE id = ?']
+    assert select['count'] == 3 and select['slow_count'] == 0
+    assert select['total_ms'] >= select['max_ms'] > 0
+    assert app_module.get_query_stats(sort='bogus') == app_module.get_query_stats(sort='total_ms')
+
+
+def test_slow_statements_are_logged_with_their_plan(app_module, fresh_db, tmp_path, monkeypatch):
+    log = tmp_path / 'slow.log'
+    monkeypatch.setattr(app_module, 'SLOW_QUERY_MS', 0)
+    monkeypatch.setattr(app_module, 'SLOW_QUERY_LOG', str(log))
+    fresh_db.execute("SELECT id FROM urls WHERE url = ?", ('http://slow.example/',)).fetchone()
+
+    entries = [json.loads(line) for line in log.read_text().splitlines()]
+    entry = next(entry for entry in entries if entry['fingerprint'] == 'SELECT id FROM urls WHERE url = ?')
+    assert entry['params'] == "('http://slow.example/',)"
+    assert any('USING' in step and 'INDEX' in step for step in entry['plan'])
+    assert app_module.slow_queries[-1]['fingerprint'] == entry['fingerprint']
+
+
+def test_admin_view_lists_offenders(app_module, fresh_db):
+    fresh_db.execute("SELECT COUNT(*) FROM urls").fetchone()
+    client = app_module.app.test_client()
+    data = client.get('/admin/queries?format=json').get_json()
+    assert 'SELECT COUNT(*) FROM urls' in [row['fingerprint'] for row in data['stats']]
+    assert client.get('/admin/queries').status_code == 200
+    assert client.get('/admin/queries', environ_base={'REMOTE_ADDR': '203.0.113.7'}).status_code == 403
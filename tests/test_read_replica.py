@@ -0,0 +1,42 @@
+"""In-memory read replica generations"""
+import sqlite3
+
+import pytest
+
+
+def add_row(conn, url):
+    conn.execute("INSERT INTO urls (url, title, domain) VALUES (?, ?, 'replica.example')", (url, url))
+    conn.commit()
+
+
+def count(conn):
+    return conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+
+def test_readers_keep_their_generation_across_refreshes(app_module, fresh_db):
+    add_row(fresh_db, 'http://replica.example/1')
+    replica = app_module.ReadReplica()
+    replica.refresh()
+    assert not replica.is_stale()
+    reader = replica.connect()
+
+    add_row(fresh_db, 'http://replica.example/2')
+    assert replica.is_stale()
+    replica.refresh()
+
+    # The refresh closed the old holder, but the open reader still has its copy
+    assert count(reader) == 1
+    fresh = replica.connect()
+    assert count(fresh) == 2
+    assert replica.stats()['generation'] == 2
+    reader.close()
+    fresh.close()
+
+
+def test_replica_connections_are_read_only(app_module, fresh_db):
+    replica = app_module.ReadReplica()
+    replica.refresh()
+    conn = replica.connect()
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("DELETE FROM urls")
+    conn.close()
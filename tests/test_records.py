@@ -0,0 +1,37 @@
+"""Compact row records and the card column projection"""
+import pytest
+
+
+def test_records_read_by_attribute_key_and_index(app_module):
+    Record = app_module.record_type(('id', 'title'))
+    row = Record(7, 'Example')
+    assert (row.id, row['title'], row[0], row.get('title'), row.get('missing', 'x')) == (7, 'Example', 7, 'Example', 'x')
+    assert list(row.keys()) == ['id', 'title'] and dict(zip(row.keys(), row)) == {'id': 7, 'title': 'Example'}
+    assert row._asdict() == {'id': 7, 'title': 'Example'}
+    with pytest.raises(KeyError):
+        row['missing']
+    # No per-row __dict__
+    with pytest.raises(AttributeError):
+        row.extra = 1
+
+
+def test_fetch_records_builds_one_class_per_cursor(app_module, fresh_db):
+    fresh_db.executemany("INSERT INTO urls (url, title, domain) VALUES (?, ?, 'records.example')",
+                         [('http://records.example/1', 'One'), ('http://records.example/2', 'Two')])
+    c = fresh_db.cursor()
+    c.execute("SELECT id, title, COUNT(*) OVER () FROM urls ORDER BY id")
+    rows = app_module.fetch_records(c)
+    assert [row.title for row in rows] == ['One', 'Two']
+    assert type(rows[0]) is type(rows[1])
+    # Expressions that are not identifiers still come back, under positional names
+    assert rows[0][2] == 2 and rows[0].keys()[2] == '_2'
+
+
+def test_listings_select_only_card_columns(app_module, fresh_db):
+    fresh_db.execute("INSERT INTO urls (url, title, description, domain, tags) VALUES (?, ?, ?, 'records.example', 'a,b')",
+                     ('http://records.example/long', 'Long', 'x' * 500))
+    fresh_db.commit()
+    row = app_module.get_urls(limit=1)[0]
+    assert 'tags' not in row.keys() and 'last_updated' not in row.keys()
+    # Just enough description for the card's 100-character summary
+    assert len(row['description']) == 101
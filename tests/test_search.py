@@ -0,0 +1,50 @@
+"""Search totals, page clamping and the query length cap"""
+
+
+def add_rows(conn, count):
+    # Even ids match 'alpha', odd ids do not
+    conn.executemany("INSERT INTO urls (url, title, domain, clicks) VALUES (?, ?, 'search.example', ?)",
+                     [(f'http://search.example/{i}', 'alpha' if i % 2 == 0 else 'beta', i)
+                      for i in range(1, count + 1)])
+    conn.commit()
+
+
+def test_small_totals_are_exact(app_module, fresh_db):
+    add_rows(fresh_db, 10)
+    data = app_module.search_urls('alpha', per_page=3)
+    assert (data['total'], data['total_exact'], data['total_pages']) == (5, True, 2)
+    # Ranked by clicks
+    assert [row['title'] for row in data['urls']] == ['alpha'] * 3
+    assert [row['url'] for row in data['urls']][0] == 'http://search.example/10'
+
+
+def test_large_totals_are_estimated_from_the_newest_rows(app_module, fresh_db, monkeypatch):
+    add_rows(fresh_db, 40)
+    monkeypatch.setattr(app_module, 'SEARCH_COUNT_LIMIT', 5)
+    monkeypatch.setattr(app_module, 'SEARCH_SAMPLE_ROWS', 10)
+    conn = app_module.connect_db()
+    where, params = app_module.search_filter('alpha')
+    # Five matches among the newest ten rows, scaled to forty rows
+    assert app_module.estimate_search_total(conn.cursor(), where, params) == (20, False)
+    conn.close()
+
+
+def test_pages_are_clamped_to_the_result_cap(app_module, fresh_db, monkeypatch):
+    add_rows(fresh_db, 40)
+    monkeypatch.setattr(app_module, 'SEARCH_MAX_RESULTS', 9)
+    last = app_module.search_urls('alpha', page=99, per_page=3)
+    assert (last['page'], last['total_pages'], last['total']) == (3, 3, 20)
+    assert [row['url'] for row in last['urls']] == [f'http://search.example/{i}' for i in (28, 26, 24)]
+    assert app_module.search_urls('alpha', page=0, per_page=3)['page'] == 1
+    assert app_module.search_urls('nothing', page=5, per_page=3)['page'] == 1
+
+
+def test_route_caps_the_query_length(app_module, fresh_db, monkeypatch):
+    searched = []
+    search_urls = app_module.search_urls
+    monkeypatch.setattr(app_module, 'search_urls', lambda *args, **kwargs: searched.append(args[0]) or
+                        search_urls(*args, **kwargs))
+    client = app_module.app.test_client()
+    response = client.get('/search', query_string={'q': 'A' * 1000, 'page': '-3'})
+    assert response.status_code == 200
+    assert searched == ['a' * app_module.SEARCH_MAX_QUERY_LENGTH]
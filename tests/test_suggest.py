@@ -0,0 +1,37 @@
+"""Typeahead suggestion index"""
+
+
+def texts(index, prefix):
+    return [suggestion['text'] for suggestion in index.suggest(prefix)]
+
+
+def test_new_rows_rank_once_clicked(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'SUGGEST_MERGE_SIZE', 4)
+    index = app_module.SuggestIndex(limit=2)
+    for i in range(5):
+        index.add(f'http://suggest.example/{i}', f'Python guide {i}', None, None)
+    # Three keys per title, so the merge has run and the last title's keys are still pending
+    assert index.keys and index.new_pairs
+
+    index.reweight([('http://suggest.example/4', None, None, 5), ('http://suggest.example/1', None, None, 2)])
+    assert texts(index, 'pyth') == ['Python guide 4', 'Python guide 1']
+    assert texts(index, 'guide') == ['Python guide 4', 'Python guide 1']
+
+
+def test_cached_prefixes_follow_weight_changes(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'SUGGEST_SCAN_LIMIT', 2)
+    monkeypatch.setattr(app_module, 'SUGGEST_MAX_CACHED_PREFIXES', 1)
+    index = app_module.SuggestIndex(limit=1)
+    for i in range(4):
+        index.add(f'http://cache.example/{i}', f'Rust book {i}', None, None, clicks=i)
+
+    assert texts(index, 'rust') == ['Rust book 3']
+    assert 'rust' in index.top_cache
+    index.reweight([('http://cache.example/0', None, None, 10)])
+    assert texts(index, 'rust') == ['Rust book 0']
+    index.reweight([('http://cache.example/0', None, None, -10)])
+    assert texts(index, 'rust') == ['Rust book 3']
+
+    # The cache keeps only the most recently used broad prefix
+    texts(index, 'book')
+    assert list(index.top_cache) == ['book']
@@ -0,0 +1,36 @@
+"""tags.url_count kept current by the url_tags triggers"""
+
+
+def tag_counts(conn):
+    return dict(conn.execute("SELECT name, url_count FROM tags"))
+
+
+def add_row(conn, url):
+    conn.execute("INSERT INTO urls (url, title, domain) VALUES (?, ?, 'tags.example')", (url, url))
+    return conn.execute("SELECT id FROM urls WHERE url = ?", (url,)).fetchone()[0]
+
+
+def test_url_count_follows_tag_changes(app_module, fresh_db):
+    c = fresh_db.cursor()
+    first = add_row(fresh_db, 'http://tags.example/1')
+    second = add_row(fresh_db, 'http://tags.example/2')
+
+    app_module.set_url_tags(c, first, 'Python, web,python')
+    app_module.set_url_tags(c, second, 'web')
+    assert tag_counts(fresh_db) == {'python': 1, 'web': 2}
+
+    app_module.set_url_tags(c, first, 'web,flask')
+    assert tag_counts(fresh_db) == {'python': 0, 'web': 2, 'flask': 1}
+
+    app_module.set_url_tags(c, second, '')
+    assert tag_counts(fresh_db) == {'python': 0, 'web': 1, 'flask': 1}
+
+
+def test_deleting_a_row_releases_its_tags(app_module, fresh_db):
+    c = fresh_db.cursor()
+    url_id = add_row(fresh_db, 'http://tags.example/gone')
+    app_module.set_url_tags(c, url_id, 'alpha,beta')
+
+    fresh_db.execute("DELETE FROM urls WHERE id = ?", (url_id,))
+    assert tag_counts(fresh_db) == {'alpha': 0, 'beta': 0}
+    assert fresh_db.execute("SELECT COUNT(*) FROM url_tags").fetchone()[0] == 0
@@ -0,0 +1,38 @@
+"""Click flushes into hourly windows and decayed trending scores"""
+import pytest
+
+
+def trending(app_module, url_id):
+    conn = app_module.connect_db()
+    score = conn.execute("SELECT trending FROM urls WHERE id = ?", (url_id,)).fetchone()[0]
+    conn.close()
+    return score
+
+
+def test_clicks_add_to_windows_and_trending(app_module, add_url):
+    url_id = add_url('http://trending.example/clicked')
+    now = 1700007200.0
+    app_module.db_writer.run(app_module.write_clicks, {'http://trending.example/clicked': 2}, now)
+    app_module.db_writer.run(app_module.write_clicks, {'https://www.trending.example/clicked/': 3}, now + 60)
+
+    conn = app_module.connect_db()
+    windows = conn.execute("SELECT window_start, clicks FROM click_windows WHERE url_id = ?", (url_id,)).fetchall()
+    clicks = conn.execute("SELECT clicks FROM urls WHERE id = ?", (url_id,)).fetchone()[0]
+    conn.close()
+    assert windows == [(1700006400, 5)] and clicks == 5
+    expected = app_module.logaddexp(app_module.trending_increment(2, now), app_module.trending_increment(3, now + 60))
+    assert trending(app_module, url_id) == pytest.approx(expected)
+
+
+def test_rebuild_rescores_from_windows_in_batches(app_module, add_url):
+    clicked = add_url('http://rebuild.example/clicked')
+    stale = add_url('http://rebuild.example/stale')
+    app_module.db_writer.run(app_module.write_clicks, {'http://rebuild.example/clicked': 4}, 1700006500.0)
+    app_module.db_writer.run(lambda c: c.executemany("UPDATE urls SET trending = ? WHERE id = ?",
+                                                     [(99.0, clicked), (42.0, stale)]))
+
+    assert app_module.rebuild_trending(batch_size=1) >= 1
+    # Scored at the middle of the window, and the row with no windows left loses its score
+    midpoint = 1700006400 + app_module.CLICK_WINDOW_SECONDS / 2
+    assert trending(app_module, clicked) == pytest.approx(app_module.trending_increment(4, midpoint))
+    assert trending(app_module, stale) is None